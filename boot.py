@@ -0,0 +1,35 @@
+import time
+import board
+import keypad
+import storage
+import usb_cdc
+
+# Enable the usb serial data channel used for streaming measurement frames. 
+# The console channel stays available for the REPL.
+usb_cdc.enable(console=True, data=True)
+
+# CIRCUITPY is read only to code unless the select (menu) button is held at
+# power up or reset. Then the firmware can write batch.bin and the
+# calibration journal but the drive is read only to the host computer until
+# the next reset without the button held. Note, boot.py doesn't run on a soft
+# reload (ctrl-D).
+WRITABLE_KEY = 3
+
+keys = keypad.ShiftRegisterKeys(
+        clock = board.BUTTON_CLOCK,
+        data = board.BUTTON_OUT,
+        latch = board.BUTTON_LATCH,
+        key_count = 8,
+        value_when_pressed = True,
+        )
+time.sleep(0.1)
+writable = False
+while True:
+    event = keys.events.get()
+    if event is None:
+        break
+    if event.pressed and event.key_number == WRITABLE_KEY:
+        writable = True
+keys.deinit()
+if writable:
+    storage.remount('/', readonly=False)
@@ -1,16 +1,18 @@
 import sys
 import gc
 sys.path.append('src')
+from boot_timer import boot_timer
 from splash_screen import SplashScreen
 
 # Show splash screen and display while other stuff loads
 splash_screen = SplashScreen()
 splash_screen.show()
+boot_timer.mark('splash')
 
 # Import and start colorimeter
 from colorimeter import Colorimeter 
+boot_timer.mark('import')
 colorimeter = Colorimeter()
 del splash_screen
 gc.collect()
 colorimeter.run()
-
@@ -0,0 +1,33 @@
+"""
+Host side reader for batch result files written by the colorimeter batch
+mode (see src/batch.py for the record layout).
+
+Example:
+
+    from colorimeter_batch import read_batch
+
+    batch = read_batch('/media/CIRCUITPY/batch.bin')
+    print(batch['mean'][:, 5], batch['cv'][:, 5])
+
+"""
+import numpy as np
+
+NUM_CHANNEL = 10
+
+RECORD_DTYPE = np.dtype([
+    ('count', '<u4'),
+    ('mean', '<f4', (NUM_CHANNEL,)),
+    ('m2', '<f4', (NUM_CHANNEL,)),
+    ])
+
+
+def read_batch(path):
+    """ Returns a dict with per sample count, mean, std and cv (%) arrays """
+    records = np.fromfile(path, dtype=RECORD_DTYPE)
+    count = records['count'].astype(np.float64)
+    mean = records['mean'].astype(np.float64)
+    dof = np.maximum(count - 1, 1)[:, None]
+    std = np.where(count[:, None] > 1, np.sqrt(records['m2']/dof), 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cv = np.where(mean != 0.0, 100.0*std/np.abs(mean), 0.0)
+    return {'count': records['count'], 'mean': mean, 'std': std, 'cv': cv}
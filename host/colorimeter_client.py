@@ -0,0 +1,97 @@
+"""
+Host side client for the colorimeter command protocol (see
+src/host_control.py).
+
+Example:
+
+    from colorimeter_client import ColorimeterClient
+
+    with ColorimeterClient('/dev/ttyACM0') as client:
+        client.set_gain('16x')
+        client.blank()
+        client.select('Absorbance')
+        print(client.average(10)['absorbance'])
+
+"""
+import os
+import tty
+import json
+import time
+import select
+
+
+class ColorimeterClientError(Exception):
+    pass
+
+
+class ColorimeterClient:
+
+    def __init__(self, path, timeout=10.0):
+        self.timeout = timeout
+        self.fd = os.open(path, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+        if os.isatty(self.fd):
+            tty.setraw(self.fd)
+        self.buffer = bytearray()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def command(self, command, arg=None, timeout=None):
+        """ Send command and return the decoded json payload of the reply """
+        line = command if arg is None else f'{command} {arg}'
+        os.write(self.fd, f'{line}\n'.encode())
+        reply = self.read_reply(timeout)
+        status, _, payload = reply.partition(' ')
+        if status == 'err':
+            raise ColorimeterClientError(payload)
+        return json.loads(payload) if payload else None
+
+    def read_reply(self, timeout=None):
+        t_end = time.monotonic() + (self.timeout if timeout is None else timeout)
+        while True:
+            # Skip anything that isn't a reply, e.g. print output from the device
+            while b'\n' in self.buffer:
+                pos = self.buffer.index(b'\n')
+                line = self.buffer[:pos].decode(errors='replace').strip()
+                del self.buffer[:pos+1]
+                if line == 'ok' or line.startswith(('ok ', 'err ')):
+                    return line
+            t_remaining = t_end - time.monotonic()
+            if t_remaining <= 0:
+                raise ColorimeterClientError('timeout waiting for reply')
+            ready, _, _ = select.select([self.fd], [], [], t_remaining)
+            if ready:
+                self.buffer.extend(os.read(self.fd, 4096))
+
+    def set_gain(self, gain):
+        return self.command('gain', gain)
+
+    def set_integration_time(self, itime):
+        return self.command('itime', itime)
+
+    def blank(self):
+        return self.command('blank')
+
+    def select(self, name):
+        return self.command('select', name)
+
+    def push_calibration(self, name, calibration):
+        return self.command('cal', json.dumps({name: calibration}))
+
+    def average(self, num=1, timeout=None):
+        """ Average of num frames, allow for num integration times in timeout """
+        return self.command('avg', num, timeout)
+
+    def stats(self):
+        return self.command('stats')
+
+    def reload(self):
+        return self.command('reload')
@@ -0,0 +1,155 @@
+"""
+Host side receiver for the colorimeter usb serial stream (see
+src/stream_output.py for the frame layout).
+
+Example:
+
+    import asyncio
+    from colorimeter_stream import read_batches
+
+    async def main():
+        async for batch in read_batches('/dev/ttyACM1', batch_size=100):
+            print(batch['seq'][-1], batch['absorbance'].mean(axis=0))
+
+    asyncio.run(main())
+
+"""
+import os
+import tty
+import termios
+import struct
+import asyncio
+import numpy as np
+
+NUM_CHANNEL = 10
+SYNC = b'\xa5\x5a'
+PAYLOAD_FORMAT = f'<IIB{NUM_CHANNEL}H{NUM_CHANNEL}f{NUM_CHANNEL}B'
+PAYLOAD_SIZE = struct.calcsize(PAYLOAD_FORMAT)
+FRAME_SIZE = len(SYNC) + PAYLOAD_SIZE + 2
+
+FRAME_DTYPE = np.dtype([
+    ('seq', '<u4'),
+    ('timestamp', '<u4'),
+    ('gain', 'u1'),
+    ('raw', '<u2', (NUM_CHANNEL,)),
+    ('absorbance', '<f4', (NUM_CHANNEL,)),
+    ('flags', 'u1', (NUM_CHANNEL,)),
+    ])
+
+# Quality flag bits (see src/quality_flags.py), e.g. drop saturated frames
+# with batch[(batch['flags'] & SATURATED).any(axis=1) == 0]
+SATURATED = 0x01
+LOW_SIGNAL = 0x02
+CLIPPED = 0x04
+NEGATIVE_A = 0x08
+OUT_OF_RANGE = 0x10
+NAN_BASELINE = 0x20
+FLICKER = 0x40
+
+
+def make_crc16_table(poly=0x1021):
+    table = []
+    for i in range(256):
+        crc = i << 8
+        for j in range(8):
+            if crc & 0x8000:
+                crc = ((crc << 1) ^ poly) & 0xffff
+            else:
+                crc = (crc << 1) & 0xffff
+        table.append(crc)
+    return table
+
+CRC16_TABLE = make_crc16_table()
+
+
+def crc16(data, crc=0xffff):
+    for byte in data:
+        crc = ((crc << 8) & 0xffff) ^ CRC16_TABLE[(crc >> 8) ^ byte]
+    return crc
+
+
+class FrameDecoder:
+
+    """
+    Incremental decoder. Bytes are fed in arbitrary chunks, complete frames
+    with a valid crc are returned as payload bytes. The decoder resynchronizes
+    on the sync word after corrupted or partial frames.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.num_frames = 0
+        self.num_crc_errors = 0
+        self.num_dropped = 0
+        self.last_seq = None
+
+    def feed(self, data):
+        self.buffer.extend(data)
+        payloads = []
+        while True:
+            pos = self.buffer.find(SYNC)
+            if pos < 0:
+                # Keep a trailing byte in case it is the first half of sync
+                del self.buffer[:max(len(self.buffer) - 1, 0)]
+                break
+            if pos > 0:
+                del self.buffer[:pos]
+            if len(self.buffer) < FRAME_SIZE:
+                break
+            payload = bytes(self.buffer[len(SYNC):FRAME_SIZE-2])
+            crc = self.buffer[FRAME_SIZE-2] | (self.buffer[FRAME_SIZE-1] << 8)
+            if crc16(payload) != crc:
+                self.num_crc_errors += 1
+                del self.buffer[:len(SYNC)]
+                continue
+            del self.buffer[:FRAME_SIZE]
+            seq = struct.unpack_from('<I', payload)[0]
+            if self.last_seq is not None:
+                self.num_dropped += (seq - self.last_seq - 1) & 0xffffffff
+            self.last_seq = seq
+            self.num_frames += 1
+            payloads.append(payload)
+        return payloads
+
+
+def payloads_to_batch(payloads):
+    """ Convert list of payloads to a numpy structured array (FRAME_DTYPE) """
+    return np.frombuffer(b''.join(payloads), dtype=FRAME_DTYPE)
+
+
+async def open_serial(path):
+    """ Open a serial device (or pty) in raw mode and return an asyncio reader """
+    fd = os.open(path, os.O_RDONLY | os.O_NOCTTY | os.O_NONBLOCK)
+    if os.isatty(fd):
+        # TCSANOW, the default TCSAFLUSH discards frames already received
+        tty.setraw(fd, termios.TCSANOW)
+    fileobj = os.fdopen(fd, 'rb', buffering=0)
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    protocol = asyncio.StreamReaderProtocol(reader)
+    transport, _ = await loop.connect_read_pipe(lambda: protocol, fileobj)
+    return reader, transport
+
+
+async def read_batches(path, batch_size=100, chunk_size=4096, decoder=None):
+    """
+    Async generator yielding numpy structured arrays of up to batch_size
+    frames read from the serial device at path.
+    """
+    if decoder is None:
+        decoder = FrameDecoder()
+    reader, transport = await open_serial(path)
+    pending = []
+    try:
+        while True:
+            data = await reader.read(chunk_size)
+            if not data:
+                break
+            pending.extend(decoder.feed(data))
+            while len(pending) >= batch_size:
+                yield payloads_to_batch(pending[:batch_size])
+                del pending[:batch_size]
+        if pending:
+            yield payloads_to_batch(pending)
+    finally:
+        transport.close()
@@ -0,0 +1,99 @@
+import struct
+import ulab.numpy as np
+import constants
+
+class BatchError(Exception):
+    pass
+
+class BatchTable:
+
+    """
+    Preallocated table of batch results. Each sample is a fixed size packed
+    record in a single bytearray:
+
+        count   uint32                  number of replicates
+        mean    num_channel x float32   mean absorbance of the replicates
+        m2      num_channel x float32   sum of squared deviations (Welford)
+
+    i.e. RECORD_SIZE = 84 bytes per sample for 10 channels. The table is
+    exported by writing the used part of the bytearray to flash in one write.
+    """
+
+    FILE_NAME = constants.BATCH_FILE
+    RECORD_FORMAT = f'<I{constants.NUM_CHANNEL}f{constants.NUM_CHANNEL}f'
+    RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+    HEAD_FORMAT = f'<I{constants.NUM_CHANNEL}f'
+    HEAD_SIZE = struct.calcsize(HEAD_FORMAT)
+    M2_FORMAT = f'<{constants.NUM_CHANNEL}f'
+
+    def __init__(self, num=constants.BATCH_MAX_SAMPLES, size=constants.NUM_CHANNEL):
+        self.num = num
+        self.size = size
+        self.data = bytearray(self.RECORD_SIZE*num)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def is_full(self):
+        return self.count == self.num
+
+    def reset(self):
+        self.count = 0
+
+    def unpack(self, index):
+        if index < 0 or index >= self.count:
+            raise IndexError('batch sample index out of range')
+        record = struct.unpack_from(self.RECORD_FORMAT, self.data, index*self.RECORD_SIZE)
+        n = record[0]
+        mean = np.array(record[1:1 + self.size])
+        m2 = np.array(record[1 + self.size:])
+        return n, mean, m2
+
+    def pack(self, index, n, mean, m2):
+        offset = index*self.RECORD_SIZE
+        struct.pack_into(self.HEAD_FORMAT, self.data, offset, n, *mean)
+        struct.pack_into(self.M2_FORMAT, self.data, offset + self.HEAD_SIZE, *m2)
+
+    def add_sample(self, values):
+        """ Add values as the first replicate of a new sample, returns its index """
+        if self.is_full:
+            raise BatchError(f'batch full ({self.num} samples)')
+        self.count += 1
+        index = self.count - 1
+        self.pack(index, 1, values, np.zeros((self.size,)))
+        return index
+
+    def add_replicate(self, index, values):
+        n, mean, m2 = self.unpack(index)
+        n += 1
+        delta = np.array(values) - mean
+        mean += delta/n
+        m2 += delta*(np.array(values) - mean)
+        self.pack(index, n, mean, m2)
+        return n
+
+    def replicates(self, index):
+        return struct.unpack_from('<I', self.data, index*self.RECORD_SIZE)[0]
+
+    def mean(self, index):
+        return self.unpack(index)[1]
+
+    def cv(self, index):
+        """ Coefficient of variation (%) of the replicates, 0 for a single replicate """
+        n, mean, m2 = self.unpack(index)
+        if n < 2:
+            return np.zeros((self.size,))
+        std = np.sqrt(m2/(n - 1))
+        mean = np.where(mean != 0.0, mean, 1.0)
+        return 100.0*std/abs(mean)
+
+    def export(self):
+        """ Write all samples to flash, returns False if the filesystem is read only """
+        try:
+            with open(self.FILE_NAME, 'wb') as f:
+                f.write(memoryview(self.data)[:self.count*self.RECORD_SIZE])
+        except OSError:
+            return False
+        return True
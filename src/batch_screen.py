@@ -0,0 +1,131 @@
+import board
+import displayio
+import constants
+import fonts
+from adafruit_display_text import label
+from adafruit_display_shapes import line 
+
+class BatchScreen:
+
+    """ 
+    Scrollable table screen, one row per item. Used for the batch results
+    and the standards of the calibration builder.
+    """
+
+    PADDING_HEADER = 4
+    PADDING_ITEM = 5
+
+    def __init__(self):
+        self.group = displayio.Group()
+
+        # Setup color palette
+        self.color_to_index = {k:i for (i,k) in enumerate(constants.COLOR_TO_RGB)}
+        self.palette = displayio.Palette(len(constants.COLOR_TO_RGB))
+        for i, palette_tuple in enumerate(constants.COLOR_TO_RGB.items()):
+            self.palette[i] = palette_tuple[1]   
+
+        # Create tile grid
+        self.bitmap = displayio.Bitmap( 
+                board.DISPLAY.width, 
+                board.DISPLAY.height, 
+                len(constants.COLOR_TO_RGB)
+                )
+        self.bitmap.fill(self.color_to_index['black'])
+        self.tile_grid = displayio.TileGrid(self.bitmap,pixel_shader=self.palette)
+        font_scale = 1
+
+        # Create header text label
+        header_str = 'Batch'
+        self.header_label = label.Label(
+                fonts.load_font(8), 
+                text = header_str, 
+                color = constants.COLOR_TO_RGB['white'], 
+                scale = font_scale,
+                anchor_point = (0.5, 1.0)
+                )
+        header_x = board.DISPLAY.width//2 
+        header_y = self.header_label.bounding_box[3] + self.PADDING_HEADER 
+        self.header_label.anchored_position = header_x, header_y
+
+        # Create line under header
+        line_y = header_y + self.PADDING_HEADER 
+        self.header_line = line.Line(
+                0, 
+                line_y, 
+                board.DISPLAY.width, 
+                line_y, 
+                constants.COLOR_TO_RGB['gray']
+                )
+
+        # Create status label (blanking, sample count, export)
+        self.status_label = label.Label(
+                fonts.load_font(8), 
+                text = 'NB', 
+                color = constants.COLOR_TO_RGB['orange'], 
+                scale = font_scale,
+                anchor_point = (0.0, 0.0),
+                )
+        status_y = board.DISPLAY.height - 15
+        self.status_label.anchored_position = (1, status_y)
+
+        # Create row labels
+        test_label = label.Label(fonts.load_font(8), text='test', scale=font_scale)
+        label_dy = test_label.bounding_box[3] + self.PADDING_ITEM
+        self.items_per_screen = (status_y - (line_y + 1))//label_dy
+
+        self.item_labels = []
+        self.item_texts = []
+        self.curr_item = None
+        for i in range(self.items_per_screen): 
+            pos_x = 2
+            pos_y = line_y + (i+1)*label_dy 
+            label_tmp = label.Label(
+                     fonts.load_font(8),
+                     text = '',
+                     color = constants.COLOR_TO_RGB['white'],
+                     scale = font_scale,
+                     anchor_point = (0.0, 1.0),
+                     anchored_position = (pos_x, pos_y),
+                     padding_right = 160
+                     )
+            self.item_labels.append(label_tmp)
+            self.item_texts.append('')
+
+        # Ceate display group and add items to it
+        self.group.append(self.tile_grid)
+        self.group.append(self.header_label)
+        self.group.append(self.header_line)
+        self.group.append(self.status_label)
+        for item_label in self.item_labels:
+            self.group.append(item_label)
+
+    def set_header(self, text):
+        if text != self.header_label.text:
+            self.header_label.text = text
+
+    def set_status(self, text):
+        if text != self.status_label.text:
+            self.status_label.text = text
+
+    def set_rows(self, text_list):
+        # Only labels whose text changed are rewritten
+        for i, item_label in enumerate(self.item_labels):
+            item_text = text_list[i] if i < len(text_list) else ''
+            if item_text != self.item_texts[i]:
+                item_label.text = item_text 
+                self.item_texts[i] = item_text
+
+    def set_curr_item(self, num):
+        if num == self.curr_item:
+            return
+        for i, item_label in enumerate(self.item_labels):
+            if i==num:
+                item_label.color = constants.COLOR_TO_RGB['black']
+                item_label.background_color = constants.COLOR_TO_RGB['yellow']
+            elif i==self.curr_item or self.curr_item is None:
+                item_label.color = constants.COLOR_TO_RGB['white']
+                item_label.background_color = constants.COLOR_TO_RGB['black']
+        self.curr_item = num
+
+    def show(self):
+        board.DISPLAY.show(self.group)
@@ -1,62 +1,124 @@
+import time
 import analogio
 import constants
-import ulab.numpy as np
+from filter_bank import LowpassFilter
 
 class BatteryMonitor:
 
+    """
+    Battery voltage, state of charge and remaining time. The ADC is sampled on
+    its own low rate schedule (SAMPLE_DT), update() can be called every loop
+    and returns quickly when no sample is due. State of charge is interpolated
+    from a LiPo discharge curve and the remaining time is estimated from the
+    smoothed rate of change of the state of charge.
+
+    Callbacks added with subscribe() are called with the state of charge (%)
+    when it falls below LOW_SOC. ain and clock can be replaced, e.g. by a
+    simulated ADC and clock, for testing.
+    """
+
     VOLT_NUM_INIT = 5 
     FREQ_CUTOFF = 0.02
+    SAMPLE_DT = constants.BATTERY_SAMPLE_DT
+    TREND_DT = constants.BATTERY_TREND_DT
+    LOW_SOC = constants.BATTERY_LOW_SOC
+    LOW_SOC_HYSTERESIS = 5.0
 
-    def __init__(self):
-        self.battery_ain = analogio.AnalogIn(constants.BATTERY_AIN_PIN) 
-        self.lowpass = None
+    def __init__(self, ain=None, clock=None):
+        if ain is None:
+            ain = analogio.AnalogIn(constants.BATTERY_AIN_PIN) 
+        self.battery_ain = ain
+        self.clock = time.monotonic if clock is None else clock
+        # Lowpass for the fixed sample interval
+        self.voltage_filter = LowpassFilter(
+                freq_cutoff=self.FREQ_CUTOFF, 
+                dt=self.SAMPLE_DT,
+                )
+        self.voltage = None
+        self.t_sample = None
+        self.t_trend = None
+        self.soc_trend = None
+        self.soc_slope = None
+        self.is_low = False
+        self.callbacks = []
+
+    def subscribe(self, callback):
+        self.callbacks.append(callback)
 
     def update(self):
-        # Initialize lowpass filter
-        if self.lowpass is None:
+        """ Sample the battery if due, returns True when a sample was taken """
+        t_now = self.clock()
+        if self.t_sample is not None and t_now - self.t_sample < self.SAMPLE_DT:
+            return False
+        self.t_sample = t_now
+        if not self.voltage_filter.is_initialized:
             # First reading or so is low for some reason. Throw a couple away 
             # rather than initialize lowpass filter to low value.
             for i in range(self.VOLT_NUM_INIT):
                 dummy = self.voltage_raw
-            self.lowpass = LowpassFilter(
-                    freq_cutoff = self.FREQ_CUTOFF, 
-                    value = self.voltage_raw,  
-                    dt = constants.LOOP_DT
-                    )
+        self.voltage = float(self.voltage_filter.update(self.voltage_raw)[0])
+        soc = self.state_of_charge
+        self.update_trend(t_now, soc)
+        self.check_low(soc)
+        return True
+
+    def update_trend(self, t_now, soc):
+        if self.t_trend is None:
+            self.t_trend = t_now
+            self.soc_trend = soc
+            return
+        dt = t_now - self.t_trend
+        if dt < self.TREND_DT:
+            return
+        slope = (soc - self.soc_trend)/dt
+        if self.soc_slope is None:
+            self.soc_slope = slope
         else:
-            # Update filter on new reading
-            self.lowpass.update(self.voltage_raw)
+            self.soc_slope += 0.25*(slope - self.soc_slope)
+        self.t_trend = t_now
+        self.soc_trend = soc
+
+    def check_low(self, soc):
+        if not self.is_low and soc < self.LOW_SOC:
+            self.is_low = True
+            for callback in self.callbacks:
+                callback(soc)
+        elif self.is_low and soc > self.LOW_SOC + self.LOW_SOC_HYSTERESIS:
+            # Charging
+            self.is_low = False
 
     @property
     def voltage_lowpass(self):
-        if self.lowpass is None:
+        if self.voltage is None:
             return 0.0
-        else:
-            return self.lowpass.value
+        return self.voltage
 
     @property
     def voltage_raw(self):
        return 2.0*ain_to_volt(self.battery_ain.value)
 
-
-class LowpassFilter:
-
-    def __init__(self, freq_cutoff=1.0, value=0.0, dt=1.0):
-        self.dt = dt
-        self.value = value
-        self.freq_cutoff = freq_cutoff
-
     @property
-    def freq_cutoff(self):
-        return self._alpha/((1.0-self._alpha)*2.0*np.pi*self.dt)
-
-    @freq_cutoff.setter
-    def freq_cutoff(self, freq):
-        self._alpha = (2.0*np.pi*self.dt*freq)/(2.0*np.pi*self.dt*freq+1)
+    def state_of_charge(self):
+        """ State of charge (%) of lowpassed voltage """
+        return voltage_to_soc(self.voltage_lowpass)
 
-    def update(self, new_value):
-        self.value = self._alpha*new_value + (1.0-self._alpha)*self.value
+    @property
+    def remaining_time(self):
+        """ Estimated remaining time (s) or None if not discharging """
+        if self.soc_slope is None or self.soc_slope >= 0.0:
+            return None
+        return self.state_of_charge/-self.soc_slope
 
 
 def ain_to_volt(value):
     return 3.3*value/65536
+
+
+def voltage_to_soc(voltage, table=constants.BATTERY_SOC_TABLE):
+    """ Linear interpolation of the (voltage, soc) discharge curve table """
+    if voltage <= table[0][0]:
+        return table[0][1]
+    for (v0, soc0), (v1, soc1) in zip(table, table[1:]):
+        if voltage <= v1:
+            return soc0 + (soc1 - soc0)*(voltage - v0)/(v1 - v0)
+    return table[-1][1]
@@ -0,0 +1,32 @@
+import time
+
+class BootTimer:
+
+    """ Records the duration of each startup phase for benchmarking boot time """
+
+    def __init__(self):
+        self.t_start = time.monotonic_ns()
+        self.t_last = self.t_start
+        self.phases = []
+        self.is_done = False
+
+    def mark(self, name):
+        t_now = time.monotonic_ns()
+        self.phases.append((name, (t_now - self.t_last)//1000000))
+        self.t_last = t_now
+
+    @property
+    def total_ms(self):
+        return (self.t_last - self.t_start)//1000000
+
+    def finish(self, name='first measurement'):
+        if self.is_done:
+            return
+        self.mark(name)
+        self.is_done = True
+        for phase, dt_ms in self.phases:
+            print(f'boot {phase}: {dt_ms}ms')
+        print(f'boot total: {self.total_ms}ms')
+
+
+boot_timer = BootTimer()
@@ -0,0 +1,140 @@
+import board
+import keypad
+import supervisor
+import constants
+
+TICKS_PERIOD = 1 << 29
+TICKS_HALF_PERIOD = TICKS_PERIOD//2
+
+def ticks_diff(t1, t0):
+    """ Difference of two supervisor.ticks_ms values, handles wrap around """
+    return ((t1 - t0 + TICKS_HALF_PERIOD) % TICKS_PERIOD) - TICKS_HALF_PERIOD
+
+
+class ButtonEvent:
+    PRESS = 0
+    RELEASE = 1
+    LONG_PRESS = 2
+    REPEAT = 3
+
+
+class ButtonInput:
+
+    """
+    Button events from the shift register buttons. The keys are scanned in
+    the background by keypad, so presses aren't lost while the main loop is
+    busy. Changes are turned into timestamped press, release, long press and
+    repeat events in a bounded queue. Masks match constants.BUTTON (key number
+    n is bit n).
+
+    source and ticks_ms can be replaced, e.g. by a scripted button source, for
+    testing. The source must provide events.get() returning objects with
+    key_number, pressed and timestamp or None when empty.
+    """
+
+    def __init__(self, source=None, ticks_ms=None, queue_size=constants.BUTTON_QUEUE_SIZE):
+        if source is None:
+            source = keypad.ShiftRegisterKeys(
+                    clock = board.BUTTON_CLOCK,
+                    data = board.BUTTON_OUT,
+                    latch = board.BUTTON_LATCH,
+                    key_count = 8,
+                    value_when_pressed = True,
+                    interval = constants.BUTTON_SCAN_INTERVAL,
+                    )
+        self.source = source
+        self.ticks_ms = supervisor.ticks_ms if ticks_ms is None else ticks_ms
+        self.queue_size = queue_size
+        self.queue_type = bytearray(queue_size)
+        self.queue_mask = bytearray(queue_size)
+        self.queue_time = [0]*queue_size
+        self.queue_head = 0
+        self.queue_len = 0
+        self.num_dropped = 0
+        self.held_mask = 0
+        self.press_time = [0]*8
+        self.next_repeat = [None]*8
+
+    def put(self, event_type, mask, timestamp):
+        if self.queue_len == self.queue_size:
+            # Queue full, drop oldest event
+            self.queue_head = (self.queue_head + 1) % self.queue_size
+            self.queue_len -= 1
+            self.num_dropped += 1
+        pos = (self.queue_head + self.queue_len) % self.queue_size
+        self.queue_type[pos] = event_type
+        self.queue_mask[pos] = mask
+        self.queue_time[pos] = timestamp
+        self.queue_len += 1
+
+    def get(self):
+        """ Returns (event_type, mask, timestamp) of the oldest event or None """
+        if not self.queue_len:
+            return None
+        pos = self.queue_head
+        self.queue_head = (self.queue_head + 1) % self.queue_size
+        self.queue_len -= 1
+        return self.queue_type[pos], self.queue_mask[pos], self.queue_time[pos]
+
+    def update(self):
+        """ Move key changes from the source into the queue and add hold events """
+        while True:
+            event = self.source.events.get()
+            if event is None:
+                break
+            num = event.key_number
+            mask = 1 << num
+            if event.pressed:
+                self.held_mask |= mask
+                self.press_time[num] = event.timestamp
+                self.next_repeat[num] = constants.LONG_PRESS_MS
+                self.put(ButtonEvent.PRESS, mask, event.timestamp)
+            else:
+                # Hold events due before the release, e.g. when the loop was busy
+                self.put_hold_events(num, event.timestamp)
+                self.held_mask &= ~mask
+                self.next_repeat[num] = None
+                self.put(ButtonEvent.RELEASE, mask, event.timestamp)
+
+        if not self.held_mask:
+            return
+        t_now = self.ticks_ms()
+        for num in range(8):
+            self.put_hold_events(num, t_now)
+
+    def put_hold_events(self, num, t_now):
+        """ Long press and repeat events of key num due by t_now """
+        next_repeat = self.next_repeat[num]
+        if next_repeat is None:
+            return
+        held_ms = ticks_diff(t_now, self.press_time[num])
+        while held_ms >= next_repeat:
+            if next_repeat == constants.LONG_PRESS_MS:
+                event_type = ButtonEvent.LONG_PRESS
+            else:
+                event_type = ButtonEvent.REPEAT
+            timestamp = (self.press_time[num] + next_repeat) % TICKS_PERIOD
+            self.put(event_type, 1 << num, timestamp)
+            next_repeat += constants.REPEAT_MS
+        self.next_repeat[num] = next_repeat
+
+    @property
+    def pending(self):
+        """ True if events are waiting, used to wake early from sleep """
+        return self.queue_len > 0 or bool(self.source.events)
+
+    def events(self):
+        """ Iterate over (event_type, mask, timestamp) of all queued events """
+        self.update()
+        while True:
+            event = self.get()
+            if event is None:
+                return
+            yield event
+
+    def clear(self):
+        self.source.events.clear()
+        self.queue_len = 0
+        self.held_mask = 0
+        for num in range(8):
+            self.next_repeat[num] = None
@@ -0,0 +1,149 @@
+import ulab.numpy as np
+import constants
+
+class CalibrationBuilderError(Exception):
+    pass
+
+class CalibrationBuilder:
+
+    """
+    On device standard curve fitting for all channels at once. Measured
+    standards (known concentration c, absorbances A per channel) are reduced
+    to running sums so memory doesn't grow with the number of standards:
+
+        sums_a[k]  = sum A^k      k = 0..4 (per channel)
+        sums_ac[k] = sum A^k c    k = 0..2 (per channel)
+        sum_c, sum_cc
+
+    Fits (vectorized over channels):
+
+        linear      A = slope*c + intercept (fit_coef [slope, intercept])
+        polynomial  c = a2*A^2 + a1*A + a0  (fit_coef [a2, a1, a0], polyval)
+    """
+
+    LINEAR = 'linear'
+    POLYNOMIAL = 'polynomial'
+    POLY_MIN_STANDARDS = 4
+    POLY_MIN_IMPROVEMENT = 0.005
+
+    def __init__(self, size=constants.NUM_CHANNEL):
+        self.size = size
+        self.sums_a = np.zeros((5, size))
+        self.sums_ac = np.zeros((3, size))
+        self.a_pow = np.zeros((size,))
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.sum_c = 0.0
+        self.sum_cc = 0.0
+        self.c_min = None
+        self.c_max = None
+        self.standards = {}
+        for k in range(5):
+            self.sums_a[k, :] = 0.0
+        for k in range(3):
+            self.sums_ac[k, :] = 0.0
+
+    def add(self, conc, absorbances):
+        """ Add a measurement of a standard with concentration conc """
+        self.count += 1
+        self.sum_c += conc
+        self.sum_cc += conc*conc
+        self.c_min = conc if self.c_min is None else min(self.c_min, conc)
+        self.c_max = conc if self.c_max is None else max(self.c_max, conc)
+        self.standards[conc] = self.standards.get(conc, 0) + 1
+        self.a_pow[:] = 1.0
+        for k in range(5):
+            self.sums_a[k, :] += self.a_pow
+            if k < 3:
+                self.sums_ac[k, :] += conc*self.a_pow
+            self.a_pow *= absorbances
+
+    @property
+    def num_standards(self):
+        return len(self.standards)
+
+    @property
+    def sst(self):
+        """ Total sum of squares of the concentrations """
+        return self.sum_cc - self.sum_c*self.sum_c/self.count
+
+    def linear_fit(self):
+        """ Returns slope, intercept and r_squared arrays (A vs c) """
+        if self.num_standards < 2:
+            raise CalibrationBuilderError('at least 2 standards needed')
+        n = self.count
+        sxy = n*self.sums_ac[1] - self.sum_c*self.sums_a[1]
+        sxx = n*self.sum_cc - self.sum_c*self.sum_c
+        syy = n*self.sums_a[2] - self.sums_a[1]*self.sums_a[1]
+        slope = sxy/sxx
+        intercept = (self.sums_a[1] - slope*self.sum_c)/n
+        syy = np.where(syy > 0.0, syy, 1.0)
+        r_squared = sxy*sxy/(sxx*syy)
+        return slope, intercept, r_squared
+
+    def poly_fit(self):
+        """ Returns (a2, a1, a0) arrays and r_squared of c = a2*A^2 + a1*A + a0 """
+        if self.num_standards < 3:
+            raise CalibrationBuilderError('at least 3 standards needed')
+        s = self.sums_a
+        r = self.sums_ac
+        # Normal equations M a = r with M[j][k] = s[j+k], solved with Cramer's
+        # rule elementwise over the channels.
+        det = det3(s[0], s[1], s[2], s[1], s[2], s[3], s[2], s[3], s[4])
+        # Channels whose absorbance doesn't vary give a singular system
+        valid = abs(det) > 1.0e-6*abs(s[0]*s[2]*s[4])
+        det = np.where(valid, det, 1.0)
+        a0 = det3(r[0], s[1], s[2], r[1], s[2], s[3], r[2], s[3], s[4])/det
+        a1 = det3(s[0], r[0], s[2], s[1], r[1], s[3], s[2], r[2], s[4])/det
+        a2 = det3(s[0], s[1], r[0], s[1], s[2], r[1], s[2], s[3], r[2])/det
+        sse = self.sum_cc - (a0*r[0] + a1*r[1] + a2*r[2])
+        sst = self.sst if self.sst > 0.0 else 1.0
+        r_squared = np.where(valid, 1.0 - sse/sst, 0.0)
+        return (a2, a1, a0), r_squared
+
+    def best(self):
+        """ Returns (channel, fit_type, fit_coef, r_squared) of the best fit """
+        slope, intercept, r_squared = self.linear_fit()
+        chan = int(np.argmax(r_squared))
+        fit_type = self.LINEAR
+        fit_coef = [float(slope[chan]), float(intercept[chan])]
+        best_r_squared = float(r_squared[chan])
+        if self.num_standards >= self.POLY_MIN_STANDARDS:
+            coef, poly_r_squared = self.poly_fit()
+            poly_chan = int(np.argmax(poly_r_squared))
+            poly_best = float(poly_r_squared[poly_chan])
+            if poly_best > best_r_squared + self.POLY_MIN_IMPROVEMENT:
+                chan = poly_chan
+                fit_type = self.POLYNOMIAL
+                fit_coef = [float(a[chan]) for a in coef]
+                best_r_squared = poly_best
+        return chan, fit_type, fit_coef, best_r_squared
+
+    def calibration(self, units=None, led=None):
+        """ Calibration entry for the calibrations file using the best channel """
+        chan, fit_type, fit_coef, r_squared = self.best()
+        fit_range = {'min': self.c_min, 'max': self.c_max}
+        chan_str = constants.CHANNEL_TO_STR[chan]
+        return {
+                'units': units,
+                'led': led,
+                'channel': chan,
+                'fit_type': fit_type,
+                'fit_coef': fit_coef,
+                'range': fit_range,
+                'r_squared': r_squared,
+                'channels': {
+                    chan_str: {
+                        'fit_type': fit_type, 
+                        'fit_coef': fit_coef, 
+                        'range': fit_range,
+                        },
+                    },
+                }
+
+
+def det3(a, b, c, d, e, f, g, h, i):
+    """ Determinant of [[a, b, c], [d, e, f], [g, h, i]], elementwise """
+    return a*(e*i - f*h) - b*(d*i - f*g) + c*(d*h - e*g)
@@ -4,166 +4,281 @@ import json
 import constants
 from collections import OrderedDict
 from json_settings_file import JsonSettingsFile
+from journal_store import JournalStore
+from journal_store import JournalStoreError
+from journal_store import OverlayView
+from schema import Schema
 import math  # Verwende math für isnan() und isinf()
-from message_screen import MessageScreen
 
 class CalibrationsError(Exception):
     pass
 
+
+ALLOWED_FIT_TYPES = ['linear', 'polynomial']
+
+
+def check_range_order(range_data):
+    if range_data['min'] >= range_data['max']:
+        return 'min >= max'
+    return None
+
+
+def check_linear_coef(fit):
+    if fit.get('fit_type') == 'linear' and len(fit.get('fit_coef', ())) > 2:
+        return 'too many fit_coef for linear fit'
+    return None
+
+
+def check_fit_range(fit):
+    if fit.get('fit_type') == 'polynomial' and 'range' not in fit:
+        return 'range data missing'
+    return None
+
+
+def check_fit_present(calibration):
+    if 'fit_type' not in calibration and 'channels' not in calibration:
+        return 'missing fit_type or channels'
+    if 'fit_type' in calibration and 'fit_coef' not in calibration:
+        return 'missing fit_coef'
+    return None
+
+
+RANGE_SCHEMA = Schema(
+        {
+            'min': {'type': 'number', 'required': True},
+            'max': {'type': 'number', 'required': True},
+        },
+        rules = [('range', check_range_order)],
+        )
+
+
+def fit_fields(required):
+    """ Field specs shared by the calibration and its per channel fits """
+    return {
+            'fit_type': {'type': 'str', 'required': required, 'enum': ALLOWED_FIT_TYPES},
+            'fit_coef': {'type': 'list', 'required': required, 'items': {'type': 'number'}},
+            'range': {'type': 'dict', 'schema': RANGE_SCHEMA},
+            }
+
+
+FIT_RULES = [
+        ('fit_coef', check_linear_coef), 
+        ('range', check_fit_range),
+        ]
+
+CHANNEL_SPEC = {'type': 'str', 'enum': constants.STR_TO_CHANNEL, 'ignore_case': True}
+
+CHANNEL_FIT_SCHEMA = Schema(fit_fields(True), rules=FIT_RULES)
+
+CALIBRATION_FIELDS = fit_fields(False)
+CALIBRATION_FIELDS.update({
+        'units': {'type': 'str', 'null': True},
+        'led': {'type': 'str', 'null': True},
+        'led_current': {
+            'type': 'int', 
+            'min': constants.LED_MIN_CURRENT, 
+            'max': constants.LED_MAX_CURRENT,
+            },
+        'channel': {'type': 'int', 'min': 0, 'max': constants.NUM_CHANNEL - 1},
+        'r_squared': {'type': 'number'},
+        'channels': {
+            'type': 'dict', 
+            'keys': CHANNEL_SPEC,
+            'values': {'type': 'dict', 'schema': CHANNEL_FIT_SCHEMA},
+            },
+        'expected_ratios': {
+            'type': 'dict',
+            'keys': CHANNEL_SPEC,
+            'values': {'type': 'number'},
+            },
+        })
+
+CALIBRATION_SCHEMA = Schema(
+        CALIBRATION_FIELDS, 
+        rules = [('fit_type', check_fit_present)] + FIT_RULES,
+        )
+
+
 class Calibrations(JsonSettingsFile):
 
     FILE_TYPE = 'calibrations'
     FILE_NAME = constants.CALIBRATIONS_FILE
     LOAD_ERROR_EXCEPTION = CalibrationsError
-    ALLOWED_FIT_TYPES = ['linear', 'polynomial']
+    ALLOWED_FIT_TYPES = ALLOWED_FIT_TYPES
+    DEVIATION_CHANNELS = ("415nm", "445nm", "480nm", "515nm", "555nm", "590nm", "630nm", "680nm", "910nm", "Clear")
+
+    SOURCE_RECORD = JournalStore.META_PREFIX + 'source'
 
     def __init__(self):
-        self.menu_screen = None
-        self.message_screen = MessageScreen()  # Stellt sicher, dass message_screen initialisiert ist
-        self.measure_screen = None
-        self.mode = Mode.MEASURE
-        board.DISPLAY.brightness = 1.0
+        super().__init__()
+        self.store = JournalStore(constants.CALIBRATIONS_JOURNAL)
+        self.index = JournalStore(constants.CALIBRATIONS_INDEX)
+        self.fits_name = None
+        self.fits_list = None
+        self.concentrations = [None]*constants.NUM_CHANNEL
+        self.out_of_range_mask = [False]*constants.NUM_CHANNEL
+
+    def load(self):
+        """
+        Load the calibrations. calibrations.json is only parsed when it has
+        changed (size or mtime), its checked entries and errors are then
+        written to calibrations.idx, a journal store, and later loads only
+        replay the index of that file. The journal of calibrations added on
+        the device is replayed and validated on top of it.
+        """
+        stamp = self.file_stamp()
+        self.index.load()
+        try:
+            source = self.index.get(self.SOURCE_RECORD)
+        except (KeyError, ValueError):
+            source = None
+        if source is not None and source.get('stamp') == stamp:
+            base = self.index
+            self.error_dict = OrderedDict(source.get('errors', []))
+        else:
+            super().load()
+            base = self.data
+            source = {
+                    'stamp': stamp, 
+                    'errors': [[k, v] for k, v in self.error_dict.items()],
+                    }
+            items = list(self.data.items())
+            items.append((self.SOURCE_RECORD, source))
+            if self.index.rewrite(items):
+                base = self.index
+        self.store.load()
+        self.replay_journal()
+        self.data = OverlayView(base, self.store)
+        self.fits_name = None
+
+    def file_stamp(self):
+        """ Size and modification time of the calibrations file, None if missing """
+        try:
+            stat = os.stat(self.FILE_NAME)
+        except OSError:
+            return None
+        return [stat[6], stat[8]]
+
+    def replay_journal(self):
+        """ Validate the journal records, invalid records are dropped """
+        for name in list(self.store):
+            try:
+                calibration = self.store.get(name)
+            except ValueError:
+                error_list = [f'{name} unreadable journal record']
+            else:
+                error_list = self.validate(name, calibration)
+            if error_list:
+                self.error_dict[name] = error_list
+                self.store.drop(name)
+
+    def save(self):
+        """ Compact the journal, the calibrations file is never rewritten """
+        if not self.store.compact():
+            raise CalibrationsError(f'unable to write {self.FILE_TYPE} journal')
 
     def check(self):
         for name, calibration in self.data.items():
-            error_list = []
-            error_list.extend(self.check_fit(name, calibration))
-            
-            # Holen Sie `fit_type` aus `calibration` und übergeben es an `check_range`
-            fit_type = calibration.get('fit_type')
-            error_list.extend(self.check_range(name, calibration, fit_type))
-            
-            error_list.extend(self.check_channel(name, calibration))
+            error_list = self.validate(name, calibration)
             if error_list:
                 self.error_dict[name] = error_list
 
         for name in self.error_dict:
             del self.data[name]
 
-    def check_fit(self, name, calibration): 
-        error_list = []
-        try:
-            fit_type = calibration['fit_type']
-        except KeyError:
-            fit_type = None
-            error_msg = f'{name} missing fit_type'
-            error_list.append(error_msg)
-        else:
-            if fit_type not in self.ALLOWED_FIT_TYPES:
-                error_msg = f'{name} unknown fit_type {fit_type}'
-                error_list.append(error_msg)
-        try:
-            fit_coef = calibration['fit_coef']
-        except KeyError:
-            fit_coef = None
-            error_msg = f'{name} missing fit_coef' 
-            error_list.append(error_msg)
-        else:
-            try:
-                fit_coef = ulab.numpy.array(fit_coef)
-            except (ValueError, TypeError):
-                error_msg = f'{name} fit coeff format incorrect'
-                error_list.append(error_msg)
-        if fit_type == 'linear' and fit_coef.size > 2:
-            error_msg = f'{name} too many fit_coef for linear fit'
-            error_list.append(error_msg)
-        return error_list
-
-    def check_range(self, name, calibration, fit_type=None):
-        min_value = None
-        max_value = None
-        error_list = []
-
-        try:
-            range_data = calibration['range']
-        except KeyError:
-            # Verwenden Sie `fit_type`, das beim Aufruf an die Funktion übergeben wurde
-            if fit_type != 'linear':
-                error_msg = f'{name} range data missing'
-                error_list.append(error_msg)
-        else:
-            if not isinstance(range_data, dict):
-                error_msg = f'range_data must be dict'
-                error_list.append(error_msg)
-                return error_list
-
-            try:
-                min_value = float(range_data['min'])
-            except KeyError:
-                error_msg = f'{name} range min missing'
-                error_list.append(error_msg)
-            except (ValueError, TypeError): 
-                error_msg = f'{name} range min not float' 
-                error_list.append(error_msg)
+    def validate(self, name, calibration):
+        """ Returns the list of error messages for a calibration """
+        if name[:1] == JournalStore.META_PREFIX:
+            return [f'{name} name must not start with {JournalStore.META_PREFIX}']
+        return [msg for key, msg in CALIBRATION_SCHEMA.validate(calibration, f'{name} ')]
 
-            try:
-                max_value = float(range_data['max'])
-            except KeyError:
-                error_msg = f'{name} range max missing'
-                error_list.append(error_msg)
-            except (ValueError, TypeError): 
-                error_msg = f'{name} range max not float' 
-                error_list.append(error_msg)
-
-            if min_value is not None and max_value is not None:
-                if min_value >= max_value:
-                    error_msg = f'{name} range min > max'
-                    error_list.append(error_msg)
-
-        return error_list
-
-    def check_channel(self, name, calibration):
-        error_list = []
+    def add(self, name, calibration):
+        """
+        Check a calibration and append it to the journal, replacing any with 
+        the same name. Returns False if it could only be kept in memory.
+        """
+        error_list = self.validate(name, calibration)
+        if error_list:
+            raise CalibrationsError(error_list[0])
+        if name == self.fits_name:
+            self.fits_name = None
         try:
-            channel = calibration['channel']
-        except KeyError:
-            pass
-        else:
-            if channel not in range(0, constants.NUM_CHANNEL):
-                error_msg = f'channel {channel} not allowed'
-                error_list.append(error_msg)
-        return error_list
+            return self.store.append(name, calibration)
+        except JournalStoreError as error:
+            raise CalibrationsError(error)
 
     def led(self, name):
         return self.data[name].get('led')
 
+    def led_current(self, name):
+        return self.data[name].get('led_current')
+
     def units(self, name):
         return self.data[name].get('units')
 
     def channel(self, name): 
         return self.data[name].get('channel')
 
-    def apply(self, name, absorbance_dict):
-        # absorbance_dict ist ein Dictionary mit Kanalnamen als Schlüssel und Absorptionswerten als Werten
-        concentrations = {}
-        calibration_data = self.data[name]
-        channels = calibration_data.get('channels', {})
-        
-        for channel_name, channel_data in channels.items():
+    def fits(self, name):
+        """ 
+        Per channel fits of a calibration, list of (channel, fit_type, 
+        fit_coef, range_min, range_max). Built once and kept for the last 
+        calibration used, so applying it doesn't parse the entry per frame.
+        """
+        if name == self.fits_name:
+            return self.fits_list
+        fits = []
+        for channel_name, channel_data in self.data[name].get('channels', {}).items():
+            chan = constants.STR_TO_CHANNEL[channel_name.lower()]
             fit_type = channel_data.get('fit_type', 'linear')
             fit_coef = ulab.numpy.array(channel_data.get('fit_coef', [1, 0]))
-            absorbance = absorbance_dict.get(channel_name, None)
-            if absorbance is not None:
-                if fit_type == 'linear':
-                    # Konzentration = (Absorbance - intercept) / slope
-                    slope = fit_coef[0]
-                    intercept = fit_coef[1]
-                    if slope != 0:
-                        concentration = (absorbance - intercept) / slope
-                    else:
-                        concentration = None
+            fit_range = channel_data.get('range', {})
+            fits.append((chan, fit_type, fit_coef, fit_range.get('min'), fit_range.get('max')))
+        self.fits_name = name
+        self.fits_list = fits
+        return fits
+
+    def apply(self, name, absorbances):
+        """
+        Concentrations by channel from the absorbances by channel, None for
+        channels without a fit or out of range. The returned list is reused.
+        """
+        concentrations = self.concentrations
+        for i in range(len(concentrations)):
+            concentrations[i] = None
+        for chan, fit_type, fit_coef, range_min, range_max in self.fits(name):
+            absorbance = absorbances[chan]
+            if fit_type == 'linear':
+                # Konzentration = (Absorbance - intercept) / slope
+                slope = fit_coef[0]
+                intercept = fit_coef[1]
+                if slope != 0:
+                    concentration = (absorbance - intercept) / slope
                 else:
                     concentration = None
-                # Überprüfen, ob die Konzentration im gültigen Bereich liegt
-                range_min = channel_data.get('range', {}).get('min', None)
-                range_max = channel_data.get('range', {}).get('max', None)
-                if concentration is not None:
-                    if (range_min is not None and concentration < range_min) or \
-                    (range_max is not None and concentration > range_max):
-                        concentration = None
-                concentrations[channel_name] = concentration
+            elif fit_type == 'polynomial':
+                # Konzentration = polyval(fit_coef, Absorbance)
+                concentration = float(ulab.numpy.polyval(fit_coef, absorbance))
+            else:
+                concentration = None
+            # Überprüfen, ob die Konzentration im gültigen Bereich liegt
+            if concentration is not None:
+                if (range_min is not None and concentration < range_min) or \
+                (range_max is not None and concentration > range_max):
+                    concentration = None
+            concentrations[chan] = concentration
         return concentrations
 
+    def out_of_range(self, name, concentrations):
+        """ Channels with a fit but no concentration, the returned list is reused """
+        mask = self.out_of_range_mask
+        for i in range(len(mask)):
+            mask[i] = False
+        for fit in self.fits(name):
+            chan = fit[0]
+            mask[chan] = concentrations[chan] is None
+        return mask
+
     def get_expected_ratios(self, name):
         """Retrieve the expected channel absorbance ratios for a given substance."""
         return self.data[name].get('expected_ratios', {})
@@ -173,12 +288,11 @@ class Calibrations(JsonSettingsFile):
         deviations = {}
         expected_ratios = self.get_expected_ratios(name)
 
-        # Map each absorbance to its channel name in ascending order, including 910nm and Clear
-        channel_names = ["415nm", "445nm", "480nm", "515nm", "555nm", "590nm", "630nm", "680nm", "910nm", "Clear"]
-        absorbance_dict = {ch: ab for ch, ab in zip(channel_names, absorbances)}
+        # Absorbances are in ascending channel order, including 910nm and Clear
+        channel_names = self.DEVIATION_CHANNELS
 
         # Use 590nm as the baseline for deviation calculations
-        baseline_absorbance = absorbance_dict.get("590nm", None)
+        baseline_absorbance = absorbances[constants.STR_TO_CHANNEL['590nm']]
 
         # Only proceed if the baseline is valid
         if baseline_absorbance is None or baseline_absorbance == 0 or math.isnan(baseline_absorbance) or math.isinf(baseline_absorbance):
@@ -186,17 +300,16 @@ class Calibrations(JsonSettingsFile):
             return {"error": "Baseline missing, zero, or infinite"}
 
         # Calculate deviations based on the baseline and expected ratios
-        for channel in channel_names:
+        for i, channel in enumerate(channel_names):
             if channel in expected_ratios:
                 expected_ratio = expected_ratios[channel]
-                if channel in absorbance_dict:
-                    measured_ratio = absorbance_dict[channel] / baseline_absorbance
-                    # Check for inf or NaN values
-                    if math.isnan(measured_ratio) or math.isinf(measured_ratio):
-                        deviations[channel] = "N/A"  # Set "N/A" if the value is invalid
-                    else:
-                        deviation = ((measured_ratio - expected_ratio) / expected_ratio) * 100
-                        # Round to 1 decimal if under 10%, else no decimals
-                        deviations[channel] = round(deviation, 1) if abs(deviation) < 10 else round(deviation)
+                measured_ratio = absorbances[i] / baseline_absorbance
+                # Check for inf or NaN values
+                if math.isnan(measured_ratio) or math.isinf(measured_ratio):
+                    deviations[channel] = "N/A"  # Set "N/A" if the value is invalid
+                else:
+                    deviation = ((measured_ratio - expected_ratio) / expected_ratio) * 100
+                    # Round to 1 decimal if under 10%, else no decimals
+                    deviations[channel] = round(deviation, 1) if abs(deviation) < 10 else round(deviation)
 
         return deviations
@@ -1,120 +1,189 @@
 import gc
+import json
+import math
 import time
 import ulab
 import board
-import analogio
-import digitalio
-import gamepadshift
 import constants
-import adafruit_itertools
+import flash
+from boot_timer import boot_timer
 
 from light_sensor import LightSensor
 from light_sensor import LightSensorOverflow
 from light_sensor import LightSensorIOError
 
+from button_input import ButtonInput
+from button_input import ButtonEvent
+
 from battery_monitor import BatteryMonitor
+from power_manager import PowerManager
+from measurement_averager import MeasurementAverager
+from dark_correction import DarkCorrection
+from light_source import LightSource
+from light_source import LightSourceError
+from crosstalk import CrosstalkCorrection
+from drift_tracker import DriftTracker
+from crosstalk import CrosstalkError
+from quality_flags import QualityFlags
+from frame import FrameBuffer
+import quality_flags
 
 from configuration import Configuration
 from configuration import ConfigurationError
 
-from calibrations import Calibrations
-from calibrations import CalibrationsError
+from stream_output import StreamOutput
+from stream_output import StreamOutputError
+
+from host_control import HostControl
+from host_control import HostControlError
+from sensor_tasks import AverageTask
+from sensor_tasks import BlankTask
 
-from menu_screen import MenuScreen
-from message_screen import MessageScreen
+# Note, menu, message, kinetics and batch screens, calibrations, kinetics and
+# batch are imported on first use to keep the time to first measurement short.
 from multi_measure_screen import MultiMeasureScreen
+from menu_model import MenuModel
 
 class Mode:
     MEASURE = 0
     MENU = 1
     MESSAGE = 2
     ABORT = 3
+    KINETICS = 4
+    BATCH = 5
+    CALIBRATE = 6
 
 class Colorimeter:
     ABOUT_STR = 'About'
     RAW_SENSOR_STR = 'Raw Sensor'
     ABSORBANCE_STR = 'Absorbance'
     TRANSMITTANCE_STR = 'Transmittance'
+    STREAM_STR = 'Stream'
+    KINETICS_STR = 'Kinetics'
+    BATCH_STR = 'Batch'
+    CALIBRATE_STR = 'New Calibration'
 
     DEFAULT_MEASUREMENTS = [ABSORBANCE_STR, TRANSMITTANCE_STR, RAW_SENSOR_STR]
+    MODE_ITEMS = (ABOUT_STR, KINETICS_STR, BATCH_STR, CALIBRATE_STR)
+    MAX_HOST_AVERAGE = 1000
 
     def __init__(self):
         self.menu_screen = None
-        self.message_screen = MessageScreen()
+        self.message_screen = None
         self.measure_screen = None
+        self.kinetics_screen = None
+        self.batch_screen = None
         self._mode = Mode.MEASURE  # Korrekte Initialisierung des internen Attributs
         board.DISPLAY.brightness = 1.0
 
-        # Initialize menu items using the class attribute DEFAULT_MEASUREMENTS
-        self.menu_items = list(self.DEFAULT_MEASUREMENTS)
+        self.menu_items = []
+        self.menu_model = None
         self.menu_view_pos = 0
         self.menu_item_pos = 0
         self.is_blanked = False
         self.blank_values = ulab.numpy.ones((constants.NUM_CHANNEL,))
+        self.position_blanks = ulab.numpy.ones((1, constants.NUM_CHANNEL))
+        self.position_names = ['pos0']
+        self.reference_position = None
+        self.quality = QualityFlags()
+        self.value_flags = QualityFlags()
+        self.frames = FrameBuffer()
+        self.kinetics = None
+        self.kinetics_channel = 0
+        self.batch = None
+        self.batch_item_pos = 0
+        self.batch_view_pos = 0
+        self.batch_channel = 0
+        self.batch_status = ''
+        self.cal_builder = None
+        self.cal_item_pos = 0
+        self.cal_status = ''
+        self.spectrum_view = False
 
-        # Setup gamepad inputs
-        self.last_button_press = time.monotonic()
-        self.pad = gamepadshift.GamePadShift(
-            digitalio.DigitalInOut(board.BUTTON_CLOCK),
-            digitalio.DigitalInOut(board.BUTTON_OUT),
-            digitalio.DigitalInOut(board.BUTTON_LATCH),
-        )
+        # Setup button inputs (scanned in the background)
+        self.button_input = ButtonInput()
 
         # Load Configuration
         self.configuration = Configuration()
         try:
             self.configuration.load()
         except ConfigurationError as error:
-            self.message_screen.set_message(error)
-            self.message_screen.set_to_error()
-            self.mode = Mode.MESSAGE  # Verwende self.mode statt mode
-
-        # Load calibrations and populate menu items
-        self.calibrations = Calibrations()
-        try:
-            self.calibrations.load()
-        except CalibrationsError as error:
-            self.message_screen.set_message(error)
-            self.message_screen.set_to_error()
-            self.mode = Mode.MESSAGE  # Verwende self.mode
+            self.show_error(error)
         else:
-            if self.calibrations.has_errors:
-                error_msg = 'errors found in calibrations file'
-                self.message_screen.set_message(error_msg)
-                self.message_screen.set_to_error()
-                self.mode = Mode.MESSAGE  # Verwende self.mode
+            if self.configuration.has_errors:
+                self.show_error('errors found in configuration file')
+        boot_timer.mark('configuration')
 
-        # Extend menu with calibration data
-        self.menu_items.extend([k for k in self.calibrations.data])
-        self.menu_items.append(self.ABOUT_STR)
+        self.spectrum_view = self.configuration.spectrum_view
+
+        # Calibrations are loaded on first use (menu or calibrated measurement)
+        self.calibrations = None
+        self.setup_menu_items()
 
         # Set default/startup measurement
-        if self.configuration.startup in self.menu_items:
-            self.measurement_name = self.configuration.startup
+        startup = self.configuration.startup
+        if startup is not None and startup not in self.menu_items:
+            self.load_calibrations()
+        if startup in self.menu_items:
+            self.measurement_name = startup
         else:
-            if self.configuration.startup is not None:
-                error_msg = f'startup measurement {self.configuration.startup} not found'
-                self.message_screen.set_message(error_msg)
-                self.message_screen.set_to_error()
-                self.mode = Mode.MESSAGE  # Verwende self.mode
+            if startup is not None:
+                self.show_error(f'startup measurement {startup} not found')
             self.measurement_name = self.menu_items[0]
 
-        # Setup light sensor and preliminary blanking
+        # Setup averaging of sensor readings and dark correction
+        self.setup_averager()
+        self.setup_dark_correction()
+        self.setup_crosstalk()
+        self.setup_drift_tracker()
+
+        # Setup light sensor, light source and preliminary blanking
+        self.light_source = None
         try:
-            self.light_sensor = LightSensor()
+            self.setup_light_sensor()
         except LightSensorIOError as error:
-            error_msg = f'missing sensor? {error}'
-            self.message_screen.set_message(error_msg, ok_to_continue=False)
-            self.message_screen.set_to_abort()
-            self.mode = Mode.ABORT  # Verwende self.mode
+            self.show_error(f'missing sensor? {error}', abort=True)
         else:
-            if self.configuration.gain is not None:
-                self.light_sensor.gain = self.configuration.gain
+            self.apply_configuration()
+            self.setup_light_source()
+            boot_timer.mark('sensor')
             self.blank_sensor(set_blanked=False)
+            boot_timer.mark('blank')
 
-        # Setup battery monitoring settings cycles
+        # Setup battery monitoring
         self.battery_monitor = BatteryMonitor()
-        self.setup_menu_cycles()
+        self.battery_monitor.subscribe(self.on_battery_low)
+
+        # Setup duty cycling of loop, sensor and display
+        self.power_manager = PowerManager(enabled=self.configuration.power_save)
+
+        # Setup usb serial streaming
+        self.stream_output = StreamOutput()
+        self.last_display_update = 0.0
+        if self.configuration.stream:
+            self.start_stream()
+
+        # Setup host control commands on the serial console
+        self.loop_count = 0
+        self.t_start = time.monotonic()
+        self.host_control = HostControl()
+        self.host_control.add_handler('gain', self.host_set_gain)
+        self.host_control.add_handler('itime', self.host_set_integration_time)
+        self.host_control.add_handler('blank', self.host_blank)
+        self.host_control.add_handler('select', self.host_select)
+        self.host_control.add_handler('cal', self.host_push_calibration)
+        self.host_control.add_handler('avg', self.host_average)
+        self.host_control.add_handler('stats', self.host_stats)
+        self.host_control.add_handler('reload', self.host_reload)
+        self.host_control.add_handler('bench', self.host_bench)
+        self.host_control.add_handler('flags', self.host_flags)
+        self.host_control.add_handler('calstd', self.host_cal_standard)
+        self.host_control.add_handler('calfit', self.host_cal_fit)
+        self.host_control.add_handler('positions', self.host_positions)
+
+        if self._mode == Mode.MEASURE:
+            self.mode = Mode.MEASURE
+        boot_timer.mark('screen')
 
     @property
     def mode(self):
@@ -122,12 +191,29 @@ class Colorimeter:
 
     @mode.setter
     def mode(self, new_mode):
+        if new_mode == Mode.MENU and self.calibrations is None:
+            # Calibrations are needed by the menu, show any load errors first
+            if not self.load_calibrations():
+                return
         self.delete_screens()
         if new_mode == Mode.MEASURE:
-            self.measure_screen = MultiMeasureScreen()
+            if self.spectrum_view:
+                from spectrum_screen import SpectrumScreen
+                self.measure_screen = SpectrumScreen()
+                self.measure_screen.set_reference(self.expected_ratio_values)
+            else:
+                self.measure_screen = MultiMeasureScreen()
         elif new_mode in (Mode.MESSAGE, Mode.ABORT):
+            from message_screen import MessageScreen
             self.message_screen = MessageScreen()
+        elif new_mode == Mode.KINETICS:
+            from kinetics_screen import KineticsScreen
+            self.kinetics_screen = KineticsScreen()
+        elif new_mode in (Mode.BATCH, Mode.CALIBRATE):
+            from batch_screen import BatchScreen
+            self.batch_screen = BatchScreen()
         elif new_mode == Mode.MENU:
+            from menu_screen import MenuScreen
             self.menu_screen = MenuScreen()
             self.menu_view_pos = 0
             self.menu_item_pos = 0
@@ -136,54 +222,274 @@ class Colorimeter:
         self._mode = new_mode
 
 
-    def setup_menu_cycles(self):
-        self.gain_cycle = adafruit_itertools.cycle(constants.GAIN_TO_STR)
+    def setup_menu_items(self):
+        self.menu_items = list(self.DEFAULT_MEASUREMENTS)
+        if self.calibrations is not None:
+            self.menu_items.extend([k for k in self.calibrations.data])
+        self.menu_items.append(self.KINETICS_STR)
+        self.menu_items.append(self.BATCH_STR)
+        self.menu_items.append(self.CALIBRATE_STR)
+        self.menu_items.append(self.STREAM_STR)
+        self.menu_items.append(self.ABOUT_STR)
+        # Display strings are built on next menu update
+        self.menu_model = None
+        self.menu_item_pos = min(self.menu_item_pos, len(self.menu_items) - 1)
+        self.menu_view_pos = min(self.menu_view_pos, self.menu_item_pos)
+
+    def load_calibrations(self):
+        """Load calibrations file on first use and add calibrations to menu."""
+        if self.calibrations is not None:
+            return True
+        from calibrations import Calibrations
+        from calibrations import CalibrationsError
+        self.calibrations = Calibrations()
+        is_ok = True
+        try:
+            self.calibrations.load()
+        except CalibrationsError as error:
+            self.show_error(error)
+            is_ok = False
+        else:
+            if self.calibrations.has_errors:
+                self.show_error('errors found in calibrations file')
+                is_ok = False
+        self.setup_menu_items()
+        return is_ok
+
+    def show_error(self, error_msg, abort=False):
+        if abort:
+            self.mode = Mode.ABORT
+            self.message_screen.set_message(error_msg, ok_to_continue=False)
+            self.message_screen.set_to_abort()
+        elif self._mode != Mode.ABORT:
+            self.mode = Mode.MESSAGE
+            self.message_screen.set_message(error_msg)
+            self.message_screen.set_to_error()
+
+    def next_gain(self):
+        gains = list(constants.GAIN_TO_STR)
+        try:
+            pos = gains.index(self.light_sensor.gain)
+        except ValueError:
+            pos = -1
+        return gains[(pos + 1) % len(gains)]
+
+    def apply_configuration(self):
         if self.configuration.gain is not None:
-            while next(self.gain_cycle) != self.configuration.gain:
-                continue
+            self.light_sensor.gain = self.configuration.gain
+        self.light_sensor.flicker_snap = self.configuration.flicker == 'auto'
+        if self.configuration.integration_time is not None:
+            self.light_sensor.integration_time = self.configuration.integration_time
+
+    def setup_averager(self):
+        mode = self.configuration.averaging
+        if mode not in MeasurementAverager.ALLOWED_MODES:
+            mode = MeasurementAverager.NONE
+        self.averager = MeasurementAverager(
+                mode = mode,
+                num = self.configuration.num_average,
+                freq_cutoff = self.configuration.freq_cutoff,
+                )
+
+    def setup_dark_correction(self):
+        mode = self.configuration.dark_correction
+        if mode not in DarkCorrection.ALLOWED_MODES:
+            mode = DarkCorrection.NONE
+        self.dark_correction = DarkCorrection(
+                mode = mode,
+                dark_counts = self.configuration.dark_counts,
+                stray_light = self.configuration.stray_light,
+                )
+
+    def setup_drift_tracker(self):
+        channel = self.configuration.drift_channel
+        if channel is None:
+            self.drift_tracker = None
+        else:
+            self.drift_tracker = DriftTracker(channel)
+
+    def setup_light_sensor(self):
+        """Single light sensor or an array of sensor positions (configuration 'sensors')."""
+        specs = self.configuration.sensors
+        if specs is None:
+            self.light_sensor = LightSensor()
+        else:
+            from sensor_array import SensorArray
+            self.light_sensor = SensorArray(specs)
+            self.position_names = self.light_sensor.names
+        num = len(self.position_names)
+        self.position_blanks = ulab.numpy.ones((num, constants.NUM_CHANNEL))
+        reference = self.configuration.reference_position
+        if reference is not None and reference >= num:
+            self.show_error(f'reference position {reference} not found')
+            reference = None
+        self.reference_position = reference
+
+    def setup_light_source(self):
+        if self.light_source is not None:
+            self.light_source.led = False
+            self.light_source.release()
+        self.light_source = LightSource(
+                self.light_sensor, 
+                mode = self.configuration.led_mode,
+                current = self.configuration.led_current,
+                )
+        self.select_light_source()
+
+    def select_light_source(self):
+        """Select the LED and current of the current measurement."""
+        if self.light_source is None or not self.light_source.is_driven:
+            return
+        led = self.configuration.led
+        current = None
+        if self.is_calibrated_measurement and self.calibrations is not None:
+            led = self.calibrations.led(self.measurement_name) or led
+            current = self.calibrations.led_current(self.measurement_name)
+        try:
+            self.light_source.select(led, current)
+        except LightSourceError as error:
+            self.light_source.select()
+            self.show_error(error)
+
+    @property
+    def uses_dark_frames(self):
+        """LED off dark frames, not needed when the LED off frame is subtracted"""
+        if self.dark_correction.mode != DarkCorrection.LED:
+            return False
+        # An external light source isn't switched off for a dark frame
+        if not self.light_source.is_driven:
+            return False
+        return not self.light_source.is_differential
+
+    def setup_crosstalk(self):
+        try:
+            self.crosstalk = CrosstalkCorrection(self.configuration.crosstalk)
+        except CrosstalkError as error:
+            self.crosstalk = CrosstalkCorrection()
+            self.show_error(error)
+
+    def run_idle_tasks(self):
+        """Housekeeping that is only done while the device is idle."""
+        self.refresh_dark_frame()
+        self.check_flicker()
+        if self.calibrations is not None and self.calibrations.store.needs_compaction:
+            self.calibrations.store.compact()
+
+    def refresh_dark_frame(self):
+        """Capture a dark frame when due. Only called while idle."""
+        if self.mode == Mode.ABORT:
+            return
+        key = self.light_sensor.settings_key
+        if self.uses_dark_frames and self.dark_correction.needs_refresh(key):
+            self.dark_correction.capture(self.light_sensor, key, self.light_source)
+
+    def check_flicker(self):
+        """
+        Periodic flicker check, a change of integration time needs a new blank.
+        The detection takes FLICKER_DETECT_DT, it is started here and finished
+        in a later loop iteration so that it doesn't hold up the buttons. A 
+        sensor read in between abandons it, it is then retried.
+        """
+        if self.mode == Mode.ABORT or self.configuration.flicker == 'off':
+            return
+        if not self.light_sensor.flicker_running:
+            if self.light_sensor.flicker_check_due():
+                self.light_sensor.start_flicker()
+            return
+        if self.light_sensor.poll_flicker() and self.light_sensor.flicker_snap:
+            self.averager.reset()
+            self.is_blanked = False
+
+    @property
+    def flicker_check_running(self):
+        """True while a flicker check holds the sensor under a captured value"""
+        return self.averager.is_captured and self.light_sensor.flicker_running
+
+    def reload_settings(self):
+        """Reload configuration and calibrations files without rebooting."""
+        self.configuration.load()
+        if self.calibrations is None:
+            self.load_calibrations()
+        else:
+            self.calibrations.load()
+        self.setup_menu_items()
+        if self.measurement_name not in self.menu_items:
+            self.measurement_name = self.menu_items[0]
+        self.apply_configuration()
+        self.setup_averager()
+        self.setup_dark_correction()
+        self.setup_crosstalk()
+        self.setup_drift_tracker()
+        self.setup_light_source()
+        self.power_manager.enabled = self.configuration.power_save
+        self.is_blanked = False
 
     def delete_screens(self):
         self.message_screen = None
         self.measure_screen = None
         self.menu_screen = None
+        self.kinetics_screen = None
+        self.batch_screen = None
         gc.collect()
 
+    def menu_item_text(self, i, item):
+        if item in self.DEFAULT_MEASUREMENTS or item in self.MODE_ITEMS:
+            item_text = f'{i} {item}'
+        elif item == self.STREAM_STR:
+            state_str = 'on' if self.stream_output.enabled else 'off'
+            item_text = f'{i} {item} ({state_str})'
+        else:
+            try:
+                led = self.calibrations.led(item)
+                chan = self.calibrations.channel(item)
+
+                if led is None and chan is None:
+                    item_text = f'{i} {item}'
+                elif chan is None:
+                    item_text = f'{i} {item} ({led})'
+                elif led is None:
+                    chan_str = constants.CHANNEL_TO_STR[chan]
+                    item_text = f'{i} {item} ({chan_str})'
+                else:
+                    chan_str = constants.CHANNEL_TO_STR[chan]
+                    item = item[:8]
+                    item_text = f'{i} {item} ({led},{chan_str})'
+            except KeyError:
+                item_text = f'{i} {item}'
+        return item_text
+
     def update_menu_screen(self):
         if self.menu_screen is None:
             return
+        if self.menu_model is None:
+            self.menu_model = MenuModel(self.menu_items, self.menu_item_text)
+        view_items = self.menu_model.view_text(
+                self.menu_view_pos, 
+                self.menu_screen.items_per_screen
+                )
+        self.menu_screen.set_menu_items(view_items)
+        pos = self.menu_item_pos - self.menu_view_pos
+        self.menu_screen.set_curr_item(pos)
 
-        n0 = self.menu_view_pos
-        n1 = n0 + self.menu_screen.items_per_screen
-        view_items = []
+    def set_menu_item_pos(self, pos):
+        num_items = len(self.menu_items)
+        self.menu_item_pos = pos % num_items
+        items_per_screen = self.menu_screen.items_per_screen
+        if self.menu_item_pos < self.menu_view_pos:
+            self.menu_view_pos = self.menu_item_pos
+        elif self.menu_item_pos >= self.menu_view_pos + items_per_screen:
+            self.menu_view_pos = self.menu_item_pos - items_per_screen + 1
 
-        for i, item in enumerate(self.menu_items[n0:n1]):
-            if item in self.DEFAULT_MEASUREMENTS or item == self.ABOUT_STR:
-                item_text = f'{n0 + i} {item}'
-            else:
-                try:
-                    led = self.calibrations.led(item)
-                    chan = self.calibrations.channel(item)
-
-                    if led is None and chan is None:
-                        item_text = f'{n0 + i} {item}'
-                    elif chan is None:
-                        item_text = f'{n0 + i} {item} ({led})'
-                    elif led is None:
-                        chan_str = constants.CHANNEL_TO_STR[chan]
-                        item_text = f'{n0 + i} {item} ({chan_str})'
-                    else:
-                        chan_str = constants.CHANNEL_TO_STR[chan]
-                        item = item[:8]
-                        item_text = f'{n0 + i} {item} ({led},{chan_str})'
-                except KeyError:
-                    item_text = f'{n0 + i} {item}'
+    def incr_menu_item_pos(self):
+        self.set_menu_item_pos(self.menu_item_pos + 1)
 
-            view_items.append(item_text)
+    def decr_menu_item_pos(self):
+        self.set_menu_item_pos(self.menu_item_pos - 1)
 
-        self.menu_screen.set_menu_items(view_items)
-        pos = self.menu_item_pos - self.menu_view_pos
-        self.menu_screen.set_curr_item(pos)
-    # Remaining methods unchanged...
+    def jump_menu_item_pos(self):
+        if self.menu_model is None:
+            self.menu_model = MenuModel(self.menu_items, self.menu_item_text)
+        self.set_menu_item_pos(self.menu_model.next_letter(self.menu_item_pos))
 
     @property
     def is_absorbance(self):
@@ -211,59 +517,219 @@ class Colorimeter:
 
     @property
     def raw_sensor_values(self):
-        return self.light_sensor.raw_values
+        """Raw values of the primary sensor position, ratioed to the reference position."""
+        positions = self.light_source.acquire()
+        values = positions[0]
+        ref = self.reference_position
+        if ref is not None:
+            # Reference beam ratio corrects light source changes without re-blanking
+            ref_values = positions[ref]
+            ref_values = ulab.numpy.where(ref_values > 0.0, ref_values, 1.0)
+            values = values*self.position_blanks[ref]/ref_values
+        return values
 
     @property
-    def transmittances(self):
-        transmittances = self.raw_sensor_values / self.blank_values
+    def frame(self):
+        """Latest complete frame."""
+        return self.frames.frame
+
+    def read_frame(self):
+        """Back frame of the frame buffer with a new sensor reading."""
+        return self.frames.next(
+                self.raw_sensor_values, 
+                self.light_sensor.gain, 
+                self.light_sensor.integration_time,
+                )
+
+    def process_frame(self, frame, raw_values):
+        """Fill transmittances, absorbances and flags of frame from raw_values."""
+        transmittances = self.raw_to_transmittances(raw_values)
+        frame.transmittances[:] = transmittances
+        frame.absorbances[:] = self.transmittances_to_absorbances(transmittances)
+        frame.flags[:] = self.quality.flags
+        return frame
+
+    def average_frame(self, num):
+        """Read num frames and publish their mean, returns the frame."""
+        return self.average_task(num, lambda frame: frame).run()
+
+    def average_task(self, num, finish):
+        """Task averaging num frames, finish(frame) gets the published mean frame."""
+        def finish_average(frame):
+            self.process_frame(frame, frame.mean)
+            self.frames.publish()
+            return finish(frame)
+        return AverageTask(num, self.read_frame, finish_average)
+
+    def acquire_frame(self):
+        """
+        Producer of the frame buffer, reads and processes a frame of averaged
+        readings and publishes it as the latest frame. Called once per frame,
+        the measurement values, screens and stream output all read the latest
+        frame.
+        """
+        frame = self.read_frame()
+        if self.drift_tracker is not None and self.is_blanked:
+            # Rescales the blank in place
+            self.drift_tracker.update(frame.raw, 1.0e-3*frame.timestamp)
+        frame.mean[:] = self.averager.update(frame.raw, frame.timestamp)
+        self.process_frame(frame, frame.mean)
+        self.frames.publish()
+        return frame
+
+    def begin_quality_flags(self, raw_values, quality=None):
+        if quality is None:
+            quality = self.quality
+        on_values = self.light_source.on_values
+        quality.begin(
+                raw_values, 
+                self.blank_values, 
+                self.light_sensor.max_counts,
+                None if on_values is None else on_values[0],
+                )
+        if not self.light_sensor.flicker_covered:
+            quality.set_all(quality_flags.FLICKER)
+
+    def raw_to_transmittances(self, raw_values):
+        raw_values = ulab.numpy.array(raw_values)
+        self.begin_quality_flags(raw_values)
+        if self.dark_correction.enabled or self.crosstalk.enabled:
+            transmittances = self.dark_correction.transmittances(
+                    raw_values, 
+                    self.blank_values, 
+                    self.light_sensor.settings_key,
+                    crosstalk = self.crosstalk,
+                    )
+        else:
+            transmittances = raw_values / self.blank_values
         mask = transmittances > 1.0
+        self.quality.add(quality_flags.CLIPPED, mask)
         transmittances[mask] = 1.0
         return transmittances
 
-    @property
-    def absorbances(self):
-        transmittances = self.transmittances
-        if transmittances is None:
-            return None
+    def transmittances_to_absorbances(self, transmittances):
         absorbances = -ulab.numpy.log10(transmittances)
         mask = absorbances < 0.0
+        self.quality.add(quality_flags.NEGATIVE_A, mask)
         absorbances[mask] = 0.0
         return absorbances
 
     @property
     def measurement_values(self):
+        """Measurement values of the latest frame, flags in value_flags."""
+        return self.frames.read(self.frame_values)
+
+    def frame_values(self, frame):
+        # Consumer of the frame buffer, the frame is only read. The flags of 
+        # the values start from the frame's flags.
+        flags = self.value_flags
+        flags.flags[:] = frame.flags
         if self.is_absorbance:
-            values = self.absorbances
+            values = frame.absorbances
         elif self.is_transmittance:
-            values = self.transmittances
+            values = frame.transmittances
         elif self.is_raw_sensor:
-            values = self.raw_sensor_values
+            values = frame.mean
+            self.begin_quality_flags(values, flags)
         elif self.is_calibrated_measurement:
             if self.measurement_name == "PSILOCYBIN":
-                deviations = self.calibrations.calculate_deviations(
+                values = self.calibrations.calculate_deviations(
                     self.measurement_name, 
-                    self.absorbances
+                    frame.absorbances
                 )
-                return deviations
+                if 'error' in values:
+                    flags.set_all(quality_flags.NAN_BASELINE)
             else:
-                values = [self.calibrations.apply(self.measurement_name, a) for a in self.absorbances if a is not None]
+                values = self.calibrations.apply(self.measurement_name, frame.absorbances)
+                # Channels with a fit but no concentration are out of range
+                out_of_range = self.calibrations.out_of_range(self.measurement_name, values)
+                flags.add(quality_flags.OUT_OF_RANGE, out_of_range)
         else:
             values = None
         return values
 
+    @property
+    def expected_ratio_values(self):
+        """Expected absorbance ratios of a calibration as a per channel list."""
+        if not self.is_calibrated_measurement or self.calibrations is None:
+            return None
+        try:
+            ratios = self.calibrations.get_expected_ratios(self.measurement_name)
+        except KeyError:
+            return None
+        if not ratios:
+            return None
+        ratios = {k.lower(): v for k, v in ratios.items()}
+        return [ratios.get(name.lower()) for name in constants.STR_TO_CHANNEL]
+
+    @property
+    def spectrum_values(self):
+        # The spectrum view of a calibrated measurement shows the absorbances
+        # with the expected ratios as reference.
+        if self.is_calibrated_measurement:
+            frame = self.frame
+            self.value_flags.flags[:] = frame.flags
+            return frame.absorbances
+        return self.measurement_values
+
+    @property
+    def measurement_stds(self):
+        """Standard deviation of the measurement values from the averager stats."""
+        std = self.averager.std
+        if self.is_raw_sensor:
+            stds = std
+        elif self.is_transmittance:
+            stds = std/self.blank_values
+        elif self.is_absorbance:
+            mean = self.averager.stats.mean
+            mean = ulab.numpy.where(mean > 0.0, mean, 1.0)
+            stds = std/(mean*math.log(10.0))
+        else:
+            stds = None
+        return stds
+
     def blank_sensor(self, set_blanked=True):
-        num_samples = constants.NUM_BLANK_SAMPLES
-        blank_samples = ulab.numpy.zeros((num_samples, constants.NUM_CHANNEL))
-        for i in range(num_samples):
-            try:
-                blank_samples[i, :] = self.light_sensor.raw_values
-            except Exception as e:
-                print(f"Error during blanking: {e}")
-                blank_samples[i, :] = ulab.numpy.ones(constants.NUM_CHANNEL)
-            time.sleep(constants.BLANK_DT)
-
-        self.blank_values = ulab.numpy.median(blank_samples, axis=0)
-        self.blank_values = ulab.numpy.where(self.blank_values > 0, self.blank_values, 1.0)
+        self.blank_task(set_blanked).run()
+
+    def blank_task(self, set_blanked=True):
+        """Task blanking every sensor position, the result is the blank values."""
+        def finish_blank(blank_samples):
+            self.set_blank(blank_samples, set_blanked)
+            return list(self.blank_values)
+        # One row of all positions per sample
+        return BlankTask(
+                constants.NUM_BLANK_SAMPLES,
+                len(self.position_names)*constants.NUM_CHANNEL,
+                self.acquire_blank_sample,
+                finish_blank,
+                begin = self.begin_blank,
+                )
+
+    def begin_blank(self):
+        if self.configuration.flicker != 'off':
+            # Integration time is snapped before blanking
+            self.light_sensor.detect_flicker()
+        if self.uses_dark_frames:
+            key = self.light_sensor.settings_key
+            self.dark_correction.capture(self.light_sensor, key, self.light_source)
+
+    def acquire_blank_sample(self):
+        size = len(self.position_names)*constants.NUM_CHANNEL
+        try:
+            return self.light_source.acquire().reshape((size,))
+        except Exception as e:
+            print(f"Error during blanking: {e}")
+            return ulab.numpy.ones(size)
+
+    def set_blank(self, blank_samples, set_blanked=True):
+        num_positions = len(self.position_names)
+        blank_values = ulab.numpy.median(blank_samples, axis=0)
+        blank_values = ulab.numpy.where(blank_values > 0, blank_values, 1.0)
+        self.position_blanks = blank_values.reshape((num_positions, constants.NUM_CHANNEL))
+        self.blank_values = self.position_blanks[0]
+        if self.drift_tracker is not None:
+            self.drift_tracker.reset(self.blank_values)
+        self.averager.stop_capture()
         if set_blanked:
             self.is_blanked = True
 
@@ -276,13 +742,18 @@ class Colorimeter:
     def up_button_pressed(self, buttons):
         return buttons & constants.BUTTON['up']
 
-    def down_button_pressed(self, buttons):
-        return
+    def view_button_pressed(self, buttons):
+        return buttons & constants.BUTTON['up']
 
+    def down_button_pressed(self, buttons):
+        return buttons & constants.BUTTON['down']
 
     def right_button_pressed(self, buttons):
         return buttons & constants.BUTTON['right']
 
+    def capture_button_pressed(self, buttons):
+        return buttons & constants.BUTTON['right']
+
     def channel_button_pressed(self, buttons):
         return buttons & constants.BUTTON['left']
 
@@ -292,15 +763,25 @@ class Colorimeter:
     def itime_button_pressed(self, buttons):
         return buttons & constants.BUTTON['itime'] if self.is_raw_sensor else False
 
-    def handle_button_press(self):
-        buttons = self.pad.get_pressed()
-        if not buttons:
-            return 
-        if not self.check_debounce():
-            return  
+    def sample_button_pressed(self, buttons):
+        return buttons & constants.BUTTON['blank']
+
+    def reblank_button_pressed(self, buttons):
+        return buttons & constants.BUTTON['itime']
 
-        self.last_button_press = time.monotonic()
+    def handle_button_press(self):
+        for event_type, buttons, timestamp in self.button_input.events():
+            if self.power_manager.activity() and event_type == ButtonEvent.PRESS:
+                # Press only wakes up the display
+                continue
+            if event_type == ButtonEvent.PRESS:
+                self.handle_buttons(buttons)
+            elif event_type == ButtonEvent.REPEAT and self.mode == Mode.MENU:
+                # Holding up or down scrolls through the menu
+                if self.up_button_pressed(buttons) or self.down_button_pressed(buttons):
+                    self.handle_buttons(buttons)
 
+    def handle_buttons(self, buttons):
         if self.mode == Mode.MEASURE:
             if self.blank_button_pressed(buttons):
                 self.measure_screen.set_blanking()
@@ -308,8 +789,17 @@ class Colorimeter:
             elif self.menu_button_pressed(buttons):
                 self.mode = Mode.MENU
             elif self.gain_button_pressed(buttons):
-                self.light_sensor.gain = next(self.gain_cycle)
+                self.light_sensor.gain = self.next_gain()
+                self.averager.reset()
                 self.is_blanked = False
+            elif self.view_button_pressed(buttons):
+                self.spectrum_view = not self.spectrum_view
+                self.mode = Mode.MEASURE
+            elif self.capture_button_pressed(buttons):
+                if self.averager.is_capturing or self.averager.is_captured:
+                    self.averager.stop_capture()
+                else:
+                    self.averager.start_capture()
             elif self.itime_button_pressed(buttons):
                 pass
 
@@ -320,6 +810,8 @@ class Colorimeter:
                 self.decr_menu_item_pos()
             elif self.down_button_pressed(buttons): 
                 self.incr_menu_item_pos()
+            elif self.channel_button_pressed(buttons):
+                self.jump_menu_item_pos()
             elif self.right_button_pressed(buttons): 
                 selected_item = self.menu_items[self.menu_item_pos]
                 if selected_item == self.ABOUT_STR:
@@ -327,13 +819,92 @@ class Colorimeter:
                     self.mode = Mode.MESSAGE
                     self.message_screen.set_message(about_msg) 
                     self.message_screen.set_to_about()
+                elif selected_item == self.KINETICS_STR:
+                    self.start_kinetics()
+                elif selected_item == self.BATCH_STR:
+                    self.start_batch()
+                elif selected_item == self.CALIBRATE_STR:
+                    self.start_calibration()
+                elif selected_item == self.STREAM_STR:
+                    self.menu_model = None
+                    if self.stream_output.enabled:
+                        self.stream_output.stop()
+                        self.mode = Mode.MEASURE
+                    elif self.start_stream():
+                        self.mode = Mode.MEASURE
                 else:
                     self.measurement_name = self.menu_items[self.menu_item_pos]
                     self.mode = Mode.MEASURE
+                    self.select_light_source()
             self.update_menu_screen()
 
+        elif self.mode == Mode.KINETICS:
+            if self.blank_button_pressed(buttons):
+                self.kinetics_screen.set_blanking()
+                self.blank_sensor()
+                self.start_kinetics()
+            elif self.menu_button_pressed(buttons):
+                self.kinetics.stop()
+                self.mode = Mode.MENU
+            elif self.capture_button_pressed(buttons):
+                if self.kinetics.is_running:
+                    self.kinetics.stop()
+                else:
+                    self.start_kinetics()
+            elif self.channel_button_pressed(buttons):
+                self.kinetics_channel = (self.kinetics_channel + 1) % constants.NUM_CHANNEL
+                self.redraw_kinetics()
+
+        elif self.mode == Mode.BATCH:
+            if self.sample_button_pressed(buttons):
+                if self.is_blanked:
+                    self.capture_batch_sample()
+                else:
+                    self.blank_batch()
+            elif self.reblank_button_pressed(buttons):
+                self.blank_batch()
+            elif self.menu_button_pressed(buttons):
+                if self.export_batch():
+                    self.mode = Mode.MENU
+                elif not flash.is_writable():
+                    self.show_error(f'{self.batch.FILE_NAME} not written, {flash.READ_ONLY_STR}')
+                else:
+                    self.show_error(f'unable to write {self.batch.FILE_NAME}')
+            elif self.capture_button_pressed(buttons):
+                self.capture_batch_replicate()
+            elif self.up_button_pressed(buttons):
+                self.set_batch_item_pos(self.batch_item_pos - 1)
+            elif self.down_button_pressed(buttons):
+                self.set_batch_item_pos(self.batch_item_pos + 1)
+            elif self.channel_button_pressed(buttons):
+                self.batch_channel = (self.batch_channel + 1) % constants.NUM_CHANNEL
+            self.update_batch_screen()
+
+        elif self.mode == Mode.CALIBRATE:
+            if self.sample_button_pressed(buttons):
+                if self.is_blanked:
+                    self.measure_standard()
+                else:
+                    self.blank_calibration()
+            elif self.reblank_button_pressed(buttons):
+                self.blank_calibration()
+            elif self.menu_button_pressed(buttons):
+                self.mode = Mode.MENU
+            elif self.up_button_pressed(buttons):
+                self.set_cal_item_pos(self.cal_item_pos - 1)
+            elif self.down_button_pressed(buttons):
+                self.set_cal_item_pos(self.cal_item_pos + 1)
+            elif self.capture_button_pressed(buttons):
+                self.save_calibration()
+            self.update_calibration_screen()
+
         elif self.mode == Mode.MESSAGE:
-            if self.calibrations.has_errors:
+            if self.configuration.has_errors:
+                error_msg = self.configuration.pop_error()
+                self.message_screen.set_message(error_msg)
+                self.message_screen.set_to_error()
+                self.mode = Mode.MESSAGE
+            elif self.calibrations is not None and self.calibrations.has_errors:
                 error_msg = self.calibrations.pop_error()
                 self.message_screen.set_message(error_msg)
                 self.message_screen.set_to_error()
@@ -344,43 +915,588 @@ class Colorimeter:
                 else:
                     self.mode = Mode.MEASURE
 
-    def check_debounce(self):
-        button_dt = time.monotonic() - self.last_button_press
-        return button_dt >= constants.DEBOUNCE_DT
+    def check_host_sensor(self):
+        if self.mode == Mode.ABORT:
+            raise HostControlError('light sensor not available')
+
+    def host_set_gain(self, arg):
+        self.check_host_sensor()
+        try:
+            gain = constants.STR_TO_GAIN[arg]
+        except KeyError:
+            raise HostControlError(f'unknown gain {arg}')
+        self.light_sensor.gain = gain
+        self.averager.reset()
+        self.is_blanked = False
+
+    def host_set_integration_time(self, arg):
+        self.check_host_sensor()
+        try:
+            itime = constants.STR_TO_INTEGRATION_TIME[arg]
+        except KeyError:
+            raise HostControlError(f'unknown integration time {arg}')
+        self.light_sensor.integration_time = itime
+        self.averager.reset()
+        self.is_blanked = False
+
+    def host_blank(self, arg):
+        """Blank the sensor, runs over several loop iterations"""
+        self.check_host_sensor()
+        return self.blank_task()
+
+    def host_select(self, arg):
+        self.load_calibrations()
+        if arg not in self.menu_items or arg in (self.STREAM_STR, self.ABOUT_STR, self.BATCH_STR, self.CALIBRATE_STR):
+            raise HostControlError(f'unknown measurement {arg}')
+        if arg == self.KINETICS_STR:
+            self.check_host_sensor()
+            self.start_kinetics()
+            return
+        self.measurement_name = arg
+        if self.mode != Mode.ABORT:
+            self.mode = Mode.MEASURE
+            self.select_light_source()
+
+    def host_push_calibration(self, arg):
+        from calibrations import CalibrationsError
+        self.load_calibrations()
+        try:
+            calibrations = json.loads(arg)
+        except ValueError:
+            raise HostControlError('calibration is not valid json')
+        if not isinstance(calibrations, dict):
+            raise HostControlError('calibration must be {name: calibration}')
+        is_saved = True
+        try:
+            for name, calibration in calibrations.items():
+                is_saved &= self.calibrations.add(name, calibration)
+        except CalibrationsError as error:
+            raise HostControlError(error)
+        self.setup_menu_items()
+        return {'saved': is_saved}
+
+    def host_average(self, arg):
+        self.check_host_sensor()
+        try:
+            num = int(arg) if arg else 1
+        except ValueError:
+            raise HostControlError('number of frames must be int')
+        if num < 1 or num > self.MAX_HOST_AVERAGE:
+            raise HostControlError(f'number of frames must be in 1..{self.MAX_HOST_AVERAGE}')
+        # One frame per loop iteration, replied when all frames are read
+        return self.average_task(num, lambda frame: self.host_average_result(frame, num))
+
+    def host_average_result(self, frame, num):
+        return {
+                'num': num,
+                'raw': list(frame.mean),
+                'transmittance': list(frame.transmittances),
+                'absorbance': list(frame.absorbances),
+                'flags': self.quality.as_list(),
+                'flicker_hz': self.light_sensor.flicker_hz,
+                }
+
+    def host_positions(self, arg):
+        """Raw values and transmittances of every sensor position against its own blank"""
+        self.check_host_sensor()
+        positions = self.light_source.acquire()
+        transmittances = positions/self.position_blanks
+        result = {}
+        for i, name in enumerate(self.position_names):
+            result[name] = {
+                    'raw': list(positions[i]),
+                    'transmittance': list(transmittances[i]),
+                    }
+            if self.reference_position is not None:
+                ref = transmittances[self.reference_position]
+                ratio = transmittances[i]/ulab.numpy.where(ref > 0.0, ref, 1.0)
+                result[name]['ratio'] = list(ratio)
+        return result
+
+    def host_stats(self, arg):
+        t_elapsed = time.monotonic() - self.t_start
+        stats = {
+                'measurement': self.measurement_name,
+                'blanked': self.is_blanked,
+                'loop_count': self.loop_count,
+                'loop_rate': self.loop_count/t_elapsed if t_elapsed > 0 else 0.0,
+                'streaming': self.stream_output.enabled,
+                'stream_seq': self.stream_output.seq,
+                'battery': self.battery_monitor.voltage_lowpass,
+                'battery_soc': self.battery_monitor.state_of_charge,
+                'battery_runtime': self.battery_monitor.remaining_time,
+                'commands': self.host_control.num_commands,
+                'errors': self.host_control.num_errors,
+                'free_mem': gc.mem_free(),
+                'writable': flash.is_writable(),
+                'boot': boot_timer.phases,
+                'power': self.power_manager.stats,
+                }
+        if self.mode != Mode.ABORT:
+            stats['gain'] = constants.GAIN_TO_STR[self.light_sensor.gain]
+            stats['itime'] = self.light_sensor.integration_time
+            stats['flicker_hz'] = self.light_sensor.flicker_hz
+            if self.drift_tracker is not None:
+                stats['drift'] = self.drift_tracker.stats
+            stats['light_source'] = self.light_source.stats
+        return stats
+
+    def host_cal_standard(self, arg):
+        """Measure a calibration standard with concentration arg"""
+        from calibration_builder import CalibrationBuilder
+        self.check_host_sensor()
+        try:
+            conc = float(arg)
+        except ValueError:
+            raise HostControlError('concentration must be float')
+        if self.cal_builder is None:
+            self.cal_builder = CalibrationBuilder()
+        num = max(1, self.configuration.num_average)
+        return self.average_task(num, lambda frame: self.add_cal_standard(conc, frame))
+
+    def add_cal_standard(self, conc, frame):
+        self.cal_builder.add(conc, frame.absorbances)
+        return {'num': self.cal_builder.count, 'standards': self.cal_builder.num_standards}
+
+    def host_cal_fit(self, arg):
+        """Fit the measured standards, saved as calibration arg if given"""
+        from calibration_builder import CalibrationBuilderError
+        from calibrations import CalibrationsError
+        if self.cal_builder is None:
+            raise HostControlError('no standards measured')
+        try:
+            calibration = self.cal_builder.calibration(
+                    units = self.configuration.cal_units,
+                    led = self.configuration.cal_led,
+                    )
+        except CalibrationBuilderError as error:
+            raise HostControlError(error)
+        if arg:
+            self.load_calibrations()
+            try:
+                is_saved = self.calibrations.add(arg, calibration)
+            except CalibrationsError as error:
+                raise HostControlError(error)
+            self.setup_menu_items()
+            self.cal_builder.reset()
+            calibration['saved'] = is_saved
+        return calibration
+
+    def host_flags(self, arg):
+        """Quality flags of the last measurement values by channel"""
+        return self.value_flags.as_dict()
+
+    def host_bench(self, arg):
+        """Time raw to transmittance conversion and bytes allocated per frame"""
+        self.check_host_sensor()
+        try:
+            num = int(arg) if arg else constants.BENCH_NUM
+        except ValueError:
+            raise HostControlError(f'bad count {arg}')
+        raw_values = 0.5*self.blank_values
+        crosstalk = self.crosstalk
+        result = {'num': num}
+        try:
+            self.crosstalk = CrosstalkCorrection()
+            result['base_us'] = self.time_per_frame(raw_values, num)
+            self.crosstalk = crosstalk
+            if crosstalk.enabled:
+                result['crosstalk_us'] = self.time_per_frame(raw_values, num)
+        finally:
+            self.crosstalk = crosstalk
+        result['frame_bytes'] = self.bytes_per_frame()
+        return result
+
+    def bytes_per_frame(self):
+        """Heap bytes allocated by one measure frame (gc disabled while measured)"""
+        self.acquire_frame()
+        self.measurement_values
+        gc.collect()
+        gc.disable()
+        try:
+            mem_free = gc.mem_free()
+            self.acquire_frame()
+            self.measurement_values
+            return mem_free - gc.mem_free()
+        finally:
+            gc.enable()
+
+    def time_per_frame(self, raw_values, num):
+        t0 = time.monotonic_ns()
+        for i in range(num):
+            self.raw_to_transmittances(raw_values)
+        return (time.monotonic_ns() - t0)/(1000*num)
+
+    def host_reload(self, arg):
+        from calibrations import CalibrationsError
+        self.check_host_sensor()
+        try:
+            self.reload_settings()
+        except (ConfigurationError, CalibrationsError) as error:
+            raise HostControlError(error)
+        if self.mode == Mode.MENU:
+            self.update_menu_screen()
+        return {
+                'configuration_errors': len(self.configuration.error_dict),
+                'calibration_errors': len(self.calibrations.error_dict),
+                }
+
+    def start_kinetics(self):
+        if self.kinetics is None:
+            from kinetics import Kinetics
+            self.kinetics = Kinetics(dt=self.configuration.kinetics_dt)
+        if self.mode != Mode.KINETICS:
+            self.mode = Mode.KINETICS
+        self.kinetics_screen.clear()
+        self.kinetics.start(time.monotonic())
+
+    def redraw_kinetics(self):
+        buffer = self.kinetics.buffer
+        num = min(buffer.count, self.kinetics_screen.SPARKLINE_MAX_ITEMS)
+        chan = self.kinetics_channel
+        values = [buffer.values[buffer.last(n), chan] for n in range(num, 0, -1)]
+        self.kinetics_screen.set_values(constants.CHANNEL_TO_STR[chan], values)
+
+    def update_kinetics(self):
+        t_now = time.monotonic()
+        if self.kinetics.sample_due(t_now):
+            absorbances = self.acquire_frame().absorbances
+            self.kinetics.add_sample(t_now, absorbances)
+            chan = self.kinetics_channel
+            self.kinetics_screen.add_value(
+                    constants.CHANNEL_TO_STR[chan],
+                    absorbances[chan],
+                    self.kinetics.rates[chan],
+                    self.kinetics.regression.r_squared[chan],
+                    )
+        self.kinetics_screen.set_time(self.kinetics.elapsed, self.kinetics.is_running)
+        self.set_blank_state(self.kinetics_screen)
+        self.kinetics_screen.show()
+
+    def start_stream(self):
+        try:
+            self.stream_output.start()
+        except StreamOutputError as error:
+            self.show_error(error)
+            return False
+        return True
+
+    def start_batch(self):
+        batch_size = self.configuration.batch_size
+        if self.batch is None or self.batch.num != batch_size:
+            from batch import BatchTable
+            self.batch = None
+            self.batch = BatchTable(batch_size)
+        self.batch.reset()
+        self.batch_item_pos = 0
+        self.batch_view_pos = 0
+        self.batch_status = ''
+        self.mode = Mode.BATCH
+        self.update_batch_screen()
+
+    def blank_batch(self):
+        self.batch_screen.set_status('blanking')
+        self.batch_screen.show()
+        self.blank_sensor()
+        self.batch_status = ''
+        self.update_batch_screen()
+
+    def batch_frame(self):
+        """Absorbances of an average of num_average raw frames"""
+        num = max(1, self.configuration.num_average)
+        return self.average_frame(num).absorbances
+
+    def capture_batch_sample(self):
+        from batch import BatchError
+        self.batch_screen.set_status('measuring')
+        self.batch_screen.show()
+        try:
+            index = self.batch.add_sample(self.batch_frame())
+        except LightSensorOverflow:
+            self.batch_status = 'overflow'
+        except BatchError as error:
+            self.batch_status = str(error)
+        else:
+            self.batch_status = ''
+            self.set_batch_item_pos(index)
+
+    def capture_batch_replicate(self):
+        if not len(self.batch):
+            return
+        self.batch_screen.set_status('measuring')
+        self.batch_screen.show()
+        try:
+            self.batch.add_replicate(self.batch_item_pos, self.batch_frame())
+        except LightSensorOverflow:
+            self.batch_status = 'overflow'
+        else:
+            self.batch_status = ''
+
+    def export_batch(self):
+        if not len(self.batch):
+            return True
+        return self.batch.export()
+
+    def set_batch_item_pos(self, pos):
+        num_items = len(self.batch)
+        if not num_items:
+            return
+        self.batch_item_pos = pos % num_items
+        items_per_screen = self.batch_screen.items_per_screen
+        if self.batch_item_pos < self.batch_view_pos:
+            self.batch_view_pos = self.batch_item_pos
+        elif self.batch_item_pos >= self.batch_view_pos + items_per_screen:
+            self.batch_view_pos = self.batch_item_pos - items_per_screen + 1
+
+    def batch_row_text(self, index):
+        chan = self.batch_channel
+        mean = self.batch.mean(index)[chan]
+        num = self.batch.replicates(index)
+        if num > 1:
+            cv = self.batch.cv(index)[chan]
+            return f'{index + 1:3d} {mean:1.3f} cv {cv:1.1f}% n{num}'
+        return f'{index + 1:3d} {mean:1.3f}'
+
+    def update_batch_screen(self):
+        if self.batch_screen is None:
+            return
+        chan_str = constants.CHANNEL_TO_STR[self.batch_channel]
+        self.batch_screen.set_header(f'Batch {chan_str}')
+        stop = min(self.batch_view_pos + self.batch_screen.items_per_screen, len(self.batch))
+        rows = [self.batch_row_text(i) for i in range(self.batch_view_pos, stop)]
+        self.batch_screen.set_rows(rows)
+        if rows:
+            self.batch_screen.set_curr_item(self.batch_item_pos - self.batch_view_pos)
+        else:
+            self.batch_screen.set_curr_item(None)
+        if self.batch_status:
+            status = self.batch_status
+        elif not self.is_blanked:
+            status = 'NB - blank to start'
+        else:
+            status = f'{len(self.batch)}/{self.batch.num} samples'
+        self.batch_screen.set_status(status)
+
+    def start_calibration(self):
+        from calibration_builder import CalibrationBuilder
+        if self.cal_builder is None:
+            self.cal_builder = CalibrationBuilder()
+        self.cal_builder.reset()
+        self.cal_item_pos = 0
+        self.cal_status = ''
+        self.mode = Mode.CALIBRATE
+        self.update_calibration_screen()
+
+    def blank_calibration(self):
+        self.batch_screen.set_status('blanking')
+        self.batch_screen.show()
+        self.blank_sensor()
+        self.cal_status = ''
+
+    def measure_standard(self):
+        self.batch_screen.set_status('measuring')
+        self.batch_screen.show()
+        conc = self.configuration.cal_standards[self.cal_item_pos]
+        try:
+            self.cal_builder.add(conc, self.batch_frame())
+        except LightSensorOverflow:
+            self.cal_status = 'overflow'
+        else:
+            self.cal_status = ''
+            self.set_cal_item_pos(self.cal_item_pos + 1)
+
+    def set_cal_item_pos(self, pos):
+        num_items = len(self.configuration.cal_standards)
+        self.cal_item_pos = min(max(pos, 0), num_items - 1)
+
+    def new_calibration_name(self):
+        num = 1
+        while f'{constants.CAL_NAME_PREFIX} {num}' in self.calibrations.data:
+            num += 1
+        return f'{constants.CAL_NAME_PREFIX} {num}'
+
+    def save_calibration(self):
+        from calibration_builder import CalibrationBuilderError
+        from calibrations import CalibrationsError
+        try:
+            calibration = self.cal_builder.calibration(
+                    units = self.configuration.cal_units,
+                    led = self.configuration.cal_led,
+                    )
+        except CalibrationBuilderError as error:
+            self.cal_status = str(error)
+            return
+        if not self.load_calibrations():
+            return
+        name = self.new_calibration_name()
+        try:
+            is_saved = self.calibrations.add(name, calibration)
+        except CalibrationsError as error:
+            self.show_error(error)
+            return
+        self.setup_menu_items()
+        chan_str = constants.CHANNEL_TO_STR[calibration['channel']]
+        if is_saved:
+            saved_str = 'saved'
+        elif not flash.is_writable():
+            saved_str = f'added, not saved ({flash.READ_ONLY_STR})'
+        else:
+            saved_str = 'added (not saved)'
+        self.mode = Mode.MESSAGE
+        self.message_screen.set_header('Calibration')
+        self.message_screen.set_message(
+                f'{saved_str} {name} {chan_str} r2 {calibration["r_squared"]:1.4f}'
+                )
+
+    def update_calibration_screen(self):
+        if self.batch_screen is None:
+            return
+        standards = self.configuration.cal_standards
+        units = self.configuration.cal_units or ''
+        rows = []
+        for conc in standards:
+            num = self.cal_builder.standards.get(conc, 0)
+            rows.append(f'{conc:g} {units} n{num}')
+        num_rows = self.batch_screen.items_per_screen
+        view_pos = max(0, self.cal_item_pos - num_rows + 1)
+        self.batch_screen.set_header('New Calibration')
+        self.batch_screen.set_rows(rows[view_pos:view_pos + num_rows])
+        self.batch_screen.set_curr_item(self.cal_item_pos - view_pos)
+        if self.cal_status:
+            status = self.cal_status
+        elif not self.is_blanked:
+            status = 'NB - blank to start'
+        elif self.cal_builder.num_standards >= 2:
+            chan, fit_type, fit_coef, r_squared = self.cal_builder.best()
+            chan_str = constants.CHANNEL_TO_STR[chan]
+            status = f'{chan_str} r2 {r_squared:1.4f}'
+        else:
+            status = 'measure standards'
+        self.batch_screen.set_status(status)
+
+    def stream_frame(self):
+        """Write the latest frame to the stream output, each frame once."""
+        self.stream_output.write_latest(self.frames)
+
+    def display_update_due(self):
+        # Display is only refreshed at a low rate while streaming so that the 
+        # sensor can run at its maximum frame rate. 
+        if not self.stream_output.enabled:
+            return True
+        t_now = time.monotonic()
+        if t_now - self.last_display_update >= constants.STREAM_DISPLAY_DT:
+            self.last_display_update = t_now
+            return True
+        return False
+
+    def set_blank_state(self, screen):
+        if not self.is_blanked:
+            screen.set_not_blanked()
+        elif self.drift_tracker is not None and self.drift_tracker.needs_reblank:
+            screen.set_reblank()
+        else:
+            screen.set_blanked()
+
+    def on_battery_low(self, soc):
+        if self.mode in (Mode.MEASURE, Mode.MENU):
+            self.show_error(f'battery low {soc:1.0f}%')
+
+    @property
+    def is_busy(self):
+        """True when the device must keep running at full rate"""
+        if self.stream_output.enabled or self.averager.is_capturing:
+            return True
+        if self.host_control.is_busy:
+            return True
+        return self.mode == Mode.KINETICS and self.kinetics.is_running
+
+    def wake_pending(self):
+        return self.button_input.pending or self.host_control.pending
 
     def run(self):
         while True:
             self.handle_button_press()
+            self.battery_monitor.update()
+            num_commands = self.host_control.num_commands
+            self.host_control.poll()
+            if self.host_control.num_commands != num_commands:
+                self.power_manager.activity()
+            self.loop_count += 1
+
+            measure_due = self.mode == Mode.MEASURE and not self.power_manager.display_off
+            display_due = measure_due and self.display_update_due()
+            acquire_due = not self.flicker_check_running
+            try:
+                if self.mode == Mode.MEASURE and self.stream_output.enabled:
+                    # One acquisition per frame, shared by the stream and the screen
+                    if acquire_due:
+                        self.acquire_frame()
+                        self.stream_frame()
+                elif display_due and acquire_due:
+                    self.acquire_frame()
+            except LightSensorIOError as error:
+                # e.g. a sensor of the array timed out
+                self.show_error(f'sensor read failed {error}')
+                display_due = False
 
-            if self.mode == Mode.MEASURE:
+            if display_due:
                 try:
+                    if self.spectrum_view:
+                        values = self.spectrum_values
+                    else:
+                        values = self.measurement_values
                     self.measure_screen.set_measurement(
                         self.measurement_name, 
                         self.measurement_units, 
-                        self.measurement_values,
+                        values,
                         self.light_sensor.CHANNEL_NAMES,
                         self.configuration.precision,
+                        self.measurement_stds,
+                        self.value_flags,
+                    )
+                    self.measure_screen.set_capture(
+                        self.averager.is_capturing,
+                        self.averager.is_captured,
                     )
                 except LightSensorOverflow:
                     self.measure_screen.set_overflow(self.measurement_name)
 
-                self.battery_monitor.update()
-                battery_voltage = self.battery_monitor.voltage_lowpass
-                self.measure_screen.set_battery(battery_voltage)
+                self.measure_screen.set_battery(
+                        self.battery_monitor.voltage_lowpass,
+                        self.battery_monitor.state_of_charge,
+                        )
+                self.power_manager.update_values(self.averager.stats.mean)
+                if self.power_manager.sensor_sleep and acquire_due:
+                    self.light_sensor.power = False
 
-                if self.is_blanked:
-                    self.measure_screen.set_blanked()
-                else:
-                    self.measure_screen.set_not_blanked()
+                self.set_blank_state(self.measure_screen)
 
                 self.measure_screen.set_gain(self.light_sensor.gain)
                 self.measure_screen.show()
+                boot_timer.finish()
+
+            elif self.mode == Mode.KINETICS:
+                try:
+                    self.update_kinetics()
+                except LightSensorIOError as error:
+                    self.show_error(f'sensor read failed {error}')
+
+            elif self.mode in (Mode.BATCH, Mode.CALIBRATE):
+                self.batch_screen.show()
 
             elif self.mode == Mode.MENU:
                 self.menu_screen.show()
+                self.run_idle_tasks()
 
             elif self.mode in (Mode.MESSAGE, Mode.ABORT):
                 self.message_screen.show()
+                self.run_idle_tasks()
+
+            if self.mode == Mode.MEASURE and self.averager.is_captured:
+                # Display is holding a captured value, sensor is idle
+                self.run_idle_tasks()
 
             gc.collect()
-            time.sleep(constants.LOOP_DT)
+            self.power_manager.update(is_busy=self.is_busy)
+            if not self.stream_output.enabled and not self.host_control.is_busy:
+                self.power_manager.sleep(wake=self.wake_pending)
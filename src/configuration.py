@@ -3,59 +3,96 @@ import json
 import constants
 from collections import OrderedDict
 from json_settings_file import JsonSettingsFile
+from measurement_averager import MeasurementAverager
+from dark_correction import DarkCorrection
+from light_source import LightSource
+from schema import Schema
 
 class ConfigurationError(Exception):
     pass
 
+
+ALLOWED_PRECISION = (2, 3, 4)
+ALLOWED_FLICKER = ('off', 'detect', 'auto')
+
+LED_CURRENT_SPEC = {
+        'type': 'int', 
+        'min': constants.LED_MIN_CURRENT, 
+        'max': constants.LED_MAX_CURRENT,
+        }
+
+SENSOR_SCHEMA = Schema({
+        'scl': {'type': 'str'},
+        'sda': {'type': 'str'},
+        'mux': {'type': 'int', 'min': 0x70, 'max': 0x77},
+        'channel': {'type': 'int', 'min': 0, 'max': 7},
+        'name': {'type': 'str'},
+        })
+
+def check_dark_correction(data):
+    # The LED off dark frame needs a light source switched by the firmware
+    if data.get('dark_correction') != DarkCorrection.LED:
+        return None
+    if data.get('led_mode', LightSource.EXTERNAL) == LightSource.EXTERNAL:
+        return "dark_correction 'led' needs led_mode 'pulsed' or 'differential'"
+    return None
+
+
+NUM_CHANNEL_SPEC = {'type': 'list', 'len': constants.NUM_CHANNEL, 'items': {'type': 'number'}}
+
+CONFIGURATION_SCHEMA = Schema({
+        'gain': {'type': 'str', 'enum': constants.STR_TO_GAIN},
+        'integration_time': {'type': 'str', 'enum': constants.STR_TO_INTEGRATION_TIME},
+        'startup': {'type': 'str'},
+        'precision': {'type': 'int', 'enum': ALLOWED_PRECISION},
+        'averaging': {'type': 'str', 'enum': MeasurementAverager.ALLOWED_MODES},
+        'num_average': {'type': 'int', 'min': 1, 'max': 1000},
+        'freq_cutoff': {'type': 'number', 'min': 0.01},
+        'kinetics_dt': {'type': 'number', 'min': 0.01},
+        'batch_size': {'type': 'int', 'min': 1, 'max': constants.BATCH_LIMIT_SAMPLES},
+        'view': {'type': 'str', 'enum': ('list', 'spectrum')},
+        'dark_correction': {'type': 'str', 'enum': DarkCorrection.ALLOWED_MODES},
+        'dark_counts': NUM_CHANNEL_SPEC,
+        'stray_light': NUM_CHANNEL_SPEC,
+        'crosstalk': {'type': 'list', 'len': constants.NUM_CHANNEL, 'items': NUM_CHANNEL_SPEC},
+        'power_save': {'type': 'bool'},
+        'cal_standards': {'type': 'list', 'items': {'type': 'number', 'min': 0.0}},
+        'cal_units': {'type': 'str'},
+        'cal_led': {'type': 'str'},
+        'stream': {'type': 'bool'},
+        'led': {'type': 'str', 'enum': constants.LED_SOURCES, 'ignore_case': True},
+        'led_mode': {'type': 'str', 'enum': LightSource.ALLOWED_MODES},
+        'led_current': LED_CURRENT_SPEC,
+        'flicker': {'type': 'str', 'enum': ALLOWED_FLICKER},
+        'sensors': {'type': 'list', 'max_len': 8, 'items': {'type': 'dict', 'schema': SENSOR_SCHEMA}},
+        'reference_position': {'type': 'int', 'min': 1},
+        'drift_channel': {'type': 'str', 'enum': constants.STR_TO_CHANNEL, 'ignore_case': True},
+        },
+        rules = [('dark_correction', check_dark_correction)],
+        )
+
+
 class Configuration(JsonSettingsFile):
 
     FILE_TYPE = 'configuration'
     FILE_NAME = constants.CONFIGURATION_FILE
     LOAD_ERROR_EXCEPTION = ConfigurationError
-    ALLOWED_PRECISION = (2, 3, 4)
+    ALLOWED_PRECISION = ALLOWED_PRECISION
     DEFAULT_PRECISION = 2
 
     def __init__(self):
         super().__init__()
 
     def check(self):
-        error_dict = {}
-        # Check gain
-        try:
-            gain_str = self.data['gain']
-        except KeyError:
-            error_msg = f'{self.FILE_TYPE} missing gain'
-            error_dict['gain'] = error_msg
-        else:
-            try:
-                gain = constants.STR_TO_GAIN[gain_str]
-            except KeyError:
-                error_msg = f'{self.FILE_TYPE} unknown gain {gain_str}'
-                error_dict['gain'] = error_msg
+        for name, msg in CONFIGURATION_SCHEMA.validate(self.data, f'{self.FILE_TYPE} '):
+            self.error_dict.setdefault(name, []).append(msg)
 
-        # Check integration time
-        try:
-            itime_str = self.data['integration_time']
-        except KeyError:
-            error_msg = f'{self.FILE_TYPE} missing integration time'
-            error_dict['integration_time'] = error_msg
-        else:
+        # Remove configurations with errors, defaults are used instead
+        for name in self.error_dict:
             try:
-                itime = constants.STR_TO_INTEGRATION_TIME[itime_str]
+                del self.data[name]
             except KeyError:
-                error_msg = f'{self.FILE_TYPE} unknown integration time {itime_str}'
-                error_dict['integration_time'] = error_msg
-
-        # Remove configurations with errors
-        for name in error_dict:
-            del self.data[name]
-
-        # Check precision
-        self.data.setdefault('precision', self.DEFAULT_PRECISION)
-        precision = self.data['precision']
-        if precision not in self.ALLOWED_PRECISION: 
-            error_msg = f'precision must be in {self.ALLOWED_PRECISION}'
-            error_dict['precision'] = error_msg
+                pass
 
     @property
     def integration_time(self):
@@ -84,3 +121,95 @@ class Configuration(JsonSettingsFile):
     @property
     def precision(self):
         return self.data.get('precision', self.DEFAULT_PRECISION)
+
+    @property
+    def averaging(self):
+        return self.data.get('averaging', 'none')
+
+    @property
+    def num_average(self):
+        return self.data.get('num_average', constants.DEFAULT_NUM_AVERAGE)
+
+    @property
+    def freq_cutoff(self):
+        return self.data.get('freq_cutoff', constants.DEFAULT_FREQ_CUTOFF)
+
+    @property
+    def kinetics_dt(self):
+        return self.data.get('kinetics_dt', constants.KINETICS_DT)
+
+    @property
+    def batch_size(self):
+        return self.data.get('batch_size', constants.BATCH_MAX_SAMPLES)
+
+    @property
+    def spectrum_view(self):
+        return self.data.get('view', 'list') == 'spectrum'
+
+    @property
+    def dark_correction(self):
+        return self.data.get('dark_correction', 'none')
+
+    @property
+    def dark_counts(self):
+        return self.data.get('dark_counts', None)
+
+    @property
+    def stray_light(self):
+        return self.data.get('stray_light', None)
+
+    @property
+    def crosstalk(self):
+        return self.data.get('crosstalk', None)
+
+    @property
+    def power_save(self):
+        return bool(self.data.get('power_save', True))
+
+    @property
+    def cal_standards(self):
+        return self.data.get('cal_standards', constants.CAL_STANDARDS)
+
+    @property
+    def cal_units(self):
+        return self.data.get('cal_units', None)
+
+    @property
+    def cal_led(self):
+        return self.data.get('cal_led', None)
+
+    @property
+    def stream(self):
+        return bool(self.data.get('stream', False))
+
+    @property
+    def led(self):
+        return self.data.get('led', constants.LED_DEFAULT)
+
+    @property
+    def led_mode(self):
+        return self.data.get('led_mode', LightSource.EXTERNAL)
+
+    @property
+    def led_current(self):
+        return self.data.get('led_current', constants.LED_CURRENT)
+
+    @property
+    def flicker(self):
+        return self.data.get('flicker', 'auto')
+
+    @property
+    def sensors(self):
+        return self.data.get('sensors', None)
+
+    @property
+    def reference_position(self):
+        return self.data.get('reference_position', None)
+
+    @property
+    def drift_channel(self):
+        """ Channel number of the drift reference channel or None """
+        try:
+            return constants.STR_TO_CHANNEL[self.data['drift_channel'].lower()]
+        except KeyError:
+            return None
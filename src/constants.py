@@ -6,12 +6,98 @@ __version__ = '0.1.0'
 
 CALIBRATIONS_FILE = 'calibrations.json'
 CONFIGURATION_FILE = 'configuration.json'
+CALIBRATIONS_JOURNAL = 'calibrations.jnl'
+CALIBRATIONS_INDEX = 'calibrations.idx'
+JOURNAL_COMPACT_MIN_BYTES = 4096
 SPLASHSCREEN_BMP = 'assets/splashscreen.bmp'
+NUMERIC_ATLAS_BMP = 'assets/numeric_atlas.bmp'
+
+# Must match ATLAS_CHARS in tools/make_glyph_atlas.py
+NUMERIC_ATLAS_CHARS = ' 0123456789+-.%\u00b1/OANCclearnm'
 
 LOOP_DT = 0.1
 BLANK_DT = 0.05
-DEBOUNCE_DT = 0.7 
+BUTTON_SCAN_INTERVAL = 0.01
+BUTTON_QUEUE_SIZE = 16
+LONG_PRESS_MS = 600
+REPEAT_MS = 150
 NUM_BLANK_SAMPLES = 5 
+STREAM_DISPLAY_DT = 1.0
+
+DEFAULT_NUM_AVERAGE = 10
+DEFAULT_FREQ_CUTOFF = 0.5
+MEDIAN_NUM = 3
+
+# Glyphs used by the measure screen: digits, signs, units, channel names and
+# status labels.
+FONT_PRELOAD_CHARS = '0123456789.+-%\u00b1O nmclearbtyVNBLRx*' 
+
+POWER_IDLE_DT = 30.0
+POWER_DIM_DT = 60.0
+POWER_BLANK_DT = 300.0
+POWER_IDLE_LOOP_DT = 0.5
+POWER_SLEEP_LOOP_DT = 1.0
+POWER_WAKE_POLL_DT = 0.02
+POWER_DIM_BRIGHTNESS = 0.1
+POWER_STABLE_TOL = 0.02
+
+BATTERY_SAMPLE_DT = 1.0
+BATTERY_TREND_DT = 60.0
+BATTERY_LOW_SOC = 10.0
+
+# LiPo discharge curve, (voltage, state of charge %)
+BATTERY_SOC_TABLE = (
+        (3.30, 0.0), (3.60, 5.0), (3.69, 10.0), (3.73, 20.0), (3.77, 30.0), 
+        (3.80, 40.0), (3.84, 50.0), (3.87, 60.0), (3.95, 70.0), (4.02, 80.0),
+        (4.11, 90.0), (4.20, 100.0),
+        )
+
+QUALITY_NOISE_FLOOR = 10
+
+BENCH_NUM = 200
+
+# Extra time (s) allowed for a sensor array read
+SENSOR_READ_TIMEOUT = 0.5
+
+DARK_REFRESH_DT = 300.0
+DARK_CACHE_SIZE = 4
+
+# Light sources by name, None is the AS7341 LED driver otherwise the board 
+# pin of a gpio driven LED.
+LED_SOURCES = {'white': None}
+LED_DEFAULT = 'white'
+LED_CURRENT = 10
+LED_MIN_CURRENT = 4
+LED_MAX_CURRENT = 258
+
+# Ambient flicker detection, time for the AS7341 flicker engine to settle 
+# and interval between checks while idle.
+FLICKER_DETECT_DT = 0.2
+FLICKER_CHECK_DT = 60.0
+# Integration time within this fraction of a period of a whole number of
+# flicker periods covers the flicker (the AS7341 astep is 0.08 ms)
+FLICKER_SNAP_TOL = 0.02
+
+# Light source drift tracking, filter time constant (s), relative change of
+# the reference channel ignored as a step and drift at which to re-blank.
+DRIFT_TAU = 60.0
+DRIFT_STEP_TOL = 0.05
+DRIFT_REBLANK_THRESHOLD = 0.05
+
+BATCH_MAX_SAMPLES = 500
+BATCH_LIMIT_SAMPLES = 1000
+BATCH_FILE = 'batch.bin'
+
+CAL_STANDARDS = [0.0, 1.0, 2.0, 5.0, 10.0]
+CAL_NAME_PREFIX = 'Cal'
+
+KINETICS_DT = 1.0
+KINETICS_BUFFER_SIZE = 256
+KINETICS_BLOCK_SIZE = 16
+KINETICS_FILE = 'kinetics.bin'
+CAPTURE_MIN_SAMPLES = 5
+CAPTURE_MAX_SAMPLES = 200
+CAPTURE_REL_TOL = 0.002
 BATTERY_AIN_PIN = board.A6
 
 BUTTON = { 
@@ -55,7 +141,16 @@ STR_TO_GAIN = collections.OrderedDict([
 
 GAIN_TO_STR = collections.OrderedDict(((v,k) for k,v in STR_TO_GAIN.items()))
 
-STR_TO_INTEGRATION_TIME = collections.OrderedDict([])
+# Integration times in ms
+STR_TO_INTEGRATION_TIME = collections.OrderedDict([
+    ('10ms',   10),
+    ('25ms',   25),
+    ('50ms',   50),
+    ('100ms', 100),
+    ('200ms', 200),
+    ('280ms', 280),
+    ('400ms', 400),
+    ])
 INTEGRATION_TIME_TO_STR = \
     collections.OrderedDict(((v,k) for k,v in STR_TO_INTEGRATION_TIME.items()))
 
@@ -0,0 +1,57 @@
+import ulab.numpy as np
+import constants
+
+# ulab raises ValueError for a singular matrix, numpy (host) LinAlgError
+try:
+    INVERSE_ERRORS = (ValueError, np.linalg.LinAlgError)
+except AttributeError:
+    INVERSE_ERRORS = (ValueError,)
+
+
+class CrosstalkError(Exception):
+    pass
+
+class CrosstalkCorrection:
+
+    """
+    Cross channel crosstalk correction. The channel responses overlap so the
+    measured counts are m = C s where s are the narrowband signals and C is
+    the crosstalk matrix (row i gives the response of channel i to each
+    narrowband signal). C is inverted once when loaded and the estimate
+    s = inv(C) m is a single matrix-vector product per frame.
+
+    The blank is corrected once and cached until it changes (the cache
+    compares against a copy, the blank may be rescaled in place by drift
+    compensation).
+    """
+
+    def __init__(self, matrix=None):
+        self.inverse = None
+        self.blank_in = None
+        self.blank_out = None
+        if matrix is None:
+            return
+        num = constants.NUM_CHANNEL
+        try:
+            matrix = np.array(matrix)
+        except (TypeError, ValueError):
+            raise CrosstalkError('crosstalk matrix incorrect format')
+        if matrix.shape != (num, num):
+            raise CrosstalkError(f'crosstalk matrix must be {num}x{num}')
+        try:
+            self.inverse = np.linalg.inv(matrix)
+        except INVERSE_ERRORS:
+            raise CrosstalkError('crosstalk matrix is singular')
+
+    @property
+    def enabled(self):
+        return self.inverse is not None
+
+    def apply(self, values):
+        return np.dot(self.inverse, values)
+
+    def apply_blank(self, blank_values):
+        if self.blank_in is None or np.any(blank_values != self.blank_in):
+            self.blank_in = np.array(blank_values)
+            self.blank_out = self.apply(blank_values)
+        return self.blank_out
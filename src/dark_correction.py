@@ -0,0 +1,101 @@
+import time
+import ulab.numpy as np
+import constants
+
+class DarkCorrectionError(Exception):
+    pass
+
+class DarkCorrection:
+
+    """
+    Dark frame and stray light correction of transmittances.
+
+        T = (raw - dark)/(blank - dark)
+        T = (T - stray)/(1 - stray)    (optional, stray light fraction per channel)
+
+    Dark frames depend on gain and integration time and are kept in a small
+    cache keyed by (gain, integration time). They are either captured with
+    the light source off (mode 'led') or taken from the configuration (mode
+    'fixed').
+    """
+
+    NONE = 'none'
+    LED = 'led'
+    FIXED = 'fixed'
+    ALLOWED_MODES = (NONE, LED, FIXED)
+
+    def __init__(self, mode=NONE, dark_counts=None, stray_light=None):
+        self.mode = mode
+        self.cache = {}
+        self.zeros = np.zeros((constants.NUM_CHANNEL,))
+        self.fixed_dark = None
+        if dark_counts is not None:
+            self.fixed_dark = np.array(dark_counts)
+        self.stray_light = None
+        if stray_light is not None:
+            self.stray_light = np.array(stray_light)
+        self.num_captured = 0
+
+    @property
+    def enabled(self):
+        return self.mode != self.NONE
+
+    def dark(self, key):
+        if self.mode == self.LED:
+            try:
+                return self.cache[key][0]
+            except KeyError:
+                pass
+        elif self.mode == self.FIXED and self.fixed_dark is not None:
+            return self.fixed_dark
+        return self.zeros
+
+    def needs_refresh(self, key, t_now=None):
+        if self.mode != self.LED:
+            return False
+        if t_now is None:
+            t_now = time.monotonic()
+        try:
+            t_capture = self.cache[key][1]
+        except KeyError:
+            return True
+        return t_now - t_capture >= constants.DARK_REFRESH_DT
+
+    def capture(self, light_sensor, key, light_source):
+        """ 
+        Capture a dark frame with the light source switched off. Only a light
+        source driven by the firmware can be switched off, an external one
+        would give a lit "dark" frame.
+        """
+        if not light_source.is_driven:
+            raise DarkCorrectionError('dark frames need a driven light source')
+        led_state = light_source.led
+        light_source.led = False
+        try:
+            dark = np.array(light_sensor.raw_values)
+        finally:
+            light_source.led = led_state
+        if key not in self.cache and len(self.cache) >= constants.DARK_CACHE_SIZE:
+            # Evict the oldest dark frame
+            oldest = min(self.cache, key=lambda k: self.cache[k][1])
+            del self.cache[oldest]
+        self.cache[key] = (dark, time.monotonic())
+        self.num_captured += 1
+        return dark
+
+    def clear(self):
+        self.cache = {}
+
+    def transmittances(self, raw_values, blank_values, key, crosstalk=None):
+        dark = self.dark(key)
+        numer = np.array(raw_values) - dark
+        denom = blank_values - dark
+        if crosstalk is not None and crosstalk.enabled:
+            # Crosstalk is linear in the dark subtracted counts
+            numer = crosstalk.apply(numer)
+            denom = crosstalk.apply_blank(denom)
+        denom = np.where(denom > 0.0, denom, 1.0)
+        transmittances = numer/denom
+        if self.stray_light is not None:
+            transmittances = (transmittances - self.stray_light)/(1.0 - self.stray_light)
+        return transmittances
@@ -0,0 +1,71 @@
+import constants
+
+class DriftTracker:
+
+    """
+    Tracks a slow multiplicative drift of the light source (LED and
+    temperature) from a reference channel that the samples don't absorb
+    (e.g. 910nm) or the clear channel, and rescales the blank in place:
+
+        drift = raw[ref]/blank0[ref]    (low pass filtered, time constant tau)
+        blank = blank0*drift
+
+    Frames where the reference channel differs from the tracked drift by
+    more than step_tol (e.g. a cuvette being inserted) are ignored, only
+    slow changes are followed. A re-blank is suggested once the drift
+    exceeds threshold.
+    """
+
+    def __init__(self, channel, tau=constants.DRIFT_TAU, 
+            threshold=constants.DRIFT_REBLANK_THRESHOLD, step_tol=constants.DRIFT_STEP_TOL):
+        self.channel = channel
+        self.tau = tau
+        self.threshold = threshold
+        self.step_tol = step_tol
+        self.blank_values = None
+        self.reference = None
+        self.drift = 1.0
+        self.applied = 1.0
+        self.t_last = None
+        self.num_rejected = 0
+
+    def reset(self, blank_values):
+        """ Start tracking against a new blank (kept and rescaled in place) """
+        self.blank_values = blank_values
+        self.reference = float(blank_values[self.channel])
+        self.drift = 1.0
+        self.applied = 1.0
+        self.t_last = None
+        self.num_rejected = 0
+
+    def update(self, raw_values, t_now):
+        """ Update the drift from a frame (t_now in s), returns the drift """
+        if self.blank_values is None or self.reference <= 0.0:
+            return self.drift
+        ratio = raw_values[self.channel]/self.reference
+        if abs(ratio - self.drift) > self.step_tol*self.drift:
+            self.num_rejected += 1
+            return self.drift
+        if self.t_last is None:
+            dt = 0.0
+        else:
+            dt = t_now - self.t_last
+        self.t_last = t_now
+        alpha = dt/(self.tau + dt)
+        self.drift += alpha*(ratio - self.drift)
+        # Rescale the blank in place by the change since the last update
+        self.blank_values *= self.drift/self.applied
+        self.applied = self.drift
+        return self.drift
+
+    @property
+    def needs_reblank(self):
+        return abs(self.drift - 1.0) > self.threshold
+
+    @property
+    def stats(self):
+        return {
+                'drift': self.drift,
+                'rejected': self.num_rejected,
+                'reblank': self.needs_reblank,
+                }
@@ -0,0 +1,150 @@
+import ulab.numpy as np
+
+class LowpassFilter:
+
+    """
+    First order IIR lowpass filter applied elementwise to an array of size
+    values (size=1 for scalar signals). Coefficients are computed when the
+    cutoff or the sample interval dt is set and the state is updated in place.
+    """
+
+    def __init__(self, freq_cutoff=1.0, value=None, dt=1.0, size=1):
+        self.dt = dt
+        self.value = np.zeros((size,))
+        self.scratch = np.zeros((size,))
+        self.is_initialized = False
+        self.freq_cutoff = freq_cutoff
+        if value is not None:
+            self.reset(value)
+
+    @property
+    def freq_cutoff(self):
+        return self._alpha/((1.0-self._alpha)*2.0*np.pi*self.dt)
+
+    @freq_cutoff.setter
+    def freq_cutoff(self, freq):
+        self._wc = 2.0*np.pi*freq
+        self.set_dt(self.dt)
+
+    def set_dt(self, dt):
+        """ Sample interval of the following updates, e.g. the measured frame interval """
+        self.dt = dt
+        self._alpha = (self._wc*dt)/(self._wc*dt + 1)
+        self._beta = 1.0 - self._alpha
+
+    def reset(self, value=None):
+        if value is None:
+            self.is_initialized = False
+        else:
+            self.value[:] = value
+            self.is_initialized = True
+
+    def update(self, new_value, dt=None):
+        if not self.is_initialized:
+            self.reset(new_value)
+            return self.value
+        if dt is not None and dt != self.dt:
+            self.set_dt(dt)
+        self.scratch[:] = new_value
+        self.scratch *= self._alpha
+        self.value *= self._beta
+        self.value += self.scratch
+        return self.value
+
+
+class MovingAverage:
+
+    """ Moving average over the last num samples using a circular buffer """
+
+    def __init__(self, num=4, size=1):
+        self.num = num
+        self.buffer = np.zeros((num, size))
+        self.rows = [self.buffer[i] for i in range(num)]
+        self.sum = np.zeros((size,))
+        self.value = np.zeros((size,))
+        self.pos = 0
+        self.is_initialized = False
+
+    def reset(self, value=None):
+        if value is None:
+            self.is_initialized = False
+            return
+        for row in self.rows:
+            row[:] = value
+        self.sum[:] = value
+        self.sum *= self.num
+        self.pos = 0
+        self.is_initialized = True
+
+    def update(self, new_value):
+        if not self.is_initialized:
+            self.reset(new_value)
+        else:
+            row = self.rows[self.pos]
+            self.sum -= row
+            row[:] = new_value
+            self.sum += row
+            self.pos = (self.pos + 1) % self.num
+        self.value[:] = self.sum
+        self.value /= self.num
+        return self.value
+
+
+class MedianFilter:
+
+    """
+    Median of the last num samples using a circular buffer. Note, the median
+    itself is computed by ulab and allocates its result array.
+    """
+
+    def __init__(self, num=3, size=1):
+        self.num = num
+        self.buffer = np.zeros((num, size))
+        self.rows = [self.buffer[i] for i in range(num)]
+        self.value = np.zeros((size,))
+        self.pos = 0
+        self.is_initialized = False
+
+    def reset(self, value=None):
+        if value is None:
+            self.is_initialized = False
+            return
+        for row in self.rows:
+            row[:] = value
+        self.value[:] = value
+        self.pos = 0
+        self.is_initialized = True
+
+    def update(self, new_value):
+        if not self.is_initialized:
+            self.reset(new_value)
+            return self.value
+        self.rows[self.pos][:] = new_value
+        self.pos = (self.pos + 1) % self.num
+        self.value[:] = np.median(self.buffer, axis=0)
+        return self.value
+
+
+class FilterBank:
+
+    """ Chain of filters applied in order, e.g. median followed by lowpass """
+
+    def __init__(self, filters=None):
+        self.filters = [] if filters is None else list(filters)
+
+    def append(self, filt):
+        self.filters.append(filt)
+
+    def reset(self):
+        for filt in self.filters:
+            filt.reset()
+
+    @property
+    def value(self):
+        return self.filters[-1].value
+
+    def update(self, new_value):
+        value = new_value
+        for filt in self.filters:
+            value = filt.update(value)
+        return value
@@ -0,0 +1,7 @@
+import storage
+
+READ_ONLY_STR = 'read only, hold select at reset'
+
+def is_writable():
+    """ True if code can write to CIRCUITPY, i.e. select was held at reset (boot.py) """
+    return not storage.getmount('/').readonly
@@ -1,6 +1,18 @@
+import constants
 from adafruit_bitmap_font import bitmap_font
 
 fontname = 'Hack-Bold'
-font_8pt = bitmap_font.load_font(f'/assets/{fontname}-8.pcf')
-#font_14pt = bitmap_font.load_font(f'/assets/{fontname}-14.pcf')
-#font_10pt = bitmap_font.load_font(f'/assets/{fontname}-10.pcf')
+_font_cache = {}
+
+def load_font(size):
+    """
+    Load font on first use. Only the glyphs in FONT_PRELOAD_CHARS are loaded
+    up front, others are loaded by the font on demand.
+    """
+    try:
+        font = _font_cache[size]
+    except KeyError:
+        font = bitmap_font.load_font(f'/assets/{fontname}-{size}.pcf')
+        font.load_glyphs(constants.FONT_PRELOAD_CHARS)
+        _font_cache[size] = font
+    return font
@@ -0,0 +1,99 @@
+import time
+import ulab.numpy as np
+from array import array
+import constants
+
+class Frame:
+
+    """
+    One measurement frame: sequence number, timestamp (ms), gain, integration
+    time, raw counts (uint16), the averaged counts, transmittances and
+    absorbances (float) and the per channel quality flags (uint8 bitmask).
+    All arrays are allocated once, frames are reused from a FrameBuffer and
+    filled in place. Note, __slots__ is ignored by CircuitPython, there the 
+    fixed size arrays keep the frame compact.
+    """
+
+    __slots__ = (
+            'seq', 'timestamp', 'gain', 'itime', 'raw', 'mean', 
+            'transmittances', 'absorbances', 'flags',
+            )
+
+    MAX_COUNT = 2**16-1
+
+    def __init__(self, size=constants.NUM_CHANNEL):
+        self.seq = 0
+        self.timestamp = 0
+        self.gain = None
+        self.itime = None
+        self.raw = array('H', [0]*size)
+        self.mean = np.zeros((size,))
+        self.transmittances = np.zeros((size,))
+        self.absorbances = np.zeros((size,))
+        self.flags = np.zeros((size,), dtype=np.uint8)
+
+    def set_raw(self, seq, raw_values, gain, itime):
+        self.seq = seq
+        self.timestamp = time.monotonic_ns()//1000000
+        self.gain = gain
+        self.itime = itime
+        raw = self.raw
+        for i in range(len(raw)):
+            value = int(raw_values[i])
+            raw[i] = min(max(value, 0), self.MAX_COUNT)
+
+
+class FrameBuffer:
+
+    """
+    Double buffered frames shared by one producer and any number of
+    consumers. The producer fills the back frame and publishes it by swapping
+    the latest index (a single assignment), consumers read the latest
+    complete frame in place without copying. 
+
+    Each frame has a version counter that is odd while the producer writes
+    to it. A consumer that may run concurrently with the producer (e.g. a
+    thread on the host) reads with read(), which retries if the frame was
+    overwritten while it was being read. In the single threaded main loop
+    frame can be used directly.
+    """
+
+    VERSION_MASK = 0x3fffffff
+
+    def __init__(self, size=constants.NUM_CHANNEL):
+        self.frames = (Frame(size), Frame(size))
+        self.versions = [0, 0]
+        self.latest = 0
+        self.seq = 0
+
+    @property
+    def frame(self):
+        """ Latest complete frame """
+        return self.frames[self.latest]
+
+    def next(self, raw_values, gain, itime):
+        """ Back frame filled with the raw values, made the latest by publish() """
+        back = 1 - self.latest
+        if not self.versions[back] & 1:
+            self.versions[back] = (self.versions[back] + 1) & self.VERSION_MASK
+        frame = self.frames[back]
+        frame.set_raw(self.seq, raw_values, gain, itime)
+        return frame
+
+    def publish(self):
+        back = 1 - self.latest
+        self.versions[back] = (self.versions[back] + 1) & self.VERSION_MASK
+        self.latest = back
+        self.seq = (self.seq + 1) & 0xffffffff
+
+    def read(self, func):
+        """ func(frame) of the latest frame, retried if the frame was overwritten """
+        while True:
+            pos = self.latest
+            version = self.versions[pos]
+            if version & 1:
+                # Already the back frame again, latest has moved on
+                continue
+            result = func(self.frames[pos])
+            if self.versions[pos] == version:
+                return result
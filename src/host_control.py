@@ -0,0 +1,147 @@
+import json
+import usb_cdc
+
+class HostControl:
+
+    """
+    Line based command protocol over the usb serial console. Commands are
+    of the form '<command> [argument]' terminated by a newline. Replies are a
+    single line starting with 'ok' or 'err' followed by an optional json
+    payload or error message. Long commands run as a HostTask over several
+    polls, see below.
+    """
+
+    MAX_LINE_LENGTH = 4096
+    MAX_READ_SIZE = 256
+
+    def __init__(self):
+        self.serial = usb_cdc.console
+        self.buffer = bytearray()
+        self.handlers = {}
+        self.task = None
+        self.num_commands = 0
+        self.num_errors = 0
+
+    def add_handler(self, command, handler):
+        self.handlers[command] = handler
+
+    @property
+    def pending(self):
+        return self.serial is not None and self.serial.in_waiting > 0
+
+    @property
+    def is_busy(self):
+        """ True while a command's task is running """
+        return self.task is not None
+
+    def poll(self):
+        """ 
+        Advance a running task by one step, read available bytes 
+        (non-blocking) and run any complete commands. Commands wait while
+        a task is running so replies stay in order.
+        """
+        if self.serial is None:
+            return
+        if self.task is not None:
+            self.call(self.step_task)
+            if self.task is not None:
+                return
+        if self.serial.in_waiting:
+            data = self.serial.read(min(self.serial.in_waiting, self.MAX_READ_SIZE))
+            if data:
+                self.buffer.extend(data)
+        while self.task is None:
+            pos = self.buffer.find(b'\n')
+            if pos < 0:
+                if len(self.buffer) > self.MAX_LINE_LENGTH:
+                    self.buffer = bytearray()
+                    self.reply_error('line too long')
+                break
+            line = bytes(self.buffer[:pos])
+            self.buffer = self.buffer[pos+1:]
+            try:
+                line = line.decode().strip()
+            except UnicodeError:
+                self.reply_error('invalid characters in command')
+                continue
+            if line:
+                self.run_command(line)
+
+    def run_command(self, line):
+        command, _, arg = line.partition(' ')
+        self.num_commands += 1
+        try:
+            handler = self.handlers[command]
+        except KeyError:
+            self.reply_error(f'unknown command {command}')
+            return
+        self.call(handler, arg.strip())
+
+    def step_task(self):
+        task = self.task
+        if not task.step():
+            return task
+        return task.result
+
+    def call(self, func, *args):
+        """ 
+        Run a handler (or task step) and reply with its result or error. A 
+        HostTask result is kept as the running task, the reply is sent when
+        it finishes.
+        """
+        try:
+            result = func(*args)
+            if isinstance(result, HostTask):
+                self.task = result
+                return
+            payload = None if result is None else json.dumps(result)
+        except HostControlError as error:
+            self.task = None
+            self.reply_error(error)
+        except Exception as error:
+            # e.g. OSError or a sensor error, reported so the main loop keeps running
+            self.task = None
+            self.reply_error(f'{type(error).__name__} {error}')
+        else:
+            self.task = None
+            self.reply_ok(payload)
+
+    def reply_ok(self, payload=None):
+        if payload is None:
+            self.write_line('ok')
+        else:
+            self.write_line(f'ok {payload}')
+
+    def reply_error(self, message):
+        self.num_errors += 1
+        self.write_line(f'err {message}')
+
+    def write_line(self, line):
+        if self.serial is not None and self.serial.connected:
+            self.serial.write(f'{line}\r\n'.encode())
+
+
+class HostControlError(Exception):
+    pass
+
+
+class HostTask:
+
+    """
+    Command work spread over main loop iterations, so a long command (e.g.
+    averaging many frames) doesn't freeze the buttons and display. A handler
+    returns a HostTask instead of its result, HostControl.poll() then calls
+    step() once per poll until it returns True and replies with result.
+    """
+
+    result = None
+
+    def step(self):
+        """ Do the next part of the work, True when result is ready """
+        return True
+
+    def run(self):
+        """ Run to completion (blocking) and return the result """
+        while not self.step():
+            pass
+        return self.result
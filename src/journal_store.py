@@ -0,0 +1,287 @@
+import os
+import json
+import constants
+
+class JournalStoreError(Exception):
+    pass
+
+class JournalStore:
+
+    """
+    Append-only store of named json records. Each record is one line
+
+        name <tab> length <tab> json payload <newline>
+
+    (length 0 marks a deleted name). Updates only append, so a power loss
+    can at worst leave a partial last record, which fails the length check
+    and is dropped when the journal is replayed. Load only builds a name to
+    (offset, length) index, payloads are parsed on access.
+
+    Names starting with META_PREFIX are metadata records, they are left out
+    when iterating over the store.
+
+    Compaction rewrites the live records to a temporary file which is then
+    swapped in. The original is removed before the rename (FAT can't rename
+    over an existing file), so on load a temporary file without the original
+    is a finished compaction and is renamed, a temporary file next to the
+    original is an unfinished one and is removed.
+    """
+
+    TMP_SUFFIX = '.tmp'
+    META_PREFIX = '#'
+    COMPACT_MIN_BYTES = constants.JOURNAL_COMPACT_MIN_BYTES
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.tmp_name = file_name + self.TMP_SUFFIX
+        self.index = {}
+        self.unsaved = {}
+        self.size = 0
+        self.live_bytes = 0
+        self.is_torn = False
+        self.cache_name = None
+        self.cache_value = None
+
+    def exists(self, file_name):
+        try:
+            os.stat(file_name)
+        except OSError:
+            return False
+        return True
+
+    def recover(self):
+        """ Finish or roll back an interrupted compaction """
+        if not self.exists(self.tmp_name):
+            return
+        try:
+            if self.exists(self.file_name):
+                os.remove(self.tmp_name)
+            else:
+                os.rename(self.tmp_name, self.file_name)
+        except OSError:
+            pass
+
+    def load(self):
+        self.index = {}
+        self.unsaved = {}
+        self.size = 0
+        self.live_bytes = 0
+        self.is_torn = False
+        self.cache_name = None
+        self.recover()
+        try:
+            f = open(self.file_name, 'rb')
+        except OSError:
+            return
+        with f:
+            offset = 0
+            while True:
+                line = f.readline()
+                if not line:
+                    break
+                record = self.parse_line(line)
+                if record is None:
+                    # Partial record from an interrupted append
+                    self.is_torn = True
+                    break
+                name, length, payload_offset = record
+                self.remove_from_index(name)
+                if length:
+                    self.index[name] = (offset + payload_offset, length)
+                    self.live_bytes += len(line)
+                offset += len(line)
+            self.size = offset
+
+    def parse_line(self, line):
+        if line[-1:] != b'\n':
+            return None
+        parts = line.split(b'\t', 2)
+        if len(parts) != 3:
+            return None
+        try:
+            length = int(parts[1])
+        except ValueError:
+            return None
+        if len(parts[2]) != length + 1:
+            return None
+        name = str(parts[0], 'utf-8')
+        payload_offset = len(parts[0]) + len(parts[1]) + 2
+        return name, length, payload_offset
+
+    def remove_from_index(self, name):
+        try:
+            offset, length = self.index.pop(name)
+        except KeyError:
+            return
+        self.live_bytes -= self.line_length(name, length)
+
+    def line_length(self, name, length):
+        return len(name.encode()) + len(str(length)) + length + 3
+
+    def __contains__(self, name):
+        return name in self.unsaved or name in self.index
+
+    def __iter__(self):
+        for name in self.index:
+            if name not in self.unsaved and name[:1] != self.META_PREFIX:
+                yield name
+        for name in self.unsaved:
+            yield name
+
+    def __len__(self):
+        return len([name for name in self])
+
+    def __getitem__(self, name):
+        return self.get(name)
+
+    def read_payload(self, name):
+        offset, length = self.index[name]
+        with open(self.file_name, 'rb') as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def get(self, name):
+        if name in self.unsaved:
+            return self.unsaved[name]
+        if name == self.cache_name:
+            return self.cache_value
+        value = json.loads(self.read_payload(name))
+        self.cache_name = name
+        self.cache_value = value
+        return value
+
+    def append(self, name, value):
+        """ Append a record, returns False (value kept in memory) if not writable """
+        if '\t' in name or '\n' in name or name[:1] == self.META_PREFIX:
+            raise JournalStoreError(f'{name} not allowed as record name')
+        payload = json.dumps(value).encode()
+        if self.write_record(name, payload):
+            self.unsaved.pop(name, None)
+            return True
+        self.unsaved[name] = value
+        return False
+
+    def drop(self, name):
+        """ Remove a record from the index only, e.g. an invalid record """
+        self.unsaved.pop(name, None)
+        self.remove_from_index(name)
+        if name == self.cache_name:
+            self.cache_name = None
+
+    def delete(self, name):
+        self.unsaved.pop(name, None)
+        if name in self.index:
+            self.write_record(name, b'')
+
+    def write_record(self, name, payload):
+        if self.is_torn:
+            # Drop the partial record before appending after it
+            if not self.compact():
+                return False
+        length = len(payload)
+        line = record_head(name, length) + payload + b'\n'
+        try:
+            with open(self.file_name, 'ab') as f:
+                f.write(line)
+        except OSError:
+            return False
+        self.remove_from_index(name)
+        if name == self.cache_name:
+            self.cache_name = None
+        if length:
+            self.index[name] = (self.size + len(line) - length - 1, length)
+            self.live_bytes += len(line)
+        self.size += len(line)
+        return True
+
+    @property
+    def needs_compaction(self):
+        stale_bytes = self.size - self.live_bytes
+        return stale_bytes > self.COMPACT_MIN_BYTES and stale_bytes > self.live_bytes
+
+    def compact(self):
+        """ Rewrite live records to a temporary file and swap it in """
+        return self.write_file((name, self.read_payload(name)) for name in self.index)
+
+    def rewrite(self, items):
+        """ 
+        Replace all records by the (name, value) pairs of items, returns False
+        if not writable.
+        """
+        records = ((name, json.dumps(value).encode()) for name, value in items)
+        if not self.write_file(records):
+            return False
+        self.unsaved = {}
+        return True
+
+    def write_file(self, records):
+        """ Write (name, payload) records to a temporary file and swap it in """
+        new_index = {}
+        offset = 0
+        try:
+            with open(self.tmp_name, 'wb') as f:
+                for name, payload in records:
+                    head = record_head(name, len(payload))
+                    f.write(head)
+                    f.write(payload)
+                    f.write(b'\n')
+                    new_index[name] = (offset + len(head), len(payload))
+                    offset += len(head) + len(payload) + 1
+            if self.exists(self.file_name):
+                os.remove(self.file_name)
+            os.rename(self.tmp_name, self.file_name)
+        except OSError:
+            return False
+        self.index = new_index
+        self.size = offset
+        self.live_bytes = offset
+        self.is_torn = False
+        self.cache_name = None
+        return True
+
+
+def record_head(name, length):
+    return name.encode() + b'\t' + str(length).encode() + b'\t'
+
+
+class OverlayView:
+
+    """
+    Read only mapping of a base dict with the records of a journal store on
+    top. Journal records are parsed on access.
+    """
+
+    def __init__(self, base, store):
+        self.base = base
+        self.store = store
+
+    def __contains__(self, name):
+        return name in self.store or name in self.base
+
+    def __iter__(self):
+        for name in self.base:
+            if name not in self.store:
+                yield name
+        for name in self.store:
+            yield name
+
+    def __len__(self):
+        return len([name for name in self])
+
+    def __getitem__(self, name):
+        if name in self.store:
+            return self.store.get(name)
+        return self.base[name]
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return [name for name in self]
+
+    def items(self):
+        for name in self:
+            yield name, self[name]
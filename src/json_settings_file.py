@@ -36,6 +36,7 @@ class JsonSettingsFile:
 
     def load(self):
         self.data = {}
+        self.error_dict = OrderedDict()
         if self.FILE_NAME in os.listdir():
             try:
                 with open(self.FILE_NAME, 'r') as f:
@@ -52,6 +53,14 @@ class JsonSettingsFile:
                 self.data = OrderedDict(data_tuples) 
                 self.check()
 
+    def save(self):
+        try:
+            with open(self.FILE_NAME, 'w') as f:
+                json.dump(self.data, f)
+        except OSError:
+            error_msg = f'unable to write {self.FILE_TYPE} file'
+            raise self.LOAD_ERROR_EXCEPTION(error_msg)
+
     def check(self):
         pass
 
@@ -0,0 +1,186 @@
+import struct
+import ulab.numpy as np
+import constants
+
+class RingBuffer:
+
+    """ Preallocated ring buffer of (time, values) samples """
+
+    def __init__(self, num=constants.KINETICS_BUFFER_SIZE, size=constants.NUM_CHANNEL):
+        self.num = num
+        self.times = np.zeros((num,))
+        self.values = np.zeros((num, size))
+        self.pos = 0
+        self.count = 0
+
+    def reset(self):
+        self.pos = 0
+        self.count = 0
+
+    def append(self, t, values):
+        self.times[self.pos] = t
+        self.values[self.pos, :] = values
+        self.pos = (self.pos + 1) % self.num
+        self.count = min(self.count + 1, self.num)
+
+    @property
+    def is_full(self):
+        return self.count == self.num
+
+    def last(self, n=1):
+        """ Index of the sample n back from the most recent one """
+        return (self.pos - n) % self.num
+
+
+class IncrementalRegression:
+
+    """
+    Per-channel least squares line fit, y = slope*t + intercept, updated in
+    O(1) per sample using running means and co-moments.
+    """
+
+    def __init__(self, size=constants.NUM_CHANNEL):
+        self.count = 0
+        self.mean_t = 0.0
+        self.m2_t = 0.0
+        self.mean_y = np.zeros((size,))
+        self.c_ty = np.zeros((size,))
+        self.m2_y = np.zeros((size,))
+        self.delta_y = np.zeros((size,))
+
+    def reset(self):
+        self.count = 0
+        self.mean_t = 0.0
+        self.m2_t = 0.0
+        self.mean_y[:] = 0.0
+        self.c_ty[:] = 0.0
+        self.m2_y[:] = 0.0
+
+    def update(self, t, y):
+        self.count += 1
+        dt = t - self.mean_t
+        self.mean_t += dt/self.count
+        self.m2_t += dt*(t - self.mean_t)
+        self.delta_y[:] = y
+        self.delta_y -= self.mean_y
+        self.m2_y += self.delta_y*self.delta_y*(self.count - 1)/self.count
+        self.mean_y += self.delta_y/self.count
+        self.c_ty += dt*(y - self.mean_y)
+
+    @property
+    def slope(self):
+        if self.count < 2 or self.m2_t <= 0.0:
+            return np.zeros(self.c_ty.shape)
+        return self.c_ty/self.m2_t
+
+    @property
+    def intercept(self):
+        return self.mean_y - self.slope*self.mean_t
+
+    @property
+    def r_squared(self):
+        if self.count < 2 or self.m2_t <= 0.0:
+            return np.zeros(self.c_ty.shape)
+        m2_y = np.where(self.m2_y > 0.0, self.m2_y, 1.0)
+        return self.c_ty*self.c_ty/(self.m2_t*m2_y)
+
+
+class KineticsLog:
+
+    """
+    Appends samples to a binary file on flash in blocks of BLOCK_SIZE records
+    (record: time float32, values num_channel x float32). Logging is disabled
+    if the filesystem is not writable.
+    """
+
+    FILE_NAME = constants.KINETICS_FILE
+    RECORD_FORMAT = f'<f{constants.NUM_CHANNEL}f'
+    RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+    BLOCK_SIZE = constants.KINETICS_BLOCK_SIZE
+
+    def __init__(self):
+        self.block = bytearray(self.RECORD_SIZE*self.BLOCK_SIZE)
+        self.num_in_block = 0
+        self.num_written = 0
+        self.enabled = False
+
+    def start(self):
+        self.num_in_block = 0
+        self.num_written = 0
+        try:
+            with open(self.FILE_NAME, 'wb'):
+                pass
+        except OSError:
+            self.enabled = False
+        else:
+            self.enabled = True
+
+    def append(self, t, values):
+        if not self.enabled:
+            return
+        offset = self.num_in_block*self.RECORD_SIZE
+        struct.pack_into(self.RECORD_FORMAT, self.block, offset, t, *values)
+        self.num_in_block += 1
+        if self.num_in_block == self.BLOCK_SIZE:
+            self.flush()
+
+    def flush(self):
+        if not self.enabled or not self.num_in_block:
+            return
+        try:
+            with open(self.FILE_NAME, 'ab') as f:
+                f.write(memoryview(self.block)[:self.num_in_block*self.RECORD_SIZE])
+        except OSError:
+            self.enabled = False
+        else:
+            self.num_written += self.num_in_block
+        self.num_in_block = 0
+
+
+class Kinetics:
+
+    """ Time series capture of absorbances at a fixed cadence with rate fit """
+
+    def __init__(self, dt=constants.KINETICS_DT):
+        self.dt = dt
+        self.buffer = RingBuffer()
+        self.regression = IncrementalRegression()
+        self.log = KineticsLog()
+        self.t_start = None
+        self.t_next = None
+        self.is_running = False
+
+    def start(self, t_now):
+        self.buffer.reset()
+        self.regression.reset()
+        self.log.start()
+        self.t_start = t_now
+        self.t_next = t_now
+        self.is_running = True
+
+    def stop(self):
+        self.log.flush()
+        self.is_running = False
+
+    def sample_due(self, t_now):
+        return self.is_running and t_now >= self.t_next
+
+    def add_sample(self, t_now, values):
+        t = t_now - self.t_start
+        self.buffer.append(t, values)
+        self.regression.update(t, values)
+        self.log.append(t, values)
+        # Keep a fixed cadence, skip missed samples rather than bunching up
+        while self.t_next <= t_now:
+            self.t_next += self.dt
+
+    @property
+    def elapsed(self):
+        if self.buffer.count == 0:
+            return 0.0
+        return self.buffer.times[self.buffer.last()]
+
+    @property
+    def rates(self):
+        """ Rate of change of absorbance (1/s) for each channel """
+        return self.regression.slope
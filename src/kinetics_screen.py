@@ -0,0 +1,159 @@
+import board
+import displayio
+import constants
+import fonts
+from adafruit_display_text import label
+from adafruit_display_shapes import sparkline
+
+
+class KineticsScreen:
+
+    SPARKLINE_X = 4
+    SPARKLINE_Y = 30
+    SPARKLINE_HEIGHT = 60
+    SPARKLINE_MAX_ITEMS = 76
+
+    def __init__(self):
+        # Setup color palette
+        self.color_to_index = {k: i for i, k in enumerate(constants.COLOR_TO_RGB)}
+        self.palette = displayio.Palette(len(constants.COLOR_TO_RGB))
+        for i, palette_tuple in enumerate(constants.COLOR_TO_RGB.items()):
+            self.palette[i] = palette_tuple[1]
+
+        # Create tile grid
+        self.bitmap = displayio.Bitmap(
+            board.DISPLAY.width,
+            board.DISPLAY.height,
+            len(constants.COLOR_TO_RGB)
+        )
+        self.bitmap.fill(self.color_to_index['black'])
+        self.tile_grid = displayio.TileGrid(self.bitmap, pixel_shader=self.palette)
+        font_scale = 1
+
+        # Create header text label
+        header_str = 'Kinetics'
+        text_color = constants.COLOR_TO_RGB['green']
+        self.header_label = label.Label(
+            fonts.load_font(8),
+            text=header_str,
+            color=text_color,
+            scale=font_scale,
+            anchor_point=(0.5, 1.0),
+        )
+        bbox = self.header_label.bounding_box
+        header_label_x = board.DISPLAY.width // 2
+        header_label_y = bbox[3] + 1
+        self.header_label.anchored_position = (header_label_x, header_label_y)
+
+        # Create channel and absorbance value label
+        value_str = '415nm O.OO'
+        text_color = constants.COLOR_TO_RGB['white']
+        self.value_label = label.Label(
+            fonts.load_font(8),
+            text=value_str,
+            color=text_color,
+            scale=font_scale,
+            anchor_point=(0.0, 1.0),
+        )
+        bbox = self.value_label.bounding_box
+        value_label_x = 1
+        value_label_y = header_label_y + bbox[3] + 6
+        self.value_label.anchored_position = (value_label_x, value_label_y)
+
+        # Create absorbance vs time sparkline
+        sparkline_width = board.DISPLAY.width - 2*self.SPARKLINE_X
+        self.sparkline = sparkline.Sparkline(
+            width=sparkline_width,
+            height=self.SPARKLINE_HEIGHT,
+            max_items=self.SPARKLINE_MAX_ITEMS,
+            x=self.SPARKLINE_X,
+            y=self.SPARKLINE_Y,
+            color=constants.COLOR_TO_RGB['yellow'],
+        )
+
+        # Create rate label
+        rate_str = 'rate O.OOOO/s'
+        text_color = constants.COLOR_TO_RGB['white']
+        self.rate_label = label.Label(
+            fonts.load_font(8),
+            text=rate_str,
+            color=text_color,
+            scale=font_scale,
+            anchor_point=(0.0, 0.0),
+        )
+        rate_label_x = 1
+        rate_label_y = self.SPARKLINE_Y + self.SPARKLINE_HEIGHT + 4
+        self.rate_label.anchored_position = (rate_label_x, rate_label_y)
+
+        # Create elapsed time and run state label
+        time_str = 't O.Os'
+        text_color = constants.COLOR_TO_RGB['gray']
+        self.time_label = label.Label(
+            fonts.load_font(8),
+            text=time_str,
+            color=text_color,
+            scale=font_scale,
+            anchor_point=(0.0, 0.0),
+        )
+        time_label_x = 1
+        time_label_y = board.DISPLAY.height - 15
+        self.time_label.anchored_position = (time_label_x, time_label_y)
+
+        # Create text label for blanking info
+        blank_str = '*'
+        text_color = constants.COLOR_TO_RGB['orange']
+        self.blank_label = label.Label(
+            fonts.load_font(8),
+            text=blank_str,
+            color=text_color,
+            scale=font_scale,
+            anchor_point=(0.5, 0.0),
+        )
+        blank_label_x = board.DISPLAY.width - 10
+        blank_label_y = board.DISPLAY.height - 14
+        self.blank_label.anchored_position = (blank_label_x, blank_label_y)
+
+        # Create display group and add items to it
+        self.group = displayio.Group()
+        self.group.append(self.tile_grid)
+        self.group.append(self.header_label)
+        self.group.append(self.value_label)
+        self.group.append(self.sparkline)
+        self.group.append(self.rate_label)
+        self.group.append(self.time_label)
+        self.group.append(self.blank_label)
+
+    def clear(self):
+        self.sparkline.clear_values()
+
+    def add_value(self, chan, value, rate, r_squared):
+        self.sparkline.add_value(value)
+        self.value_label.text = f'{chan} {value:1.3f}'.replace('0', 'O')
+        self.rate_label.text = f'rate {rate:+1.4f}/s r2 {r_squared:1.2f}'.replace('0', 'O')
+
+    def set_values(self, chan, values):
+        """ Redraw sparkline from a sequence of values, e.g. on channel change """
+        self.sparkline.clear_values()
+        for value in values:
+            self.sparkline.add_value(value, update=False)
+        self.sparkline.update()
+        self.value_label.text = f'{chan}'
+
+    def set_time(self, elapsed, is_running):
+        state_str = 'run' if is_running else 'stop'
+        self.time_label.text = f't {elapsed:1.1f}s {state_str}'.replace('0', 'O')
+
+    def set_not_blanked(self):
+        self.blank_label.text = 'NB'
+
+    def set_blanking(self):
+        self.blank_label.text = '**'
+
+    def set_blanked(self):
+        self.blank_label.text = 'BL'
+
+    def set_reblank(self):
+        self.blank_label.text = 'RB'
+
+    def show(self):
+        board.DISPLAY.show(self.group)
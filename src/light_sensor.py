@@ -1,3 +1,4 @@
+import time
 import busio
 import board
 import constants
@@ -11,18 +12,40 @@ class LightSensor:
     DEFAULT_GAIN = constants.STR_TO_GAIN['16x']
     CHANNEL_NAMES = [k for k in constants.STR_TO_CHANNEL]
     AS7341_MAX_COUNT = 2**16-1
+    AS7341_STEP_US = 2.78
+    AS7341_ATIME = 29
 
-    def __init__(self):
-        i2c = busio.I2C(board.SCL, board.SDA)
+    LOW_BANK = 0
+    HIGH_BANK = 1
+
+    # The driver reports the 100 Hz and 120 Hz flicker status as 1000 and 1200
+    DRIVER_FLICKER_TO_HZ = {1000: 100, 1200: 120}
+
+    def __init__(self, i2c=None):
+        if i2c is None:
+            i2c = busio.I2C(board.SCL, board.SDA)
         try:
             self._device = adafruit_as7341.AS7341(i2c)
         except ValueError as error:
             raise LightSensorIOError(error)
+        self.values = [0]*self.NUM_CHAN
+        self._bank = None
         self.gain = self.DEFAULT_GAIN
+        self._power = True
+        self._max_counts = self.full_scale(self._device.atime, self._device.astep)
+        self._itime_setting = self.integration_time
+        self.flicker_snap = False
+        self.flicker_hz = None
+        self.t_flicker = None
+        self.t_flicker_start = None
+
+    def full_scale(self, atime, astep):
+        """ ADC full scale is (atime + 1)*(astep + 1) up to the 16 bit max """
+        return min((atime + 1)*(astep + 1), self.AS7341_MAX_COUNT)
 
     @property 
     def max_counts(self):
-        return self.AS7341_MAX_COUNT
+        return self._max_counts
 
     @property
     def gain(self):
@@ -33,21 +56,210 @@ class LightSensor:
         self._gain = value
         self._device.gain = value
 
+    @property
+    def power(self):
+        return self._power
+
+    @power.setter
+    def power(self, value):
+        # Powered down between samples by the power manager
+        if value != self._power:
+            self._device._power_enabled = value
+            self._power = value
+
+    @property
+    def led(self):
+        return self._device.led
+
+    @led.setter
+    def led(self, value):
+        self._device.led = value
+
+    @property
+    def led_current(self):
+        return self._device.led_current
+
+    @led_current.setter
+    def led_current(self, value):
+        self._device.led_current = value
+
+    @property
+    def settings_key(self):
+        """ Key identifying the current gain and integration time settings """
+        return (self._gain, self._device.atime, self._device.astep)
+
+    @property
+    def integration_time(self):
+        """ Integration time in ms """
+        steps = (self._device.atime + 1)*(self._device.astep + 1)
+        return 1.0e-3*steps*self.AS7341_STEP_US
+
+    @integration_time.setter
+    def integration_time(self, value):
+        self._itime_setting = value
+        if self.flicker_snap and self.flicker_hz:
+            value = snap_to_flicker(value, self.flicker_hz)
+        num_step = 1000.0*value/(self.AS7341_STEP_US*(self.AS7341_ATIME + 1))
+        astep = min(max(int(round(num_step)) - 1, 0), 65534)
+        self._device.atime = self.AS7341_ATIME
+        self._device.astep = astep
+        self._max_counts = self.full_scale(self.AS7341_ATIME, astep)
+
+    @property
+    def flicker_period(self):
+        """ Period (ms) of the detected ambient flicker or None """
+        if not self.flicker_hz:
+            return None
+        return 1000.0/self.flicker_hz
+
+    def detect_flicker(self):
+        """
+        Run the AS7341 flicker detection (100/120 Hz from mains powered
+        lighting), blocks for FLICKER_DETECT_DT. With flicker_snap the 
+        integration time is snapped to a whole number of flicker periods. 
+        Returns True if the detected flicker frequency changed.
+        """
+        self.start_flicker()
+        time.sleep(constants.FLICKER_DETECT_DT)
+        return self.finish_flicker()
+
+    def start_flicker(self, t_now=None):
+        """ Start a flicker detection without waiting, see poll_flicker() """
+        if not self._power:
+            self.power = True
+        self._device.flicker_detection_enabled = True
+        self.t_flicker_start = time.monotonic() if t_now is None else t_now
+
+    @property
+    def flicker_running(self):
+        return self.t_flicker_start is not None
+
+    def poll_flicker(self, t_now=None):
+        """
+        Advance a flicker detection started with start_flicker(). Returns None
+        until FLICKER_DETECT_DT has passed, then the result of finish_flicker().
+        """
+        if t_now is None:
+            t_now = time.monotonic()
+        if t_now - self.t_flicker_start < constants.FLICKER_DETECT_DT:
+            return None
+        return self.finish_flicker(t_now)
+
+    def finish_flicker(self, t_now=None):
+        try:
+            flicker_hz = self._device.flicker_detected
+        finally:
+            self.stop_flicker()
+        flicker_hz = self.DRIVER_FLICKER_TO_HZ.get(flicker_hz, flicker_hz)
+        self.t_flicker = time.monotonic() if t_now is None else t_now
+        if flicker_hz == self.flicker_hz:
+            return False
+        self.flicker_hz = flicker_hz
+        # Reapply the integration time setting, snapped or not 
+        self.integration_time = self._itime_setting
+        return True
+
+    def stop_flicker(self):
+        """ End (or abandon) a flicker detection, the SMUX is needed for reads """
+        self._device.flicker_detection_enabled = False
+        self.t_flicker_start = None
+
+    @property
+    def flicker_covered(self):
+        """ 
+        True if there is no flicker or the integration time is a whole number
+        of flicker periods, i.e. the flicker integrates out.
+        """
+        if not self.flicker_hz:
+            return True
+        periods = 1.0e-3*self.integration_time*self.flicker_hz
+        num = int(round(periods))
+        return num >= 1 and abs(periods - num) <= constants.FLICKER_SNAP_TOL
+
+    def flicker_check_due(self, t_now=None):
+        if t_now is None:
+            t_now = time.monotonic()
+        if self.t_flicker is None:
+            return True
+        return t_now - self.t_flicker >= constants.FLICKER_CHECK_DT
+
     @property
     def values_as_dict(self):
         values_dict = OrderedDict()
-        values = self.values
+        values = self.raw_values
         for name, value in zip(self.CHANNEL_NAMES, values):
             values_dict[name] = value
         return values_dict
 
     @property
     def raw_values(self):
+        if not self._power:
+            self.power = True
+        if self.t_flicker_start is not None:
+            self.stop_flicker()
         values = list(self._device.all_channels)
         values.append(self._device.channel_nir)
         values.append(self._device.channel_clear)
         return values
 
+    @property
+    def position_values(self):
+        """ Raw values by sensor position, a single position """
+        return [self.raw_values]
+
+    def start_bank(self, bank):
+        """ 
+        Switch the SMUX to a bank of channels and restart the measurement 
+        without waiting for the data (the driver's _configure_f1_f4 and
+        _configure_f5_f8 block until the data is ready).
+        """
+        device = self._device
+        device._color_meas_enabled = False
+        device._smux_command = 2
+        if bank == self.LOW_BANK:
+            device._f1f4_clear_nir()
+        else:
+            device._f5f8_clear_nir()
+        device._smux_enabled = True
+        device._color_meas_enabled = True
+        # Keep the driver's record of the configured bank in sync
+        device._low_channels_configured = bank == self.LOW_BANK
+        device._high_channels_configured = bank == self.HIGH_BANK
+        device._flicker_detection_1k_configured = False
+        self._bank = bank
+
+    def start(self):
+        """ Start a non blocking read of all channels, see poll() """
+        if not self._power:
+            self.power = True
+        if self.t_flicker_start is not None:
+            self.stop_flicker()
+        self.start_bank(self.LOW_BANK)
+
+    def poll(self):
+        """ 
+        Advance a read started with start(), True when all channels have been
+        read into values (same order as raw_values).
+        """
+        if self._bank is None:
+            return True
+        if not self._device._data_ready_bit:
+            return False
+        # astatus, then adc channels 0-5, 4 and 5 are clear and nir
+        reads = self._device._all_channels
+        values = self.values
+        if self._bank == self.LOW_BANK:
+            for i in range(4):
+                values[i] = reads[i + 1]
+            self.start_bank(self.HIGH_BANK)
+            return False
+        for i in range(4):
+            values[i + 4] = reads[i + 1]
+        values[8] = reads[6]
+        values[9] = reads[5]
+        self._bank = None
+        return True
+
     def raw_channel(self, channel):
         if channel >= constants.NUM_CHANNEL:
             raise ValueError('channel out of range') 
@@ -58,6 +270,13 @@ class LightSensor:
 
 
 
+def snap_to_flicker(itime, flicker_hz):
+    """ Integration time (ms) rounded to a whole number of flicker periods """
+    period = 1000.0/flicker_hz
+    num = max(int(round(itime/period)), 1)
+    return num*period
+
+
 class LightSensorOverflow(Exception):
     pass
 
@@ -0,0 +1,172 @@
+import time
+import board
+import ulab.numpy as np
+import constants
+
+class LightSourceError(Exception):
+    pass
+
+class LightSource:
+
+    """
+    Drives the LED named by a calibration ('led') at the configured current.
+
+    Modes:
+        'external'     : LED not driven (external, always on light source)
+        'pulsed'       : LED switched on only while a frame is acquired
+        'differential' : LED on and LED off frames interleaved, the LED off 
+                         frame is subtracted which rejects ambient light and
+                         the sensor dark counts
+
+    The LED is switched off between frames in the driven modes, so it is only 
+    on for one integration per frame. The order of the on and off frames 
+    alternates between frames, so a linear drift of the ambient light cancels
+    over pairs of frames. clock can be replaced (e.g. by a simulated clock)
+    for testing.
+    """
+
+    EXTERNAL = 'external'
+    PULSED = 'pulsed'
+    DIFFERENTIAL = 'differential'
+    ALLOWED_MODES = (EXTERNAL, PULSED, DIFFERENTIAL)
+
+    def __init__(self, light_sensor, mode=EXTERNAL, current=constants.LED_CURRENT,
+            sources=constants.LED_SOURCES, clock=None):
+        self.light_sensor = light_sensor
+        self.clock = time.monotonic if clock is None else clock
+        self.mode = mode
+        self.sources = sources
+        self.name = None
+        self.pin = None
+        self._led = False
+        self._current = None
+        self.default_current = current
+        self.on_first = True
+        self.on_values = None
+        self.ambient_values = None
+        self.num_frames = 0
+        self.on_time = 0.0
+        self.t_first = None
+        self.t_last = None
+
+    @property
+    def is_driven(self):
+        return self.mode != self.EXTERNAL
+
+    @property
+    def is_differential(self):
+        return self.mode == self.DIFFERENTIAL
+
+    def select(self, name=None, current=None):
+        """ Select LED by name (default LED if None) and its current in mA """
+        if name is None:
+            name = constants.LED_DEFAULT
+        name = name.lower()
+        if current is None:
+            current = self.default_current
+        if name != self.name:
+            try:
+                pin_name = self.sources[name]
+            except KeyError:
+                raise LightSourceError(f'unknown led {name}')
+            self.led = False
+            self.release()
+            if pin_name is not None:
+                import digitalio
+                self.pin = digitalio.DigitalInOut(getattr(board, pin_name))
+                self.pin.switch_to_output(value=False)
+            self.name = name
+        self.current = current
+
+    def release(self):
+        if self.pin is not None:
+            self.pin.deinit()
+            self.pin = None
+
+    @property
+    def current(self):
+        return self._current
+
+    @current.setter
+    def current(self, value):
+        if not constants.LED_MIN_CURRENT <= value <= constants.LED_MAX_CURRENT:
+            raise LightSourceError(f'led current {value} out of range')
+        if value != self._current and self.pin is None:
+            # Only the AS7341 LED driver has a current setting
+            self.light_sensor.led_current = value
+        self._current = value
+
+    @property
+    def led(self):
+        return self._led
+
+    @led.setter
+    def led(self, value):
+        if self.pin is None:
+            self.light_sensor.led = value
+        else:
+            self.pin.value = value
+        self._led = value
+
+    def read(self, led):
+        """ One frame with the LED on or off, the LED is on only for the frame """
+        if not led:
+            return np.array(self.light_sensor.position_values)
+        t0 = self.clock()
+        self.led = True
+        try:
+            values = np.array(self.light_sensor.position_values)
+        finally:
+            self.led = False
+        self.on_time += self.clock() - t0
+        return values
+
+    def acquire(self):
+        """ 
+        Raw counts of one frame (ambient subtracted in differential mode) as a
+        (sensor positions, channels) array, a single row for one sensor.
+        """
+        if self.mode == self.EXTERNAL:
+            return np.array(self.light_sensor.position_values)
+        if self.t_first is None:
+            self.t_first = self.clock()
+        if self.mode == self.PULSED:
+            values = self.read(True)
+            self.on_values = values
+        else:
+            if self.on_first:
+                on_values = self.read(True)
+                off_values = self.read(False)
+            else:
+                off_values = self.read(False)
+                on_values = self.read(True)
+            self.on_first = not self.on_first
+            values = on_values - off_values
+            values = np.where(values > 0.0, values, 0.0)
+            self.on_values = on_values
+            self.ambient_values = off_values
+        self.t_last = self.clock()
+        self.num_frames += 1
+        return values
+
+    @property
+    def frame_rate(self):
+        if not self.num_frames or self.t_last <= self.t_first:
+            return None
+        return self.num_frames/(self.t_last - self.t_first)
+
+    @property
+    def stats(self):
+        if not self.num_frames or self.t_last <= self.t_first:
+            duty = None
+        else:
+            duty = self.on_time/(self.t_last - self.t_first)
+        return {
+                'led': self.name,
+                'mode': self.mode,
+                'current': self.current,
+                'frames': self.num_frames,
+                'frame_rate': self.frame_rate,
+                'led_on_time': self.on_time,
+                'led_duty': duty,
+                }
@@ -195,6 +195,9 @@ class MeasureScreen:
     def set_blanked(self):
         self.blank_label.text = ''
 
+    def set_reblank(self):
+        self.blank_label.text = '  re-blank  '
+
     def set_gain(self,value):
         if value is not None:
             value_str = constants.GAIN_TO_STR[value]
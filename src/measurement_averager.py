@@ -0,0 +1,172 @@
+import ulab.numpy as np
+import constants
+from filter_bank import LowpassFilter
+from filter_bank import MedianFilter
+from filter_bank import MovingAverage
+
+class BoxcarAverage:
+
+    """ Block average of n frames. Memory is independent of n. """
+
+    def __init__(self, num=constants.DEFAULT_NUM_AVERAGE, size=constants.NUM_CHANNEL):
+        self.num = num
+        self.sum = np.zeros((size,))
+        self.value = None
+        self.count = 0
+
+    def reset(self):
+        self.sum[:] = 0.0
+        self.value = None
+        self.count = 0
+
+    def update(self, new_value):
+        self.sum += new_value
+        self.count += 1
+        if self.count >= self.num:
+            self.value = self.sum/self.count
+            self.sum[:] = 0.0
+            self.count = 0
+        elif self.value is None:
+            # Show partial block average until the first block is complete
+            return self.sum/self.count
+        return self.value
+
+
+class RunningStats:
+
+    """ Welford running mean and variance for all channels """
+
+    def __init__(self, size=constants.NUM_CHANNEL):
+        self.count = 0
+        self.mean = np.zeros((size,))
+        self.m2 = np.zeros((size,))
+
+    def reset(self):
+        self.count = 0
+        self.mean[:] = 0.0
+        self.m2[:] = 0.0
+
+    def update(self, new_value):
+        self.count += 1
+        delta = new_value - self.mean
+        self.mean += delta/self.count
+        self.m2 += delta*(new_value - self.mean)
+
+    @property
+    def variance(self):
+        if self.count < 2:
+            return np.zeros(self.m2.shape)
+        return self.m2/(self.count - 1)
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+    @property
+    def sem(self):
+        """ Standard error of the mean """
+        if self.count < 2:
+            return np.zeros(self.m2.shape)
+        return np.sqrt(self.variance/self.count)
+
+
+class MeasurementAverager:
+
+    """
+    Averaging layer between the light sensor raw values and the measurement
+    values. Frames are smoothed with the selected filter and running
+    statistics are kept for the mean +/- sd display and for the auto-stop
+    (stable) capture. The exponential filter uses the actual interval
+    between frame timestamps (the loop slows down when idle), LOOP_DT until
+    there are two frames.
+    """
+
+    NONE = 'none'
+    BOXCAR = 'boxcar'
+    EXPONENTIAL = 'exponential'
+    MOVING = 'moving'
+    MEDIAN = 'median'
+    ALLOWED_MODES = (NONE, BOXCAR, EXPONENTIAL, MOVING, MEDIAN)
+
+    def __init__(self, mode=NONE, num=constants.DEFAULT_NUM_AVERAGE,
+            freq_cutoff=constants.DEFAULT_FREQ_CUTOFF):
+        self.mode = mode
+        self.boxcar = BoxcarAverage(num)
+        self.filters = {
+                self.EXPONENTIAL: LowpassFilter(
+                    freq_cutoff = freq_cutoff, 
+                    dt = constants.LOOP_DT, 
+                    size = constants.NUM_CHANNEL
+                    ),
+                self.MOVING: MovingAverage(num, size=constants.NUM_CHANNEL),
+                self.MEDIAN: MedianFilter(constants.MEDIAN_NUM, size=constants.NUM_CHANNEL),
+                }
+        self.stats = RunningStats()
+        self.last_std = np.zeros((constants.NUM_CHANNEL,))
+        self.is_capturing = False
+        self.is_captured = False
+        self.timestamp = None
+
+    def reset(self):
+        self.boxcar.reset()
+        for filt in self.filters.values():
+            filt.reset()
+        self.stats.reset()
+        self.last_std[:] = 0.0
+        self.timestamp = None
+
+    def update(self, raw_values, timestamp=None):
+        """ Averaged values for the raw values of a frame taken at timestamp (ms) """
+        raw_values = np.array(raw_values)
+        dt = None
+        if timestamp is not None:
+            if self.timestamp is not None and timestamp > self.timestamp:
+                dt = 1.0e-3*(timestamp - self.timestamp)
+            self.timestamp = timestamp
+        if self.is_captured:
+            return self.stats.mean
+        if not self.is_capturing and self.stats.count >= self.boxcar.num:
+            # Outside of a capture the sd is computed over blocks of num frames
+            self.last_std[:] = self.stats.std
+            self.stats.reset()
+        self.stats.update(raw_values)
+        if self.is_capturing:
+            if self.is_stable:
+                self.is_capturing = False
+                self.is_captured = True
+            return self.stats.mean
+        if self.mode == self.BOXCAR:
+            return self.boxcar.update(raw_values)
+        elif self.mode == self.EXPONENTIAL:
+            return self.filters[self.mode].update(raw_values, dt)
+        elif self.mode in self.filters:
+            return self.filters[self.mode].update(raw_values)
+        return raw_values
+
+    def start_capture(self):
+        self.stats.reset()
+        self.is_capturing = True
+        self.is_captured = False
+
+    def stop_capture(self):
+        self.is_capturing = False
+        self.is_captured = False
+        self.reset()
+
+    @property
+    def is_stable(self):
+        """ True when the relative standard error is below tolerance on all channels """
+        count = self.stats.count
+        if count >= constants.CAPTURE_MAX_SAMPLES:
+            return True
+        if count < constants.CAPTURE_MIN_SAMPLES:
+            return False
+        mean = abs(self.stats.mean)
+        mean = np.where(mean > 0.0, mean, 1.0)
+        return np.max(self.stats.sem/mean) < constants.CAPTURE_REL_TOL
+
+    @property
+    def std(self):
+        if self.stats.count < 2:
+            return self.last_std
+        return self.stats.std
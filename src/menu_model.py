@@ -0,0 +1,66 @@
+from array import array
+
+class MenuModel:
+
+    """
+    Virtualized menu model. The display string of every item is formatted
+    once when the model is built and stored as utf-8 bytes in a single
+    bytearray with an offset table, so paging through a long menu only slices
+    out the strings of the visible items. A name index sorted by lower case
+    name supports jump-to-letter and prefix search.
+    """
+
+    def __init__(self, names, describe):
+        self.names = names
+        self.text = bytearray()
+        self.offsets = array('I', [0])
+        for i, name in enumerate(names):
+            self.text.extend(describe(i, name).encode())
+            self.offsets.append(len(self.text))
+        keys = [name.lower() for name in names]
+        order = sorted(range(len(names)), key=lambda i: keys[i])
+        self.sorted_index = array('H', order)
+        self.sorted_keys = [keys[i] for i in order]
+
+    def __len__(self):
+        return len(self.names)
+
+    def item_text(self, pos):
+        return str(self.text[self.offsets[pos]:self.offsets[pos+1]], 'utf-8')
+
+    def view_text(self, start, num):
+        stop = min(start + num, len(self.names))
+        return [self.item_text(pos) for pos in range(start, stop)]
+
+    def find_prefix(self, prefix):
+        """ Position of the first item (in sorted order) starting with prefix or None """
+        prefix = prefix.lower()
+        lo = 0
+        hi = len(self.sorted_keys)
+        while lo < hi:
+            mid = (lo + hi)//2
+            if self.sorted_keys[mid] < prefix:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self.sorted_keys) and self.sorted_keys[lo].startswith(prefix):
+            return self.sorted_index[lo]
+        return None
+
+    def next_letter(self, pos):
+        """ Position of the first item whose name starts with the next letter """
+        if not self.names:
+            return pos
+        letter = self.names[pos][:1].lower()
+        # Binary search for the first key after all keys starting with letter
+        lo = 0
+        hi = len(self.sorted_keys)
+        while lo < hi:
+            mid = (lo + hi)//2
+            if self.sorted_keys[mid][:1] <= letter:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == len(self.sorted_keys):
+            lo = 0
+        return self.sorted_index[lo]
@@ -35,7 +35,7 @@ class MenuScreen:
         self.header_label = label.Label(
                 #fonts.font_14pt, 
                 #fonts.font_10pt, 
-                fonts.font_8pt, 
+                fonts.load_font(8), 
                 text = header_str, 
                 color = constants.COLOR_TO_RGB['white'], 
                 scale = font_scale,
@@ -62,7 +62,7 @@ class MenuScreen:
         vert_pix_remaining = board.DISPLAY.height - (menu_line_y1 + 1)
         test_label = label.Label(
                 #fonts.font_10pt, 
-                fonts.font_8pt, 
+                fonts.load_font(8), 
                 text='test',
                 scale=font_scale
                 )
@@ -70,12 +70,14 @@ class MenuScreen:
         self.items_per_screen = vert_pix_remaining//label_dy
 
         self.item_labels = []
+        self.item_texts = []
+        self.curr_item = None
         for i in range(self.items_per_screen): 
             pos_x = 2
             pos_y = menu_line_y0 + (i+1)*label_dy 
             label_tmp = label.Label(
                     #fonts.font_10pt,
-                     fonts.font_8pt,
+                     fonts.load_font(8),
                      text = '',
                      color = constants.COLOR_TO_RGB['white'],
                      scale = font_scale,
@@ -84,6 +86,7 @@ class MenuScreen:
                      padding_right = 160
                      )
             self.item_labels.append(label_tmp)
+            self.item_texts.append('')
 
         # Ceate display group and add items to it
         self.group.append(self.tile_grid)
@@ -95,17 +98,24 @@ class MenuScreen:
         self.set_curr_item(0)
 
     def set_menu_items(self, text_list):
-        for item_label, item_text in zip(self.item_labels, text_list):
-            item_label.text = item_text 
+        # Only labels whose text changed are rewritten
+        for i, item_label in enumerate(self.item_labels):
+            item_text = text_list[i] if i < len(text_list) else ''
+            if item_text != self.item_texts[i]:
+                item_label.text = item_text 
+                self.item_texts[i] = item_text
 
     def set_curr_item(self, num):
+        if num == self.curr_item:
+            return
         for i, item_label in enumerate(self.item_labels):
             if i==num:
                 item_label.color = constants.COLOR_TO_RGB['black']
                 item_label.background_color = constants.COLOR_TO_RGB['yellow']
-            else:
+            elif i==self.curr_item or self.curr_item is None:
                 item_label.color = constants.COLOR_TO_RGB['white']
                 item_label.background_color = constants.COLOR_TO_RGB['black']
+        self.curr_item = num
 
     def show(self):
         board.DISPLAY.show(self.group)
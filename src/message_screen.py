@@ -37,7 +37,7 @@ class MessageScreen:
         text_color = constants.COLOR_TO_RGB['white']
         self.header_label = label.Label(
                 #fonts.font_14pt, 
-                fonts.font_8pt, 
+                fonts.load_font(8), 
                 text = header_str, 
                 color = text_color, 
                 scale = font_scale,
@@ -56,7 +56,7 @@ class MessageScreen:
             text_color = constants.COLOR_TO_RGB['yellow']
             message_label = label.Label(
                     #fonts.font_10pt, 
-                    fonts.font_8pt, 
+                    fonts.load_font(8), 
                     text = message_str, 
                     color = text_color, 
                     scale = font_scale,
@@ -3,11 +3,24 @@ import displayio
 import constants
 import fonts
 from adafruit_display_text import label
+from numeric_field import NumericField
+from numeric_field import load_atlas
 
 
 class MultiMeasureScreen:
 
+    CAPTURING_STR = ' (capt)'
+    CAPTURED_STR = ' (hold)'
+    # Value fields are rotated and run along the display height, 128 px or
+    # 18 glyph tiles of 7 px on the PyBadge. That fits the longest value 
+    # string without std, a channel name with raw counts at the 16 bit max
+    # ('415nm 65535.OO', 14 chars), the std is only appended where it fits
+    # (e.g. '415nm O.52±O.O1') and the field clips anything longer.
+    VALUE_FIELD_X = (1, 84)
+
     def __init__(self):
+        self.header_suffix = ''
+
         # Setup color palette
         self.color_to_index = {k: i for i, k in enumerate(constants.COLOR_TO_RGB)}
         self.palette = displayio.Palette(len(constants.COLOR_TO_RGB))
@@ -28,7 +41,7 @@ class MultiMeasureScreen:
         header_str = 'Measurement'
         text_color = constants.COLOR_TO_RGB['green']
         self.header_label = label.Label(
-            fonts.font_8pt,
+            fonts.load_font(8),
             text=header_str,
             color=text_color,
             scale=font_scale,
@@ -39,32 +52,32 @@ class MultiMeasureScreen:
         header_label_y = bbox[3] + 1
         self.header_label.anchored_position = (header_label_x, header_label_y)
 
-        # Create value text labels
+        # Create value fields, drawn from the prebaked glyph atlas so that an
+        # update only rewrites the tiles of characters that changed.
+        self.value_field_chars = board.DISPLAY.height//load_atlas().tile_width
         self.value_labels = []
-        for xpos in (1, 84):
+        for xpos in self.VALUE_FIELD_X:
             for i in range(5):
                 dummy_value = 0.0
                 value_str = f'{dummy_value:1.2f}'.replace('0', 'O')
                 text_color = constants.COLOR_TO_RGB['white']
-                value_label = label.Label(
-                    fonts.font_8pt,
-                    text=value_str,
+                value_label = NumericField(
+                    self.value_field_chars,
                     color=text_color,
-                    scale=font_scale,
-                    anchor_point=(0.0, 1.0),
                     rotation=90,
                 )
-                bbox = value_label.bounding_box
+                value_label.text = value_str
                 value_label_x = xpos
-                value_label_y = header_label_y + (i + 1) * (bbox[3] + 7) + 5
-                value_label.anchored_position = (value_label_x, value_label_y)
+                value_label_y = header_label_y + (i + 1) * (value_label.height + 7) + 5
+                value_label.x = value_label_x
+                value_label.y = value_label_y - value_label.height
                 self.value_labels.append(value_label)
 
         # Create text label for blanking info
         blank_str = '*'
         text_color = constants.COLOR_TO_RGB['orange']
         self.blank_label = label.Label(
-            fonts.font_8pt,
+            fonts.load_font(8),
             text=blank_str,
             color=text_color,
             scale=font_scale,
@@ -79,7 +92,7 @@ class MultiMeasureScreen:
         bat_str = 'battery 0.0V'
         text_color = constants.COLOR_TO_RGB['white']
         self.bat_label = label.Label(
-            fonts.font_8pt,
+            fonts.load_font(8),
             text=bat_str,
             color=text_color,
             scale=font_scale,
@@ -94,7 +107,7 @@ class MultiMeasureScreen:
         gain_str = 'ABCX'
         text_color = constants.COLOR_TO_RGB['gray']
         self.gain_label = label.Label(
-            fonts.font_8pt,
+            fonts.load_font(8),
             text=gain_str,
             color=text_color,
             scale=font_scale,
@@ -110,19 +123,28 @@ class MultiMeasureScreen:
         self.group.append(self.tile_grid)
         self.group.append(self.header_label)
         for item in self.value_labels:
-            self.group.append(item)
+            self.group.append(item.tile_grid)
         self.group.append(self.blank_label)
         self.group.append(self.bat_label)
         self.group.append(self.gain_label)
 
-    def set_measurement(self, name, units, values, chans, precision):
+    def set_measurement(self, name, units, values, chans, precision, stds=None, flags=None):
         if values is None:
-            self.values_label.color = constants.COLOR_TO_RGB['orange']
-            self.values_label.text = 'range error'
+            # Value fields only have numeric glyphs, message goes in the header
+            self.header_label.text = f'{name} range error'
+            for value_label in self.value_labels:
+                value_label.text = '----'
+                value_label.color = constants.COLOR_TO_RGB['orange']
         else:
-            self.header_label.text = name
+            self.header_label.text = f'{name}{self.header_suffix}'
             # Display deviations for Psilocybin, otherwise standard measurements
             if name == "PSILOCYBIN" and isinstance(values, dict):
+                if 'error' in values:
+                    # No baseline, the message has no glyphs in the value fields
+                    for value_label in self.value_labels:
+                        value_label.text = '----'
+                        value_label.color = constants.COLOR_TO_RGB['orange']
+                    return
                 for label, (channel, deviation) in zip(self.value_labels, values.items()):
                     # Prüfen, ob der Deviation-Wert numerisch ist, um Fehler zu vermeiden
                     if isinstance(deviation, (int, float)):
@@ -134,21 +156,39 @@ class MultiMeasureScreen:
                         label.text = f'{channel} N/A'
                         label.color = constants.COLOR_TO_RGB['orange']
             else:
-                for label, value, chan in zip(self.value_labels, values, chans):
+                if stds is None:
+                    stds = [None]*len(self.value_labels)
+                for i, (label, value, chan, std) in enumerate(zip(self.value_labels, values, chans, stds)):
                     # Prüfen, ob der Wert numerisch ist, um Fehler zu vermeiden
                     if isinstance(value, (int, float)):
                         values_str = f'{chan} {abs(value):1.2f}'
+                        if std is not None:
+                            std_str = f'\u00b1{std:1.2f}'
+                            # Larger values (e.g. concentrations) drop the std
+                            if len(values_str) + len(std_str) <= self.value_field_chars:
+                                values_str = f'{values_str}{std_str}'
                         values_str = values_str.replace('0', 'O')
                         label.text = values_str
-                        label.color = constants.COLOR_TO_RGB['white']
+                        # Channels with quality flags are color coded
+                        color = 'white' if flags is None else flags.color(i)
+                        label.color = constants.COLOR_TO_RGB[color]
                     else:
                         label.text = f'{chan} N/A'
                         label.color = constants.COLOR_TO_RGB['orange']
 
+    def set_capture(self, is_capturing, is_captured):
+        if is_capturing:
+            self.header_suffix = self.CAPTURING_STR
+        elif is_captured:
+            self.header_suffix = self.CAPTURED_STR
+        else:
+            self.header_suffix = ''
+
     def set_overflow(self, name):
-        self.header_label.text = name
-        self.value_label.text = 'overflow'
-        self.value_label.color = constants.COLOR_TO_RGB['red']
+        self.header_label.text = f'{name} overflow'
+        for value_label in self.value_labels:
+            value_label.text = '----'
+            value_label.color = constants.COLOR_TO_RGB['red']
 
     def set_not_blanked(self):
         self.blank_label.text = 'NB'
@@ -159,8 +199,16 @@ class MultiMeasureScreen:
     def set_blanked(self):
         self.blank_label.text = 'BL'
 
-    def set_battery(self, value):
-        self.bat_label.text = f'battery {value:1.1f}V'
+    def set_reblank(self):
+        self.blank_label.text = 'RB'
+
+    def set_battery(self, value, soc=None):
+        if soc is None:
+            bat_str = f'battery {value:1.1f}V'
+        else:
+            bat_str = f'battery {soc:1.0f}%'
+        if bat_str != self.bat_label.text:
+            self.bat_label.text = bat_str
 
     def set_gain(self, value):
         self.gain_label.text = constants.GAIN_TO_STR[value]
@@ -0,0 +1,116 @@
+import displayio
+import constants
+
+_atlas = None
+
+class NumericFieldError(Exception):
+    pass
+
+class GlyphAtlas:
+
+    """
+    Prebaked glyph atlas (see tools/make_glyph_atlas.py). One bitmap with a
+    row of fixed size tiles, one for each character in NUMERIC_ATLAS_CHARS.
+    """
+
+    def __init__(self, filename=constants.NUMERIC_ATLAS_BMP, chars=constants.NUMERIC_ATLAS_CHARS):
+        self.bitmap = displayio.OnDiskBitmap(filename)
+        self.chars = chars
+        self.char_to_index = {c: i for i, c in enumerate(chars)}
+        self.tile_width = self.bitmap.width//len(chars)
+        self.tile_height = self.bitmap.height
+
+    def index(self, char):
+        try:
+            return self.char_to_index[char]
+        except KeyError:
+            raise NumericFieldError(f'no glyph for {char!r} in the numeric atlas')
+
+
+def load_atlas():
+    global _atlas
+    if _atlas is None:
+        _atlas = GlyphAtlas()
+    return _atlas
+
+
+class NumericField:
+
+    """
+    Fixed width text field drawn from the glyph atlas with a TileGrid. Only
+    the tiles of characters that changed are rewritten on update. Text longer
+    than num_chars is clipped, characters without a glyph in the atlas raise
+    NumericFieldError.
+    """
+
+    def __init__(self, num_chars, color=constants.COLOR_TO_RGB['white'], rotation=0):
+        self.atlas = load_atlas()
+        self.num_chars = num_chars
+        self.palette = displayio.Palette(2)
+        self.palette[0] = constants.COLOR_TO_RGB['black']
+        self.palette[1] = color
+        self.palette.make_transparent(0)
+        self.tile_grid = displayio.TileGrid(
+                self.atlas.bitmap,
+                pixel_shader = self.palette,
+                width = num_chars,
+                height = 1,
+                tile_width = self.atlas.tile_width,
+                tile_height = self.atlas.tile_height,
+                default_tile = 0,
+                )
+        if rotation == 90:
+            self.tile_grid.transpose_xy = True
+            self.tile_grid.flip_x = True
+        self.indices = bytearray(num_chars)
+        self._text = ''
+
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, text):
+        text = text[:self.num_chars]
+        if text == self._text:
+            return
+        index = self.atlas.index
+        for i in range(self.num_chars):
+            new_index = index(text[i]) if i < len(text) else 0
+            if new_index != self.indices[i]:
+                self.tile_grid[i] = new_index
+                self.indices[i] = new_index
+        self._text = text
+
+    @property
+    def color(self):
+        return self.palette[1]
+
+    @color.setter
+    def color(self, value):
+        if self.palette[1] != value:
+            self.palette[1] = value
+
+    @property
+    def x(self):
+        return self.tile_grid.x
+
+    @x.setter
+    def x(self, value):
+        self.tile_grid.x = value
+
+    @property
+    def y(self):
+        return self.tile_grid.y
+
+    @y.setter
+    def y(self, value):
+        self.tile_grid.y = value
+
+    @property
+    def width(self):
+        return self.num_chars*self.atlas.tile_width
+
+    @property
+    def height(self):
+        return self.atlas.tile_height
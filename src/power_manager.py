@@ -0,0 +1,129 @@
+import time
+import board
+import ulab.numpy as np
+import constants
+
+class PowerState:
+    ACTIVE = 0
+    IDLE = 1
+    DIM = 2
+    BLANK = 3
+    NAMES = ('active', 'idle', 'dim', 'blank')
+
+
+class PowerManager:
+
+    """
+    Duty cycling of the main loop, light sensor and display. The device steps
+    down from ACTIVE when there is no button, host or sample activity:
+
+        IDLE    readings stable for POWER_IDLE_DT, slower loop, sensor
+                powered down between samples
+        DIM     display dimmed after POWER_DIM_DT
+        BLANK   display off and no measurements after POWER_BLANK_DT
+
+    Any activity returns to ACTIVE. clock, sleep_func and display can be
+    replaced (e.g. by a simulated clock and its sleep) for testing.
+    """
+
+    def __init__(self, enabled=True, clock=None, sleep_func=None, display=None):
+        self.enabled = enabled
+        self.clock = time.monotonic if clock is None else clock
+        self.sleep_func = time.sleep if sleep_func is None else sleep_func
+        self.display = board.DISPLAY if display is None else display
+        t_now = self.clock()
+        self.state = PowerState.ACTIVE
+        self.t_state = t_now
+        self.t_activity = t_now
+        self.state_time = [0.0]*len(PowerState.NAMES)
+        self.num_wake = 0
+        self.ref_values = None
+
+    def set_state(self, state):
+        if state == self.state:
+            return
+        t_now = self.clock()
+        self.state_time[self.state] += t_now - self.t_state
+        self.t_state = t_now
+        self.state = state
+        if state == PowerState.DIM:
+            self.display.brightness = constants.POWER_DIM_BRIGHTNESS
+        elif state == PowerState.BLANK:
+            self.display.brightness = 0.0
+        else:
+            self.display.brightness = 1.0
+
+    def activity(self):
+        """ Register activity, returns True if the display was blanked """
+        was_blank = self.state == PowerState.BLANK
+        self.t_activity = self.clock()
+        if self.state != PowerState.ACTIVE:
+            self.num_wake += 1
+            self.set_state(PowerState.ACTIVE)
+        return was_blank
+
+    def update_values(self, values):
+        """ A change in the sensor readings (e.g. new sample) counts as activity """
+        values = np.array(values)
+        if self.ref_values is None:
+            self.ref_values = values
+            return
+        ref = np.where(self.ref_values > 1.0, self.ref_values, 1.0)
+        if np.max(abs(values - self.ref_values)/ref) > constants.POWER_STABLE_TOL:
+            self.ref_values = values
+            self.activity()
+
+    def update(self, is_busy=False):
+        if not self.enabled or is_busy:
+            self.activity()
+            return
+        t_idle = self.clock() - self.t_activity
+        if t_idle >= constants.POWER_BLANK_DT:
+            self.set_state(PowerState.BLANK)
+        elif t_idle >= constants.POWER_DIM_DT:
+            self.set_state(PowerState.DIM)
+        elif t_idle >= constants.POWER_IDLE_DT:
+            self.set_state(PowerState.IDLE)
+
+    @property
+    def loop_dt(self):
+        if self.state == PowerState.ACTIVE:
+            return constants.LOOP_DT
+        elif self.state == PowerState.IDLE:
+            return constants.POWER_IDLE_LOOP_DT
+        return constants.POWER_SLEEP_LOOP_DT
+
+    @property
+    def sensor_sleep(self):
+        """ True if the light sensor should be powered down between samples """
+        return self.state != PowerState.ACTIVE
+
+    @property
+    def display_off(self):
+        return self.state == PowerState.BLANK
+
+    def sleep(self, wake=None):
+        """ Sleep for loop_dt, returns early when wake() is True """
+        t_end = self.clock() + self.loop_dt
+        while True:
+            dt = t_end - self.clock()
+            if dt <= 0.0:
+                return
+            self.sleep_func(min(dt, constants.POWER_WAKE_POLL_DT))
+            if wake is not None and wake():
+                return
+
+    @property
+    def stats(self):
+        t_now = self.clock()
+        state_time = list(self.state_time)
+        state_time[self.state] += t_now - self.t_state
+        total = sum(state_time)
+        duty = {}
+        for name, t in zip(PowerState.NAMES, state_time):
+            duty[name] = t/total if total > 0 else 0.0
+        return {
+                'state': PowerState.NAMES[self.state],
+                'duty': duty,
+                'wake': self.num_wake,
+                }
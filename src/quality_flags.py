@@ -0,0 +1,93 @@
+import ulab.numpy as np
+import constants
+
+SATURATED = 0x01
+LOW_SIGNAL = 0x02
+CLIPPED = 0x04
+NEGATIVE_A = 0x08
+OUT_OF_RANGE = 0x10
+NAN_BASELINE = 0x20
+FLICKER = 0x40
+
+FLAG_TO_STR = {
+        SATURATED: 'saturated',
+        LOW_SIGNAL: 'low_signal',
+        CLIPPED: 'clipped',
+        NEGATIVE_A: 'negative_a',
+        OUT_OF_RANGE: 'out_of_range',
+        NAN_BASELINE: 'nan_baseline',
+        FLICKER: 'flicker',
+        }
+
+FLAG_TO_COLOR = {
+        0: 'white',
+        SATURATED: 'red',
+        NAN_BASELINE: 'red',
+        LOW_SIGNAL: 'orange',
+        OUT_OF_RANGE: 'yellow',
+        CLIPPED: 'yellow',
+        NEGATIVE_A: 'yellow',
+        FLICKER: 'white',
+        }
+
+
+class QualityFlags:
+
+    """
+    Per channel quality bitmask of the current frame (uint8 per channel).
+    Flags are cleared at the start of each frame with begin() and set from
+    boolean masks computed alongside the measurement math. Each flag is set
+    at most once per frame, so adding the masked bit is the same as or-ing.
+    """
+
+    def __init__(self, size=constants.NUM_CHANNEL):
+        self.flags = np.zeros((size,), dtype=np.uint8)
+
+    def begin(self, raw_values, blank_values, max_counts, peak_values=None):
+        """ 
+        Start a new frame, flags that depend on the raw counts. peak_values are
+        the counts checked for saturation if the raw values are derived, e.g.
+        the LED on frame of an ambient subtracted frame.
+        """
+        self.flags[:] = 0
+        if peak_values is None:
+            peak_values = raw_values
+        self.add(SATURATED, peak_values >= max_counts)
+        low = (raw_values < constants.QUALITY_NOISE_FLOOR) + (blank_values < constants.QUALITY_NOISE_FLOOR)
+        self.add(LOW_SIGNAL, low > 0)
+        # Note, value - value is nan for inf and nan
+        finite = (blank_values - blank_values) == 0.0
+        self.add(NAN_BASELINE, (finite * (blank_values > 0.0)) == 0)
+
+    def add(self, flag, mask):
+        self.flags += flag*np.array(mask, dtype=np.uint8)
+
+    def set_all(self, flag):
+        self.add(flag, np.ones(self.flags.shape, dtype=np.uint8))
+
+    @property
+    def any(self):
+        return np.max(self.flags) > 0
+
+    def worst(self, i):
+        """ Most severe flag set on channel i (0 if none) """
+        value = self.flags[i]
+        for flag in (SATURATED, NAN_BASELINE, LOW_SIGNAL, OUT_OF_RANGE, CLIPPED, NEGATIVE_A, FLICKER):
+            if value & flag:
+                return flag
+        return 0
+
+    def color(self, i):
+        return FLAG_TO_COLOR[self.worst(i)]
+
+    def as_list(self):
+        return [int(x) for x in self.flags]
+
+    def as_dict(self):
+        """ Channel name to list of flag names, channels without flags omitted """
+        flags_dict = {}
+        for name, value in zip(constants.STR_TO_CHANNEL, self.flags):
+            names = [v for k, v in FLAG_TO_STR.items() if value & k]
+            if names:
+                flags_dict[name] = names
+        return flags_dict
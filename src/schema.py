@@ -0,0 +1,183 @@
+TYPES = {
+        'number': (int, float),
+        'int': (int,),
+        'str': (str,),
+        'bool': (bool,),
+        'list': (list,),
+        'dict': (dict,),
+        }
+
+
+class Schema:
+
+    """
+    Declarative validation of a settings entry (dict). The schema is a dict
+    of field name to spec, e.g.
+
+        {'gain': {'type': 'str', 'enum': constants.STR_TO_GAIN}}
+
+    spec keys: type, required, null (None allowed), enum, ignore_case (enum
+    of lower case strings), min, max, len, max_len, items (spec of list
+    items), keys/values (specs of dict keys and values) and schema (a Schema
+    for a nested dict). rules is a list of (field, function) for
+    checks across fields, the function returns an error message or None.
+    Rules are only run when all fields are valid.
+
+    The schema is compiled once into a flat list of validator closures and
+    validate() runs them over an entry in one pass, returning all errors as
+    (field, message) tuples.
+    """
+
+    def __init__(self, fields, rules=()):
+        self.validators = [compile_field(name, spec) for name, spec in fields.items()]
+        self.rules = [compile_rule(name, func) for name, func in rules]
+
+    def validate(self, entry, prefix=''):
+        errors = []
+        if not isinstance(entry, dict):
+            errors.append((None, f'{prefix}must be dict'.strip()))
+            return errors
+        for validator in self.validators:
+            validator(entry, prefix, errors)
+        if not errors:
+            # Rules can rely on the field types
+            for rule in self.rules:
+                rule(entry, prefix, errors)
+        return errors
+
+
+def compile_field(name, spec):
+    checks = compile_value(spec)
+    required = spec.get('required', False)
+    def validate(entry, prefix, errors):
+        try:
+            value = entry[name]
+        except KeyError:
+            if required:
+                errors.append((name, f'{prefix}missing {name}'))
+            return
+        messages = []
+        run_checks(checks, value, f'{prefix}{name}', messages)
+        for message in messages:
+            errors.append((name, message))
+    return validate
+
+
+def compile_rule(name, func):
+    def validate(entry, prefix, errors):
+        message = func(entry)
+        if message is not None:
+            errors.append((name, f'{prefix}{message}'))
+    return validate
+
+
+def run_checks(checks, value, label, messages):
+    for check in checks:
+        if not check(value, label, messages):
+            return False
+    return True
+
+
+def compile_value(spec):
+    """ List of checks, check(value, label, messages) returns False to stop """
+    checks = []
+    if spec.get('null', False):
+        checks.append(check_null)
+    if 'type' in spec:
+        checks.append(check_type(spec['type']))
+    if 'enum' in spec:
+        checks.append(check_enum(spec['enum'], spec.get('ignore_case', False)))
+    if 'min' in spec or 'max' in spec:
+        checks.append(check_bounds(spec.get('min'), spec.get('max')))
+    if 'len' in spec or 'max_len' in spec:
+        checks.append(check_len(spec.get('len'), spec.get('max_len')))
+    if 'items' in spec:
+        checks.append(check_items(compile_value(spec['items'])))
+    if 'keys' in spec or 'values' in spec:
+        key_checks = compile_value(spec.get('keys', {}))
+        value_checks = compile_value(spec.get('values', {}))
+        checks.append(check_mapping(key_checks, value_checks))
+    if 'schema' in spec:
+        checks.append(check_schema(spec['schema']))
+    return checks
+
+
+def check_null(value, label, messages):
+    # Stop without error, None is allowed
+    return value is not None
+
+
+def check_type(type_name):
+    types = TYPES[type_name]
+    def check(value, label, messages):
+        # Note, bool is a subclass of int
+        if isinstance(value, types) and (bool in types or not isinstance(value, bool)):
+            return True
+        messages.append(f'{label} must be {type_name}')
+        return False
+    return check
+
+
+def check_enum(allowed, ignore_case=False):
+    allowed = tuple(allowed)
+    def check(value, label, messages):
+        key = value.lower() if ignore_case and isinstance(value, str) else value
+        if key in allowed:
+            return True
+        messages.append(f'{label} unknown value {value}')
+        return False
+    return check
+
+
+def check_bounds(min_value, max_value):
+    def check(value, label, messages):
+        if min_value is not None and value < min_value:
+            messages.append(f'{label} must be >= {min_value}')
+            return False
+        if max_value is not None and value > max_value:
+            messages.append(f'{label} must be <= {max_value}')
+            return False
+        return True
+    return check
+
+
+def check_len(length, max_length):
+    def check(value, label, messages):
+        if length is not None and len(value) != length:
+            messages.append(f'{label} must have length {length}')
+            return False
+        if max_length is not None and len(value) > max_length:
+            messages.append(f'{label} too long (max {max_length})')
+            return False
+        return True
+    return check
+
+
+def check_items(item_checks):
+    def check(value, label, messages):
+        is_ok = True
+        for i, item in enumerate(value):
+            is_ok &= run_checks(item_checks, item, f'{label}[{i}]', messages)
+        return is_ok
+    return check
+
+
+def check_mapping(key_checks, value_checks):
+    def check(value, label, messages):
+        is_ok = True
+        for key, item in value.items():
+            if run_checks(key_checks, key, f'{label} key', messages):
+                is_ok &= run_checks(value_checks, item, f'{label} {key}', messages)
+            else:
+                is_ok = False
+        return is_ok
+    return check
+
+
+def check_schema(schema):
+    def check(value, label, messages):
+        errors = schema.validate(value, f'{label} ')
+        for name, message in errors:
+            messages.append(message)
+        return not errors
+    return check
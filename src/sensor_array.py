@@ -0,0 +1,172 @@
+import time
+import busio
+import board
+import constants
+from light_sensor import LightSensor
+from light_sensor import LightSensorIOError
+
+class SensorArray:
+
+    """
+    Several AS7341 sensors (positions) on one or more I2C buses, sensors with
+    the same address on one bus sit behind a TCA9548A mux. Each position is 
+    given by a dict with optional keys
+
+        scl, sda   board pin names of the bus (default SCL, SDA)
+        mux        address of the TCA9548A mux (e.g. 0x70)
+        channel    mux channel (0-7)
+        name       e.g. 'sample' or 'reference'
+
+    Position 0 is the primary sensor, the array otherwise behaves like a
+    single LightSensor (attributes not defined here are those of the primary
+    sensor) with raw_values of the primary sensor. A read starts the
+    integration on all sensors at once and collects each sensor's channels
+    when its data is ready, so the read time hardly grows with the number of
+    sensors. 
+    """
+
+    def __init__(self, specs):
+        if not specs:
+            raise LightSensorIOError('no sensors')
+        buses = {}
+        muxes = {}
+        self.names = []
+        self.sensors = []
+        for i, spec in enumerate(specs):
+            bus_key = (spec.get('scl', 'SCL'), spec.get('sda', 'SDA'))
+            try:
+                i2c = buses[bus_key]
+            except KeyError:
+                i2c = busio.I2C(getattr(board, bus_key[0]), getattr(board, bus_key[1]))
+                buses[bus_key] = i2c
+            mux_address = spec.get('mux')
+            if mux_address is not None:
+                mux_key = (bus_key, mux_address)
+                try:
+                    mux = muxes[mux_key]
+                except KeyError:
+                    mux = make_mux(i2c, mux_address)
+                    muxes[mux_key] = mux
+                i2c = mux[spec.get('channel', 0)]
+            self.sensors.append(LightSensor(i2c))
+            self.names.append(spec.get('name', f'pos{i}'))
+        self.primary = self.sensors[0]
+        self.done = bytearray(len(self.sensors))
+        self.values = [sensor.values for sensor in self.sensors]
+
+    def __len__(self):
+        return len(self.sensors)
+
+    def __getattr__(self, name):
+        return getattr(self.primary, name)
+
+    @property
+    def gain(self):
+        return self.primary.gain
+
+    @gain.setter
+    def gain(self, value):
+        for sensor in self.sensors:
+            sensor.gain = value
+
+    @property
+    def integration_time(self):
+        return self.primary.integration_time
+
+    @integration_time.setter
+    def integration_time(self, value):
+        for sensor in self.sensors:
+            sensor.integration_time = value
+
+    @property
+    def power(self):
+        return self.primary.power
+
+    @power.setter
+    def power(self, value):
+        for sensor in self.sensors:
+            sensor.power = value
+
+    @property
+    def flicker_snap(self):
+        return self.primary.flicker_snap
+
+    @flicker_snap.setter
+    def flicker_snap(self, value):
+        for sensor in self.sensors:
+            sensor.flicker_snap = value
+
+    @property
+    def led(self):
+        return self.primary.led
+
+    @led.setter
+    def led(self, value):
+        # The light source is driven by the primary sensor's LED driver
+        self.primary.led = value
+
+    @property
+    def led_current(self):
+        return self.primary.led_current
+
+    @led_current.setter
+    def led_current(self, value):
+        self.primary.led_current = value
+
+    def detect_flicker(self):
+        """ Flicker detection on the primary sensor, applied to all """
+        changed = self.primary.detect_flicker()
+        if changed:
+            self.apply_flicker()
+        return changed
+
+    def poll_flicker(self, t_now=None):
+        """ See LightSensor.poll_flicker, a change is applied to all """
+        changed = self.primary.poll_flicker(t_now)
+        if changed:
+            self.apply_flicker()
+        return changed
+
+    def apply_flicker(self):
+        for sensor in self.sensors[1:]:
+            sensor.flicker_hz = self.primary.flicker_hz
+            sensor.integration_time = sensor._itime_setting
+
+    def read(self):
+        """ Concurrent read of all sensors, list of channel values by position """
+        for sensor in self.sensors:
+            sensor.start()
+        done = self.done
+        num_done = 0
+        for i in range(len(done)):
+            done[i] = 0
+        # Both banks take one integration each, allow for twice that
+        timeout = 4.0e-3*self.primary.integration_time + constants.SENSOR_READ_TIMEOUT
+        t_start = time.monotonic()
+        while num_done < len(done):
+            for i, sensor in enumerate(self.sensors):
+                if not done[i] and sensor.poll():
+                    done[i] = 1
+                    num_done += 1
+            if time.monotonic() - t_start > timeout:
+                raise LightSensorIOError('timeout reading sensor array')
+        return self.values
+
+    @property
+    def position_values(self):
+        return self.read()
+
+    @property
+    def raw_values(self):
+        return list(self.read()[0])
+
+
+def make_mux(i2c, address):
+    try:
+        import adafruit_tca9548a
+    except ImportError:
+        raise LightSensorIOError('sensor mux needs adafruit_tca9548a library')
+    try:
+        return adafruit_tca9548a.TCA9548A(i2c, address=address)
+    except ValueError as error:
+        raise LightSensorIOError(error)
@@ -0,0 +1,75 @@
+import time
+import ulab.numpy as np
+import constants
+from host_control import HostTask
+
+class AverageTask(HostTask):
+
+    """
+    Mean of num frames, one frame read per step. read_frame() returns a new
+    frame (the back frame of the frame buffer), the last frame gets the mean
+    raw values in frame.mean and finish(frame) processes and publishes it in
+    the same step and returns the result.
+    """
+
+    def __init__(self, num, read_frame, finish):
+        self.num = num
+        self.read_frame = read_frame
+        self.finish = finish
+        self.count = 0
+        self.raw_sum = np.zeros((constants.NUM_CHANNEL,))
+        self.frame = None
+
+    def step(self):
+        frame = self.read_frame()
+        self.raw_sum += np.array(frame.raw)
+        self.count += 1
+        if self.count < self.num:
+            return False
+        frame.mean[:] = self.raw_sum/self.num
+        self.frame = frame
+        self.result = self.finish(frame)
+        return True
+
+
+class BlankTask(HostTask):
+
+    """
+    Blank samples, begin() (e.g. flicker detection and dark frame) runs in
+    the first step, then one sample of size values is acquired per step at
+    least dt apart. finish(samples) computes the blank from the num x size
+    samples and returns the result.
+    """
+
+    def __init__(self, num, size, acquire, finish, begin=None, dt=constants.BLANK_DT, clock=None):
+        self.num = num
+        self.acquire = acquire
+        self.finish = finish
+        self.begin = begin
+        self.dt = dt
+        self.clock = time.monotonic if clock is None else clock
+        self.samples = np.zeros((num, size))
+        self.pos = 0
+        self.t_next = None
+
+    def step(self):
+        if self.begin is not None:
+            self.begin()
+            self.begin = None
+            return False
+        t_now = self.clock()
+        if self.t_next is not None and t_now < self.t_next:
+            return False
+        self.samples[self.pos, :] = self.acquire()
+        self.pos += 1
+        self.t_next = t_now + self.dt
+        if self.pos < self.num:
+            return False
+        self.result = self.finish(self.samples)
+        return True
+
+    def run(self):
+        while not self.step():
+            if self.t_next is not None:
+                time.sleep(max(self.t_next - self.clock(), 0.0))
+        return self.result
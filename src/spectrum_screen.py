@@ -0,0 +1,271 @@
+import board
+import displayio
+import bitmaptools
+import constants
+import fonts
+from adafruit_display_text import label
+
+
+class SpectrumScreen:
+
+    """
+    Measure screen showing the 10 channel spectrum as bars drawn into a single
+    preallocated bitmap. Only the rows of bars whose height changed are
+    redrawn on each frame.
+    """
+
+    PLOT_X = 2
+    PLOT_Y = 16
+    PLOT_HEIGHT = 94
+    BAR_WIDTH = 12
+    BAR_PITCH = 16
+    MIN_FULL_SCALE = 0.25
+    CAPTURING_STR = ' (capt)'
+    CAPTURED_STR = ' (hold)'
+
+    def __init__(self):
+        self.header_suffix = ''
+        self.num_bars = constants.NUM_CHANNEL
+        self.bar_heights = bytearray(self.num_bars)
+        self.ref_rows = [None]*self.num_bars
+        self.ref_ratios = None
+        self.baseline_channel = constants.STR_TO_CHANNEL['590nm']
+        self.full_scale = None
+
+        # Setup color palette
+        self.color_to_index = {k: i for i, k in enumerate(constants.COLOR_TO_RGB)}
+        self.palette = displayio.Palette(len(constants.COLOR_TO_RGB))
+        for i, palette_tuple in enumerate(constants.COLOR_TO_RGB.items()):
+            self.palette[i] = palette_tuple[1]
+        self.background_index = self.color_to_index['black']
+        self.bar_index = self.color_to_index['white']
+        self.reference_index = self.color_to_index['red']
+        self.bar_colors = bytearray([self.bar_index]*self.num_bars)
+
+        # Create tile grid for spectrum plot
+        self.bitmap = displayio.Bitmap(
+            board.DISPLAY.width,
+            self.PLOT_HEIGHT,
+            len(constants.COLOR_TO_RGB)
+        )
+        self.bitmap.fill(self.background_index)
+        self.tile_grid = displayio.TileGrid(self.bitmap, pixel_shader=self.palette)
+        self.tile_grid.y = self.PLOT_Y
+        font_scale = 1
+
+        # Create header text label
+        header_str = 'Measurement'
+        text_color = constants.COLOR_TO_RGB['green']
+        self.header_label = label.Label(
+            fonts.load_font(8),
+            text=header_str,
+            color=text_color,
+            scale=font_scale,
+            anchor_point=(0.5, 1.0),
+        )
+        bbox = self.header_label.bounding_box
+        header_label_x = board.DISPLAY.width // 2
+        header_label_y = bbox[3] + 1
+        self.header_label.anchored_position = (header_label_x, header_label_y)
+
+        # Create full scale text label
+        scale_str = 'O.OO'
+        text_color = constants.COLOR_TO_RGB['gray']
+        self.scale_label = label.Label(
+            fonts.load_font(8),
+            text=scale_str,
+            color=text_color,
+            scale=font_scale,
+            anchor_point=(1.0, 0.0),
+        )
+        self.scale_label.anchored_position = (board.DISPLAY.width - 1, self.PLOT_Y)
+
+        # Create text label for blanking info
+        blank_str = '*'
+        text_color = constants.COLOR_TO_RGB['orange']
+        self.blank_label = label.Label(
+            fonts.load_font(8),
+            text=blank_str,
+            color=text_color,
+            scale=font_scale,
+            anchor_point=(0.5, 0.0),
+        )
+        blank_label_x = board.DISPLAY.width - 10
+        blank_label_y = board.DISPLAY.height - 14
+        self.blank_label.anchored_position = (blank_label_x, blank_label_y)
+
+        # Create battery text label
+        bat_str = 'battery 0.0V'
+        text_color = constants.COLOR_TO_RGB['white']
+        self.bat_label = label.Label(
+            fonts.load_font(8),
+            text=bat_str,
+            color=text_color,
+            scale=font_scale,
+            anchor_point=(0.5, 0.0),
+        )
+        bat_label_x = board.DISPLAY.width // 2
+        bat_label_y = board.DISPLAY.height - 15
+        self.bat_label.anchored_position = (bat_label_x, bat_label_y)
+
+        # Create gain text label
+        gain_str = 'ABCX'
+        text_color = constants.COLOR_TO_RGB['gray']
+        self.gain_label = label.Label(
+            fonts.load_font(8),
+            text=gain_str,
+            color=text_color,
+            scale=font_scale,
+            anchor_point=(0.0, 0.0),
+        )
+        gain_label_x = 1
+        gain_label_y = board.DISPLAY.height - 15
+        self.gain_label.anchored_position = (gain_label_x, gain_label_y)
+
+        # Create display group and add items to it
+        self.group = displayio.Group()
+        self.group.append(self.tile_grid)
+        self.group.append(self.header_label)
+        self.group.append(self.scale_label)
+        self.group.append(self.blank_label)
+        self.group.append(self.bat_label)
+        self.group.append(self.gain_label)
+
+    def bar_x(self, i):
+        return self.PLOT_X + i*self.BAR_PITCH
+
+    def value_to_height(self, value):
+        if not is_finite(value) or value <= 0.0:
+            return 0
+        height = int(self.PLOT_HEIGHT*value/self.full_scale)
+        return min(height, self.PLOT_HEIGHT)
+
+    def fill_rows(self, i, height0, height1, index):
+        """ Fill bar i between heights height0 (inclusive) and height1 (exclusive) """
+        if height1 <= height0:
+            return
+        x0 = self.bar_x(i)
+        y0 = self.PLOT_HEIGHT - height1
+        y1 = self.PLOT_HEIGHT - height0
+        bitmaptools.fill_region(self.bitmap, x0, y0, x0 + self.BAR_WIDTH, y1, index)
+
+    def draw_bar(self, i, height):
+        old_height = self.bar_heights[i]
+        if height == old_height:
+            return False
+        if height > old_height:
+            self.fill_rows(i, old_height, height, self.bar_colors[i])
+        else:
+            self.fill_rows(i, height, old_height, self.background_index)
+        self.bar_heights[i] = height
+        return True
+
+    def draw_reference(self, i, ref_height):
+        old_height = self.ref_rows[i]
+        if old_height is not None and old_height != ref_height:
+            # Restore the pixels under the old reference marker
+            if old_height < self.bar_heights[i]:
+                index = self.bar_colors[i]
+            else:
+                index = self.background_index
+            self.fill_rows(i, old_height, old_height + 1, index)
+        if ref_height is not None:
+            self.fill_rows(i, ref_height, ref_height + 1, self.reference_index)
+        self.ref_rows[i] = ref_height
+
+    def redraw(self):
+        self.bitmap.fill(self.background_index)
+        for i in range(self.num_bars):
+            self.bar_heights[i] = 0
+            self.ref_rows[i] = None
+
+    def set_full_scale(self, values):
+        max_value = self.MIN_FULL_SCALE
+        for value in values:
+            if is_finite(value) and value > max_value:
+                max_value = value
+        # Round up to a power of two multiple of the minimum so the scale, and
+        # hence a full redraw, only changes when the values change a lot.
+        full_scale = self.MIN_FULL_SCALE
+        while full_scale < max_value:
+            full_scale *= 2
+        if full_scale != self.full_scale:
+            self.full_scale = full_scale
+            self.scale_label.text = f'{full_scale:1.2f}'.replace('0', 'O')
+            self.redraw()
+
+    def set_reference(self, ratios, baseline_channel=constants.STR_TO_CHANNEL['590nm']):
+        """ Set expected ratios (relative to baseline channel) shown as markers """
+        self.ref_ratios = ratios
+        self.baseline_channel = baseline_channel
+
+    def set_bar_color(self, i, index):
+        """ Recolor bar i, returns True if it changed """
+        if index == self.bar_colors[i]:
+            return False
+        self.bar_colors[i] = index
+        self.fill_rows(i, 0, self.bar_heights[i], index)
+        return True
+
+    def set_measurement(self, name, units, values, chans, precision, stds=None, flags=None):
+        self.header_label.text = f'{name}{self.header_suffix}'
+        if values is None or isinstance(values, dict):
+            values = [None]*self.num_bars
+        self.set_full_scale(values)
+        for i, value in enumerate(values):
+            # Channels with quality flags are color coded
+            if flags is None:
+                index = self.bar_index
+            else:
+                index = self.color_to_index[flags.color(i)]
+            bar_changed = self.set_bar_color(i, index)
+            bar_changed |= self.draw_bar(i, self.value_to_height(value))
+            ref_height = None
+            if self.ref_ratios is not None and self.ref_ratios[i] is not None:
+                baseline = values[self.baseline_channel]
+                if baseline is not None:
+                    ref_height = self.value_to_height(self.ref_ratios[i]*baseline)
+            if bar_changed or ref_height != self.ref_rows[i]:
+                self.draw_reference(i, ref_height)
+
+    def set_capture(self, is_capturing, is_captured):
+        if is_capturing:
+            self.header_suffix = self.CAPTURING_STR
+        elif is_captured:
+            self.header_suffix = self.CAPTURED_STR
+        else:
+            self.header_suffix = ''
+
+    def set_overflow(self, name):
+        self.header_label.text = f'{name} overflow'
+
+    def set_not_blanked(self):
+        self.blank_label.text = 'NB'
+
+    def set_blanking(self):
+        self.blank_label.text = '**'
+
+    def set_blanked(self):
+        self.blank_label.text = 'BL'
+
+    def set_reblank(self):
+        self.blank_label.text = 'RB'
+
+    def set_battery(self, value, soc=None):
+        if soc is None:
+            bat_str = f'battery {value:1.1f}V'
+        else:
+            bat_str = f'battery {soc:1.0f}%'
+        if bat_str != self.bat_label.text:
+            self.bat_label.text = bat_str
+
+    def set_gain(self, value):
+        self.gain_label.text = constants.GAIN_TO_STR[value]
+
+    def show(self):
+        board.DISPLAY.show(self.group)
+
+
+def is_finite(value):
+    # Note, value - value is nan for inf and nan
+    return value is not None and value - value == 0.0
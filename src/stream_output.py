@@ -0,0 +1,140 @@
+import time
+import struct
+import usb_cdc
+import constants
+
+NO_DATA_CHANNEL_STR = 'stream needs the usb data channel, copy boot.py to CIRCUITPY'
+
+
+class StreamOutputError(Exception):
+    pass
+
+
+class StreamOutput:
+
+    """
+    Writes measurement frames to the usb serial data channel using a compact
+    binary framing.
+
+    frame layout (little endian):
+
+        sync       2 bytes   0xa5 0x5a
+        payload   79 bytes   seq (uint32), timestamp ms (uint32), gain (uint8),
+                             raw counts (10 x uint16), absorbances (10 x float32),
+                             quality flags (10 x uint8, see quality_flags.py)
+        crc        2 bytes   crc16-ccitt (poly 0x1021, init 0xffff) of payload
+
+    Frames are only written to usb_cdc.data, never to the console which
+    carries the text host control protocol.
+
+    """
+
+    SYNC = b'\xa5\x5a'
+    PAYLOAD_FORMAT = f'<IIB{constants.NUM_CHANNEL}H{constants.NUM_CHANNEL}f{constants.NUM_CHANNEL}B'
+    PAYLOAD_SIZE = struct.calcsize(PAYLOAD_FORMAT)
+    FRAME_SIZE = len(SYNC) + PAYLOAD_SIZE + 2
+
+    def __init__(self):
+        self.serial = usb_cdc.data
+        self.enabled = False
+        self.seq = 0
+        self.num_dropped = 0
+        self.buffer = bytearray(self.FRAME_SIZE)
+        self.buffer[:len(self.SYNC)] = self.SYNC
+        self.payload = memoryview(self.buffer)[len(self.SYNC):-2]
+        self.crc_table = make_crc16_table()
+        self.fields = [0]*(3*constants.NUM_CHANNEL)
+        self.t_start_ms = time.monotonic_ns()//1000000
+        self.frame_seq = None
+
+    @property
+    def is_connected(self):
+        return self.serial is not None and self.serial.connected
+
+    def start(self):
+        if self.serial is None:
+            raise StreamOutputError(NO_DATA_CHANNEL_STR)
+        self.seq = 0
+        self.num_dropped = 0
+        self.t_start_ms = time.monotonic_ns()//1000000
+        self.frame_seq = None
+        self.enabled = True
+
+    def stop(self):
+        self.enabled = False
+
+    def write_frame(self, frame):
+        if not self.enabled:
+            return False
+        if not self.is_connected:
+            self.num_dropped += 1
+            return False
+        self.pack_frame(frame)
+        return self.write()
+
+    def write_latest(self, frames):
+        """
+        Write the latest frame of a FrameBuffer, frames already written are
+        skipped. The frame is packed with frames.read(), so it can't be torn
+        by a concurrent producer.
+        """
+        if not self.enabled or frames.frame.seq == self.frame_seq:
+            return False
+        if not self.is_connected:
+            self.num_dropped += 1
+            return False
+        seq = frames.read(self.pack_frame)
+        if seq == self.frame_seq:
+            return False
+        self.frame_seq = seq
+        return self.write()
+
+    def pack_frame(self, frame):
+        """ Pack frame into the buffer, returns the frame's seq """
+        timestamp = (frame.timestamp - self.t_start_ms) & 0xffffffff
+        num = constants.NUM_CHANNEL
+        fields = self.fields
+        raw = frame.raw
+        absorbances = frame.absorbances
+        flags = frame.flags
+        for i in range(num):
+            fields[i] = raw[i]
+            fields[num + i] = absorbances[i]
+            fields[2*num + i] = int(flags[i])
+        struct.pack_into(
+                self.PAYLOAD_FORMAT,
+                self.buffer,
+                len(self.SYNC),
+                self.seq,
+                timestamp,
+                frame.gain,
+                *fields
+                )
+        crc = crc16(self.payload, self.crc_table)
+        self.buffer[-2] = crc & 0xff
+        self.buffer[-1] = crc >> 8
+        return frame.seq
+
+    def write(self):
+        self.serial.write(self.buffer)
+        self.seq = (self.seq + 1) & 0xffffffff
+        return True
+
+
+def make_crc16_table(poly=0x1021):
+    table = []
+    for i in range(256):
+        crc = i << 8
+        for j in range(8):
+            if crc & 0x8000:
+                crc = ((crc << 1) ^ poly) & 0xffff
+            else:
+                crc = (crc << 1) & 0xffff
+        table.append(crc)
+    return table
+
+
+def crc16(data, table, crc=0xffff):
+    for byte in data:
+        crc = ((crc << 8) & 0xffff) ^ table[(crc >> 8) ^ byte]
+    return crc
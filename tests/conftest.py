@@ -0,0 +1,59 @@
+"""
+Host (CPython) tests of the firmware modules that don't need the hardware.
+
+ulab.numpy is mapped to numpy, whose API it follows for the functions used.
+The CircuitPython hardware modules imported at module level (board, keypad,
+supervisor, usb_cdc, storage, analogio, busio and the AS7341 driver for its
+Gain constants) are replaced by minimal stand-ins; tests that need behaviour
+from them pass their own objects in.
+"""
+import os
+import sys
+import types
+import numpy
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# code.py in the repository root (the CircuitPython entry point) shadows the
+# standard library module of the same name when the root is on sys.path, as
+# with python -m pytest. Import the standard library one (used by pdb) first.
+_path = sys.path[:]
+sys.path[:] = [p for p in sys.path if os.path.abspath(p or '.') != ROOT]
+import code
+sys.path[:] = _path
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, os.path.join(ROOT, 'host'))
+
+
+def add_module(name, **attrs):
+    if name in sys.modules:
+        return sys.modules[name]
+    module = types.ModuleType(name)
+    for key, value in attrs.items():
+        setattr(module, key, value)
+    sys.modules[name] = module
+    return module
+
+
+ulab = add_module('ulab', numpy=numpy)
+sys.modules.setdefault('ulab.numpy', numpy)
+
+add_module(
+        'board', 
+        A6=None, SCL=None, SDA=None, 
+        BUTTON_CLOCK=None, BUTTON_OUT=None, BUTTON_LATCH=None,
+        DISPLAY=None,
+        )
+add_module('keypad')
+add_module('usb_cdc', data=None, console=None)
+add_module('storage')
+add_module('analogio')
+add_module('busio')
+add_module('supervisor', ticks_ms=lambda: 0)
+
+
+class Gain:
+    (GAIN_0_5X, GAIN_1X, GAIN_2X, GAIN_4X, GAIN_8X, GAIN_16X, GAIN_32X, 
+            GAIN_64X, GAIN_128X, GAIN_256X, GAIN_512X) = range(11)
+
+add_module('adafruit_as7341', Gain=Gain)
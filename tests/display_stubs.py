@@ -0,0 +1,219 @@
+"""
+Stand-ins for displayio, bitmaptools, adafruit_display_text.label and
+adafruit_bitmap_font (only the .mpy files are in lib/) for the host tests of
+the screens. They count the work done: TileGrids created, tiles and pixels
+written. Label does the work of label.Label on a text change: the glyph
+TileGrids of the old text are dropped and a TileGrid is created for every
+glyph of the new text. Importing the module installs them in sys.modules.
+"""
+import os
+import sys
+import types
+import struct
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Counts:
+    tile_grids = 0
+    tile_writes = 0
+    pixel_writes = 0
+
+    @classmethod
+    def reset(cls):
+        cls.tile_grids = 0
+        cls.tile_writes = 0
+        cls.pixel_writes = 0
+
+
+class Bitmap:
+
+    def __init__(self, width, height, value_count):
+        self.width = width
+        self.height = height
+        self.pixels = bytearray(width*height)
+
+    def __getitem__(self, xy):
+        x, y = xy
+        return self.pixels[y*self.width + x]
+
+    def __setitem__(self, xy, value):
+        x, y = xy
+        Counts.pixel_writes += 1
+        self.pixels[y*self.width + x] = value
+
+    def fill(self, value):
+        Counts.pixel_writes += len(self.pixels)
+        self.pixels[:] = bytes([value])*len(self.pixels)
+
+
+def fill_region(bitmap, x1, y1, x2, y2, value):
+    """ bitmaptools.fill_region, x2 and y2 exclusive, clipped to the bitmap """
+    x1, x2 = max(min(x1, x2), 0), min(max(x1, x2), bitmap.width)
+    y1, y2 = max(min(y1, y2), 0), min(max(y1, y2), bitmap.height)
+    if x2 <= x1 or y2 <= y1:
+        return
+    row = bytes([value])*(x2 - x1)
+    for y in range(y1, y2):
+        pos = y*bitmap.width
+        bitmap.pixels[pos + x1:pos + x2] = row
+    Counts.pixel_writes += (x2 - x1)*(y2 - y1)
+
+
+class OnDiskBitmap:
+
+    def __init__(self, filename):
+        with open(filename, 'rb') as f:
+            header = f.read(26)
+        self.width, self.height = struct.unpack_from('<ii', header, 18)
+
+
+class Palette:
+
+    def __init__(self, num):
+        self.colors = [0]*num
+
+    def __getitem__(self, index):
+        return self.colors[index]
+
+    def __setitem__(self, index, value):
+        self.colors[index] = value
+
+    def make_transparent(self, index):
+        pass
+
+
+class TileGrid:
+
+    def __init__(self, bitmap, pixel_shader=None, width=1, height=1,
+            tile_width=None, tile_height=None, default_tile=0, x=0, y=0):
+        Counts.tile_grids += 1
+        self.bitmap = bitmap
+        self.pixel_shader = pixel_shader
+        self.tile_width = bitmap.width if tile_width is None else tile_width
+        self.tile_height = bitmap.height if tile_height is None else tile_height
+        self.tiles = bytearray([default_tile]*(width*height))
+        self.transpose_xy = False
+        self.flip_x = False
+        self.x = x
+        self.y = y
+
+    def __setitem__(self, index, value):
+        Counts.tile_writes += 1
+        self.tiles[index] = value
+
+
+class Group(list):
+    pass
+
+
+class Glyph:
+
+    def __init__(self, tile_index):
+        self.bitmap = Bitmap(7, 9, 2)
+        self.tile_index = tile_index
+        self.width = 7
+        self.height = 9
+        self.dx = 0
+        self.dy = 0
+        self.shift_x = 7
+
+
+class Font:
+
+    def __init__(self):
+        self.glyphs = {}
+
+    def load_glyphs(self, chars):
+        for char in chars:
+            self.get_glyph(ord(char))
+
+    def get_glyph(self, code):
+        try:
+            return self.glyphs[code]
+        except KeyError:
+            glyph = self.glyphs[code] = Glyph(len(self.glyphs))
+            return glyph
+
+    def get_bounding_box(self):
+        return 7, 9, 0, 0
+
+
+class Label(Group):
+
+    """ label.Label stand-in, a TileGrid per glyph rebuilt on every update """
+
+    def __init__(self, font, text='', color=0xffffff, scale=1, anchor_point=None,
+            rotation=0):
+        super().__init__()
+        self.font = font
+        self.palette = Palette(2)
+        self.palette[1] = color
+        self.anchor_point = anchor_point
+        self.anchored_position = (0, 0)
+        self.text = text
+
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, text):
+        while len(self):
+            self.pop()
+        x = 0
+        for char in text:
+            glyph = self.font.get_glyph(ord(char))
+            self.append(TileGrid(
+                glyph.bitmap,
+                pixel_shader=self.palette,
+                default_tile=glyph.tile_index,
+                tile_width=glyph.width,
+                tile_height=glyph.height,
+                x=x + glyph.dx,
+                y=-glyph.dy,
+                ))
+            x += glyph.shift_x
+        self._text = text
+        self.bounding_box = (0, 0, x, 9)
+
+    @property
+    def color(self):
+        return self.palette[1]
+
+    @color.setter
+    def color(self, value):
+        self.palette[1] = value
+
+
+def stub_module(name, **attrs):
+    module = sys.modules.setdefault(name, types.ModuleType(name))
+    for key, value in attrs.items():
+        setattr(module, key, value)
+    return module
+
+
+stub_module('bitmaptools', fill_region=fill_region)
+stub_module(
+        'displayio', Bitmap=Bitmap, OnDiskBitmap=OnDiskBitmap, Palette=Palette,
+        TileGrid=TileGrid, Group=Group,
+        )
+stub_module('adafruit_display_text', label=stub_module('adafruit_display_text.label', Label=Label))
+stub_module(
+        'adafruit_bitmap_font',
+        bitmap_font=stub_module('adafruit_bitmap_font.bitmap_font', load_font=lambda filename: Font()),
+        )
+
+
+class Display:
+
+    """ board.DISPLAY of the PyBadge """
+
+    width = 160
+    height = 128
+
+    def __init__(self):
+        self.group = None
+
+    def show(self, group):
+        self.group = group
@@ -0,0 +1,91 @@
+import pytest
+import numpy as np
+import constants
+import colorimeter_batch
+from batch import BatchTable
+from batch import BatchError
+from configuration import Configuration
+
+NUM = constants.NUM_CHANNEL
+NUM_SAMPLES = 500
+
+
+@pytest.fixture
+def samples():
+    """ Replicate absorbances of 500 samples, 1 to 5 replicates each """
+    rng = np.random.default_rng(0)
+    samples = []
+    for i in range(NUM_SAMPLES):
+        level = rng.uniform(0.05, 2.0, NUM)
+        num_replicate = 1 + i % 5
+        samples.append(level*(1.0 + 0.02*rng.standard_normal((num_replicate, NUM))))
+    return samples
+
+
+def fill(table, samples):
+    for replicates in samples:
+        index = table.add_sample(replicates[0])
+        for values in replicates[1:]:
+            table.add_replicate(index, values)
+
+
+def expected_cv(replicates):
+    if len(replicates) < 2:
+        return np.zeros(NUM)
+    return 100.0*replicates.std(axis=0, ddof=1)/np.abs(replicates.mean(axis=0))
+
+
+def test_record_size():
+    assert BatchTable.RECORD_SIZE == 84
+    assert colorimeter_batch.RECORD_DTYPE.itemsize == BatchTable.RECORD_SIZE
+    assert len(BatchTable(NUM_SAMPLES).data) == 84*NUM_SAMPLES
+
+
+def test_default_size():
+    assert BatchTable().num == NUM_SAMPLES
+    assert Configuration().batch_size == NUM_SAMPLES
+
+
+def test_mean_and_cv_match_numpy(samples):
+    table = BatchTable(NUM_SAMPLES)
+    fill(table, samples)
+    assert len(table) == NUM_SAMPLES
+    assert table.is_full
+    for i, replicates in enumerate(samples):
+        assert table.replicates(i) == len(replicates)
+        assert np.allclose(table.mean(i), replicates.mean(axis=0), rtol=1.0e-5)
+        assert np.allclose(table.cv(i), expected_cv(replicates), rtol=1.0e-3, atol=1.0e-4)
+    with pytest.raises(BatchError):
+        table.add_sample(samples[0][0])
+    with pytest.raises(IndexError):
+        table.mean(NUM_SAMPLES)
+
+
+def test_export_round_trip(samples, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    table = BatchTable(NUM_SAMPLES)
+    fill(table, samples)
+    assert table.export()
+    assert (tmp_path/BatchTable.FILE_NAME).stat().st_size == 84*NUM_SAMPLES
+    batch = colorimeter_batch.read_batch(BatchTable.FILE_NAME)
+    assert list(batch['count']) == [len(replicates) for replicates in samples]
+    for i, replicates in enumerate(samples):
+        assert np.allclose(batch['mean'][i], replicates.mean(axis=0), rtol=1.0e-5)
+        assert np.allclose(batch['cv'][i], expected_cv(replicates), rtol=1.0e-3, atol=1.0e-4)
+        assert np.allclose(batch['cv'][i], table.cv(i), rtol=1.0e-5)
+
+
+def test_export_partial_table(samples, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    table = BatchTable(NUM_SAMPLES)
+    fill(table, samples[:7])
+    assert table.export()
+    assert len(colorimeter_batch.read_batch(BatchTable.FILE_NAME)['count']) == 7
+
+
+def test_export_read_only(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(BatchTable, 'FILE_NAME', str(tmp_path/'missing'/'batch.bin'))
+    table = BatchTable(2)
+    table.add_sample(np.ones(NUM))
+    assert not table.export()
@@ -0,0 +1,69 @@
+import math
+from battery_monitor import BatteryMonitor
+from battery_monitor import voltage_to_soc
+
+
+class AnalogIn:
+
+    """ ADC stand-in returning the raw value for a battery voltage """
+
+    def __init__(self, voltage):
+        self.voltage = voltage
+
+    @property
+    def value(self):
+        return int(65536*0.5*self.voltage/3.3)
+
+
+class Clock:
+
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+
+def test_lowpass_matches_first_order_filter():
+    ain = AnalogIn(4.0)
+    clock = Clock()
+    monitor = BatteryMonitor(ain=ain, clock=clock)
+    assert monitor.update()
+    expected = monitor.voltage_raw
+    assert monitor.voltage == expected
+    wc_dt = 2.0*math.pi*monitor.FREQ_CUTOFF*monitor.SAMPLE_DT
+    alpha = wc_dt/(wc_dt + 1.0)
+    for i in range(20):
+        ain.voltage = 3.6 if i % 2 else 3.8
+        clock.t += monitor.SAMPLE_DT
+        assert monitor.update()
+        expected = alpha*monitor.voltage_raw + (1.0 - alpha)*expected
+        assert math.isclose(monitor.voltage, expected, rel_tol=1.0e-9)
+    assert isinstance(monitor.voltage, float)
+
+
+def test_sample_schedule():
+    clock = Clock()
+    monitor = BatteryMonitor(ain=AnalogIn(4.0), clock=clock)
+    assert monitor.update()
+    clock.t += 0.5*monitor.SAMPLE_DT
+    assert not monitor.update()
+    clock.t += 0.5*monitor.SAMPLE_DT
+    assert monitor.update()
+
+
+def test_low_callback_and_remaining_time():
+    ain = AnalogIn(3.7)
+    clock = Clock()
+    monitor = BatteryMonitor(ain=ain, clock=clock)
+    calls = []
+    monitor.subscribe(calls.append)
+    monitor.update()
+    while not calls and clock.t < 36000.0:
+        clock.t += monitor.SAMPLE_DT
+        ain.voltage -= 1.0e-4
+        monitor.update()
+    assert len(calls) == 1
+    assert calls[0] < monitor.LOW_SOC
+    assert monitor.remaining_time is not None
+    assert monitor.state_of_charge == voltage_to_soc(monitor.voltage)
@@ -0,0 +1,152 @@
+import constants
+from button_input import ButtonInput
+from button_input import ButtonEvent
+from button_input import TICKS_PERIOD
+from button_input import ticks_diff
+
+LONG_PRESS_MS = constants.LONG_PRESS_MS
+REPEAT_MS = constants.REPEAT_MS
+
+
+class Event:
+
+    def __init__(self, key_number, pressed, timestamp):
+        self.key_number = key_number
+        self.pressed = pressed
+        self.timestamp = timestamp
+
+
+class ScriptedEvents:
+
+    """ keypad event queue stand-in, scripted events become visible at their time """
+
+    def __init__(self, clock, script):
+        self.clock = clock
+        self.script = [Event(num, pressed, t) for t, num, pressed in script]
+
+    def due(self):
+        return [e for e in self.script if ticks_diff(self.clock.t, e.timestamp) >= 0]
+
+    def get(self):
+        due = self.due()
+        if not due:
+            return None
+        self.script.remove(due[0])
+        return due[0]
+
+    def __bool__(self):
+        return bool(self.due())
+
+    def clear(self):
+        for event in self.due():
+            self.script.remove(event)
+
+
+class ScriptedKeys:
+
+    def __init__(self, clock, script):
+        self.events = ScriptedEvents(clock, script)
+
+
+class Clock:
+
+    def __init__(self, t=0):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+
+def run(script, t_end, t_start=0, loop_ms=10, queue_size=constants.BUTTON_QUEUE_SIZE):
+    """ Poll the button input every loop_ms, returns it and all events """
+    clock = Clock(t_start)
+    buttons = ButtonInput(ScriptedKeys(clock, script), ticks_ms=clock, queue_size=queue_size)
+    events = []
+    while ticks_diff(clock.t, t_start) <= t_end:
+        events.extend(buttons.events())
+        clock.t = (clock.t + loop_ms) % TICKS_PERIOD
+    return buttons, events
+
+
+def test_short_press():
+    buttons, events = run([(100, 2, True), (250, 2, False)], 1000)
+    assert events == [
+            (ButtonEvent.PRESS, 1 << 2, 100),
+            (ButtonEvent.RELEASE, 1 << 2, 250),
+            ]
+
+
+def test_long_press_and_repeat_timing():
+    t_release = 100 + LONG_PRESS_MS + 3*REPEAT_MS + REPEAT_MS//2
+    buttons, events = run([(100, 1, True), (t_release, 1, False)], 3000)
+    assert events == [
+            (ButtonEvent.PRESS, 2, 100),
+            (ButtonEvent.LONG_PRESS, 2, 100 + LONG_PRESS_MS),
+            (ButtonEvent.REPEAT, 2, 100 + LONG_PRESS_MS + REPEAT_MS),
+            (ButtonEvent.REPEAT, 2, 100 + LONG_PRESS_MS + 2*REPEAT_MS),
+            (ButtonEvent.REPEAT, 2, 100 + LONG_PRESS_MS + 3*REPEAT_MS),
+            (ButtonEvent.RELEASE, 2, t_release),
+            ]
+
+
+def test_hold_timestamps_independent_of_loop_rate():
+    script = [(0, 0, True), (LONG_PRESS_MS + 2*REPEAT_MS + 1, 0, False)]
+    fast = [e for e in run(list(script), 2000, loop_ms=1)[1]]
+    slow = [e for e in run(list(script), 2000, loop_ms=97)[1]]
+    assert fast == slow
+
+
+def test_presses_not_lost_while_busy():
+    # Loop blocked for 500 ms, the keys were scanned in the background
+    script = [(10, 0, True), (60, 0, False), (110, 4, True), (160, 4, False)]
+    buttons, events = run(script, 600, loop_ms=500)
+    assert [(event_type, mask) for event_type, mask, t in events] == [
+            (ButtonEvent.PRESS, 1),
+            (ButtonEvent.RELEASE, 1),
+            (ButtonEvent.PRESS, 16),
+            (ButtonEvent.RELEASE, 16),
+            ]
+    assert [t for event_type, mask, t in events] == [10, 60, 110, 160]
+
+
+def test_two_keys_held():
+    script = [(0, 0, True), (50, 3, True), (LONG_PRESS_MS + 100, 0, False), (LONG_PRESS_MS + 100, 3, False)]
+    buttons, events = run(script, 2000)
+    long_presses = [(mask, t) for event_type, mask, t in events if event_type == ButtonEvent.LONG_PRESS]
+    assert long_presses == [(1, LONG_PRESS_MS), (8, 50 + LONG_PRESS_MS)]
+
+
+def test_queue_overflow_drops_oldest():
+    script = []
+    for i in range(10):
+        script.append((10*i, i % 8, True))
+        script.append((10*i + 5, i % 8, False))
+    clock = Clock(200)
+    buttons = ButtonInput(ScriptedKeys(clock, script), ticks_ms=clock, queue_size=8)
+    assert buttons.pending
+    events = list(buttons.events())
+    assert len(events) == 8
+    assert buttons.num_dropped == 12
+    assert events[0] == (ButtonEvent.PRESS, 1 << 6, 60)
+    assert not buttons.pending
+
+
+def test_ticks_wrap_around():
+    t_press = TICKS_PERIOD - 200
+    script = [(t_press, 5, True), ((t_press + LONG_PRESS_MS + 50) % TICKS_PERIOD, 5, False)]
+    buttons, events = run(script, 1500, t_start=t_press - 100)
+    assert events == [
+            (ButtonEvent.PRESS, 32, t_press),
+            (ButtonEvent.LONG_PRESS, 32, (t_press + LONG_PRESS_MS) % TICKS_PERIOD),
+            (ButtonEvent.RELEASE, 32, (t_press + LONG_PRESS_MS + 50) % TICKS_PERIOD),
+            ]
+
+
+def test_clear():
+    clock = Clock(0)
+    buttons = ButtonInput(ScriptedKeys(clock, [(0, 1, True)]), ticks_ms=clock)
+    buttons.update()
+    buttons.clear()
+    clock.t = 2*LONG_PRESS_MS
+    assert list(buttons.events()) == []
+    assert not buttons.pending
@@ -0,0 +1,112 @@
+import time
+import numpy
+import pytest
+from calibration_builder import CalibrationBuilder
+from calibration_builder import CalibrationBuilderError
+
+NUM_CHANNEL = 10
+
+
+def make_standards(conc, rng, noise=0.002, curvature=None):
+    """ Absorbances (standards x channels) with a different slope per channel """
+    slopes = numpy.linspace(0.01, 0.1, NUM_CHANNEL)
+    absorbances = numpy.outer(conc, slopes) + 0.02
+    if curvature is not None:
+        absorbances += numpy.outer(conc**2, curvature)
+    return absorbances + rng.normal(0.0, noise, absorbances.shape)
+
+
+def build(conc, absorbances):
+    builder = CalibrationBuilder()
+    for c, a in zip(conc, absorbances):
+        builder.add(float(c), numpy.array(a))
+    return builder
+
+
+def r_squared(y, y_fit):
+    return 1.0 - numpy.sum((y - y_fit)**2)/numpy.sum((y - numpy.mean(y))**2)
+
+
+def test_linear_fit_matches_polyfit():
+    rng = numpy.random.default_rng(1)
+    conc = numpy.array([0.0, 1.0, 2.0, 5.0, 10.0, 10.0])
+    absorbances = make_standards(conc, rng)
+    slope, intercept, r2 = build(conc, absorbances).linear_fit()
+    for chan in range(NUM_CHANNEL):
+        a = absorbances[:, chan]
+        coef = numpy.polyfit(conc, a, 1)
+        assert slope[chan] == pytest.approx(coef[0], rel=1e-9)
+        assert intercept[chan] == pytest.approx(coef[1], abs=1e-9)
+        assert r2[chan] == pytest.approx(r_squared(a, numpy.polyval(coef, conc)), rel=1e-9)
+
+
+def test_poly_fit_matches_polyfit():
+    rng = numpy.random.default_rng(2)
+    conc = numpy.array([0.0, 1.0, 2.0, 4.0, 6.0, 8.0, 10.0])
+    curvature = numpy.linspace(0.0, 0.004, NUM_CHANNEL)
+    absorbances = make_standards(conc, rng, curvature=curvature)
+    (a2, a1, a0), r2 = build(conc, absorbances).poly_fit()
+    for chan in range(NUM_CHANNEL):
+        a = absorbances[:, chan]
+        coef = numpy.polyfit(a, conc, 2)
+        assert [a2[chan], a1[chan], a0[chan]] == pytest.approx(list(coef), rel=1e-6, abs=1e-6)
+        assert r2[chan] == pytest.approx(r_squared(conc, numpy.polyval(coef, a)), abs=1e-9)
+
+
+def test_poly_fit_constant_channel_is_invalid():
+    conc = numpy.array([0.0, 1.0, 2.0, 3.0])
+    absorbances = numpy.outer(conc, numpy.ones(NUM_CHANNEL))
+    absorbances[:, 3] = 0.5
+    coef, r2 = build(conc, absorbances).poly_fit()
+    assert r2[3] == 0.0
+    assert numpy.all(numpy.isfinite(r2))
+
+
+def test_best_picks_highest_r_squared():
+    rng = numpy.random.default_rng(3)
+    conc = numpy.array([0.0, 2.0, 4.0, 6.0])
+    absorbances = make_standards(conc, rng, noise=0.02)
+    absorbances[:, 6] = 0.05*conc + 0.01
+    chan, fit_type, fit_coef, r2 = build(conc, absorbances).best()
+    assert chan == 6
+    assert fit_type == CalibrationBuilder.LINEAR
+    assert fit_coef == pytest.approx([0.05, 0.01])
+    assert r2 == pytest.approx(1.0)
+
+
+def test_best_prefers_polynomial_for_curved_response():
+    conc = numpy.array([0.0, 1.0, 2.0, 4.0, 6.0, 8.0])
+    absorbances = numpy.zeros((len(conc), NUM_CHANNEL))
+    # Saturating response, c is exactly quadratic in A on channel 2
+    a = numpy.linspace(0.0, 1.0, len(conc))
+    absorbances[:, 2] = a
+    conc = 2.0*a**2 + 5.0*a
+    chan, fit_type, fit_coef, r2 = build(conc, absorbances).best()
+    assert chan == 2
+    assert fit_type == CalibrationBuilder.POLYNOMIAL
+    assert fit_coef == pytest.approx([2.0, 5.0, 0.0], abs=1e-9)
+
+
+def test_fit_needs_standards():
+    builder = CalibrationBuilder()
+    builder.add(1.0, numpy.ones(NUM_CHANNEL))
+    builder.add(1.0, numpy.ones(NUM_CHANNEL))
+    with pytest.raises(CalibrationBuilderError):
+        builder.linear_fit()
+    builder.add(2.0, numpy.ones(NUM_CHANNEL))
+    with pytest.raises(CalibrationBuilderError):
+        builder.poly_fit()
+
+
+def test_fit_runtime():
+    rng = numpy.random.default_rng(4)
+    conc = numpy.repeat(numpy.arange(10.0), 10)
+    builder = build(conc, make_standards(conc, rng))
+    num = 100
+    t0 = time.perf_counter()
+    for i in range(num):
+        builder.linear_fit()
+        builder.poly_fit()
+    t_fit = (time.perf_counter() - t0)/num
+    # Sums are fixed size, the fit cost doesn't depend on the number of standards
+    assert t_fit < 5.0e-3
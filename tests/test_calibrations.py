@@ -0,0 +1,69 @@
+import json
+import pytest
+from json_settings_file import JsonSettingsFile
+from calibrations import Calibrations
+
+CALIBRATIONS = {
+        'nitrate': {
+            'led': '630nm',
+            'units': 'ppm',
+            'channel': 7,
+            'fit_type': 'linear',
+            'fit_coef': [2.0, 0.1],
+            },
+        'broken': {'fit_type': 'cubic', 'fit_coef': [1.0]},
+        }
+
+
+@pytest.fixture
+def calibrations_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open(Calibrations.FILE_NAME, 'w') as f:
+        json.dump(CALIBRATIONS, f)
+    return tmp_path/Calibrations.FILE_NAME
+
+
+def load():
+    calibrations = Calibrations()
+    calibrations.load()
+    return calibrations
+
+
+def test_second_load_uses_index(calibrations_file, monkeypatch):
+    first = load()
+    assert list(first.data) == ['nitrate']
+    assert 'broken' in first.error_dict
+
+    def no_parse(self):
+        raise AssertionError('calibrations file parsed again')
+
+    monkeypatch.setattr(JsonSettingsFile, 'load', no_parse)
+    second = load()
+    assert list(second.data) == ['nitrate']
+    assert second.data['nitrate'] == CALIBRATIONS['nitrate']
+    assert second.error_dict == first.error_dict
+
+
+def test_changed_file_parsed_again(calibrations_file):
+    load()
+    with open(calibrations_file, 'w') as f:
+        json.dump({'nitrite': CALIBRATIONS['nitrate']}, f, indent=4)
+    calibrations = load()
+    assert list(calibrations.data) == ['nitrite']
+    assert not calibrations.has_errors
+
+
+def test_journal_added_and_invalid_records(calibrations_file):
+    calibrations = load()
+    new = dict(CALIBRATIONS['nitrate'], fit_coef=[1.0, 0.5])
+    assert calibrations.add('nitrate', new)
+    assert calibrations.add('ammonia', CALIBRATIONS['nitrate'])
+    with open(Calibrations().store.file_name, 'ab') as f:
+        f.write(b'bad\t2\t{}\n')
+        f.write(b'garbled\t3\t{x}\n')
+    calibrations = load()
+    assert sorted(calibrations.data) == ['ammonia', 'nitrate']
+    assert calibrations.data['nitrate']['fit_coef'] == [1.0, 0.5]
+    assert 'bad' not in calibrations.data
+    assert calibrations.error_dict['garbled'] == ['garbled unreadable journal record']
+    assert 'bad' in calibrations.error_dict
@@ -0,0 +1,94 @@
+import pytest
+import numpy as np
+import constants
+from crosstalk import CrosstalkCorrection
+from crosstalk import CrosstalkError
+from dark_correction import DarkCorrection
+
+NUM = constants.NUM_CHANNEL
+
+
+def crosstalk_matrix():
+    """ Channels see 15% of each neighbour's band and 3% of the next ones """
+    matrix = np.eye(NUM)
+    for i in range(NUM):
+        for j, leak in ((i - 1, 0.15), (i + 1, 0.15), (i - 2, 0.03), (i + 2, 0.03)):
+            if 0 <= j < NUM:
+                matrix[i, j] = leak
+    return matrix
+
+
+class SimulatedSensor:
+
+    """ Counts of narrowband signals s through the crosstalk matrix, m = C s """
+
+    def __init__(self, matrix, dark):
+        self.matrix = matrix
+        self.dark = dark
+
+    def counts(self, signals):
+        return self.matrix @ signals + self.dark
+
+
+@pytest.fixture
+def signals():
+    rng = np.random.default_rng(0)
+    return rng.uniform(1000.0, 20000.0, (20, NUM))
+
+
+def test_apply_recovers_signals(signals):
+    matrix = crosstalk_matrix()
+    sensor = SimulatedSensor(matrix, np.zeros(NUM))
+    crosstalk = CrosstalkCorrection(matrix.tolist())
+    assert crosstalk.enabled
+    for s in signals:
+        assert np.allclose(crosstalk.apply(sensor.counts(s)), s, rtol=1.0e-9)
+
+
+def test_transmittances_with_dark_and_crosstalk(signals):
+    matrix = crosstalk_matrix()
+    dark = np.full(NUM, 50.0)
+    sensor = SimulatedSensor(matrix, dark)
+    crosstalk = CrosstalkCorrection(matrix.tolist())
+    dark_correction = DarkCorrection(DarkCorrection.FIXED, dark_counts=dark.tolist())
+    blank = signals[0]
+    blank_counts = sensor.counts(blank)
+    for s in signals[1:]:
+        transmittances = dark_correction.transmittances(
+                sensor.counts(s), blank_counts, None, crosstalk=crosstalk)
+        assert np.allclose(transmittances, s/blank, rtol=1.0e-9)
+    # Without the correction the crosstalk biases the transmittances
+    uncorrected = (sensor.counts(signals[1]) - dark)/(blank_counts - dark)
+    assert not np.allclose(uncorrected, signals[1]/blank, rtol=1.0e-3)
+
+
+def test_apply_blank_cached(signals, monkeypatch):
+    crosstalk = CrosstalkCorrection(crosstalk_matrix().tolist())
+    calls = []
+    apply = crosstalk.apply
+    monkeypatch.setattr(crosstalk, 'apply', lambda values: calls.append(1) or apply(values))
+    blank = signals[0].copy()
+    first = crosstalk.apply_blank(blank)
+    assert crosstalk.apply_blank(blank) is first
+    assert crosstalk.apply_blank(blank.copy()) is first
+    assert len(calls) == 1
+    # Rescaled in place (drift compensation) or a new blank, computed again
+    blank *= 1.01
+    assert np.allclose(crosstalk.apply_blank(blank), 1.01*first)
+    assert np.allclose(crosstalk.apply_blank(signals[1]), apply(signals[1]))
+    assert len(calls) == 3
+
+
+def test_disabled_without_matrix():
+    assert not CrosstalkCorrection().enabled
+
+
+@pytest.mark.parametrize('matrix, message', [
+    (np.zeros((NUM, NUM)).tolist(), 'singular'),
+    (np.ones((NUM, NUM)).tolist(), 'singular'),
+    (np.eye(NUM - 1).tolist(), f'must be {NUM}x{NUM}'),
+    ([[1.0]*NUM]*(NUM - 1) + [[1.0]*(NUM - 1)], 'incorrect format'),
+    ])
+def test_bad_matrix(matrix, message):
+    with pytest.raises(CrosstalkError, match=message):
+        CrosstalkCorrection(matrix)
@@ -0,0 +1,93 @@
+import math
+import pytest
+import numpy as np
+import constants
+from drift_tracker import DriftTracker
+
+REF = 8
+DT = 0.1
+HOUR = 3600.0
+BLANK = np.array([20000.0 + 1000*i for i in range(constants.NUM_CHANNEL)])
+# Sample absorbs everything but the reference channel
+TRANSMITTANCE = np.array([0.2, 0.3, 0.4, 0.5, 0.6, 0.5, 0.4, 0.3, 1.0, 0.6])
+TRUE_ABSORBANCE = -np.log10(TRANSMITTANCE)
+
+
+def brightness(t, slope):
+    """ LED output, slow warm up drift plus a 20 minute temperature cycle """
+    return 1.0 + slope*t/HOUR + 0.01*math.sin(2.0*math.pi*t/1200.0)
+
+
+def simulate(slope=0.03, noise=0.002, seed=0):
+    """
+    Blank at t=0 then measure the sample every DT for an hour. Returns the
+    tracker, the max absorbance error with and without drift compensation
+    after the first minute and the time a re-blank was first suggested.
+    """
+    rng = np.random.default_rng(seed)
+    tracker = DriftTracker(REF)
+    blank_values = BLANK.copy()
+    tracker.reset(blank_values)
+    error = 0.0
+    error_uncorrected = 0.0
+    t_reblank = None
+    for n in range(int(HOUR/DT) + 1):
+        t = n*DT
+        raw = BLANK*TRANSMITTANCE*brightness(t, slope)
+        raw *= 1.0 + noise*rng.standard_normal(constants.NUM_CHANNEL)
+        if 1800.0 <= t < 1802.0:
+            # Cuvette being handled, the beam is partly blocked
+            raw *= 0.5
+            tracker.update(raw, t)
+            continue
+        tracker.update(raw, t)
+        if t_reblank is None and tracker.needs_reblank:
+            t_reblank = t
+        if t < 60.0:
+            continue
+        # Averaged frames, the tracker runs on every frame
+        mean = BLANK*TRANSMITTANCE*brightness(t, slope)
+        absorbance = -np.log10(mean/blank_values)
+        uncorrected = -np.log10(mean/BLANK)
+        error = max(error, np.abs(absorbance - TRUE_ABSORBANCE).max())
+        error_uncorrected = max(error_uncorrected, np.abs(uncorrected - TRUE_ABSORBANCE).max())
+    return tracker, error, error_uncorrected, t_reblank
+
+
+def test_drift_compensation_over_an_hour():
+    tracker, error, error_uncorrected, t_reblank = simulate()
+    assert error < 2.0e-3, f'absorbance error {error:.5f} (uncorrected {error_uncorrected:.5f})'
+    assert error < 0.15*error_uncorrected
+    assert tracker.drift == pytest.approx(brightness(HOUR, 0.03), rel=0.005)
+    assert tracker.num_rejected == 20
+    assert t_reblank is None
+
+
+def test_blank_rescaled_in_place():
+    tracker = DriftTracker(REF)
+    blank_values = BLANK.copy()
+    tracker.reset(blank_values)
+    for n in range(2000):
+        tracker.update(BLANK*1.02, n*DT)
+    assert tracker.blank_values is blank_values
+    assert np.allclose(blank_values, BLANK*tracker.drift)
+    assert tracker.drift == pytest.approx(1.02, rel=1.0e-3)
+
+
+def test_reblank_suggested_past_threshold():
+    tracker, error, error_uncorrected, t_reblank = simulate(slope=0.08, seed=1)
+    # brightness passes 1.05 after about 35 min, plus the filter lag
+    assert t_reblank is not None
+    assert 30*60.0 < t_reblank < 45*60.0
+    assert tracker.stats['reblank']
+    assert error < 2.0e-3
+
+
+def test_steps_ignored():
+    tracker = DriftTracker(REF)
+    tracker.reset(BLANK.copy())
+    for n in range(100):
+        tracker.update(BLANK*(0.5 if n % 2 else 1.0), n*DT)
+    assert tracker.drift == 1.0
+    assert tracker.num_rejected == 50
+
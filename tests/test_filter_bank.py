@@ -0,0 +1,127 @@
+import math
+import tracemalloc
+import pytest
+import numpy as np
+from filter_bank import LowpassFilter
+from filter_bank import MovingAverage
+from filter_bank import MedianFilter
+from filter_bank import FilterBank
+
+DT = 0.01
+SIZE = 10
+
+
+def steady_state_gain(filt, freq, dt=DT, num_period=20):
+    """ Amplitude ratio of the filter output for a sine input at freq (Hz) """
+    num = int(round(num_period/(freq*dt)))
+    t = dt*np.arange(2*num)
+    signal = np.sin(2.0*math.pi*freq*t)
+    output = np.array([float(filt.update(x)[0]) for x in signal])
+    return np.abs(output[num:]).max()
+
+
+def lowpass_gain(freq, freq_cutoff, dt=DT):
+    """ Gain of y[n] = alpha*x[n] + (1 - alpha)*y[n-1] """
+    wc_dt = 2.0*math.pi*freq_cutoff*dt
+    alpha = wc_dt/(wc_dt + 1.0)
+    z = np.exp(-2.0j*math.pi*freq*dt)
+    return abs(alpha/(1.0 - (1.0 - alpha)*z))
+
+
+def moving_average_gain(freq, num, dt=DT):
+    w = 2.0*math.pi*freq*dt
+    return abs(math.sin(num*w/2.0)/(num*math.sin(w/2.0)))
+
+
+@pytest.mark.parametrize('freq', [0.1, 1.0, 2.0, 5.0, 20.0])
+def test_lowpass_frequency_response(freq):
+    filt = LowpassFilter(freq_cutoff=2.0, dt=DT)
+    filt.reset(0.0)
+    assert steady_state_gain(filt, freq) == pytest.approx(lowpass_gain(freq, 2.0), rel=0.01)
+
+
+def test_lowpass_cutoff():
+    filt = LowpassFilter(freq_cutoff=0.5, dt=DT)
+    filt.reset(0.0)
+    # -3 dB at the cutoff for cutoff*dt << 1
+    assert steady_state_gain(filt, 0.5) == pytest.approx(1.0/math.sqrt(2.0), rel=0.02)
+    assert filt.freq_cutoff == pytest.approx(0.5)
+
+
+@pytest.mark.parametrize('freq', [1.0, 7.0, 12.5, 30.0])
+def test_moving_average_frequency_response(freq):
+    filt = MovingAverage(num=8)
+    filt.reset(0.0)
+    expected = moving_average_gain(freq, 8)
+    assert steady_state_gain(filt, freq) == pytest.approx(expected, rel=0.02, abs=1.0e-3)
+
+
+def test_moving_average_matches_numpy():
+    rng = np.random.default_rng(1)
+    data = rng.normal(size=(50, SIZE))
+    filt = MovingAverage(num=4, size=SIZE)
+    for i, row in enumerate(data):
+        value = filt.update(row)
+        if i >= 3:
+            assert np.allclose(value, data[i-3:i+1].mean(axis=0))
+
+
+def test_median_matches_numpy_and_rejects_spikes():
+    rng = np.random.default_rng(2)
+    data = rng.normal(size=(30, SIZE))
+    filt = MedianFilter(num=3, size=SIZE)
+    for i, row in enumerate(data):
+        value = filt.update(row)
+        if i >= 2:
+            assert np.allclose(value, np.median(data[i-2:i+1], axis=0))
+    filt.reset(1.0)
+    assert np.allclose(filt.update(np.full(SIZE, 100.0)), 1.0)
+
+
+def test_lowpass_vectorized_matches_scalar():
+    rng = np.random.default_rng(3)
+    data = rng.normal(size=(100, SIZE))
+    vector = LowpassFilter(freq_cutoff=1.0, dt=DT, size=SIZE)
+    scalars = [LowpassFilter(freq_cutoff=1.0, dt=DT) for i in range(SIZE)]
+    for row in data:
+        vector.update(row)
+        for filt, x in zip(scalars, row):
+            filt.update(x)
+    assert np.allclose(vector.value, [filt.value[0] for filt in scalars])
+
+
+def test_filter_bank_chain():
+    bank = FilterBank([MedianFilter(3, size=SIZE), LowpassFilter(1.0, dt=DT, size=SIZE)])
+    median = MedianFilter(3, size=SIZE)
+    lowpass = LowpassFilter(1.0, dt=DT, size=SIZE)
+    rng = np.random.default_rng(4)
+    for row in rng.normal(size=(20, SIZE)):
+        expected = lowpass.update(median.update(row))
+        assert np.allclose(bank.update(row), expected)
+    assert bank.value is bank.filters[-1].value
+    bank.reset()
+    assert not any(filt.is_initialized for filt in bank.filters)
+
+
+@pytest.mark.parametrize('make_filter', [
+    lambda size: LowpassFilter(1.0, dt=DT, size=size),
+    lambda size: MovingAverage(8, size=size),
+    lambda size: FilterBank([MovingAverage(8, size=size), LowpassFilter(1.0, dt=DT, size=size)]),
+    ])
+def test_update_allocates_no_arrays(make_filter):
+    size = 10000
+    filt = make_filter(size)
+    values = [np.full(size, float(i)) for i in range(4)]
+    filt.update(values[0])
+    tracemalloc.start()
+    try:
+        start, peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for i in range(200):
+            filt.update(values[i % 4])
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # An array temporary would be 80 kB, nothing is kept between updates
+    assert peak - start < 8*size//10
+    assert current - start < 1000
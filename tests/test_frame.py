@@ -0,0 +1,131 @@
+import sys
+import threading
+import tracemalloc
+import numpy as np
+import constants
+from frame import Frame
+from frame import FrameBuffer
+
+NUM = constants.NUM_CHANNEL
+
+
+def fill(frames, value):
+    frames.next([value]*NUM, 0, 50)
+    frames.publish()
+
+
+def test_publish_swaps_latest():
+    frames = FrameBuffer()
+    fill(frames, 1)
+    first = frames.frame
+    fill(frames, 2)
+    assert frames.frame is not first
+    assert list(frames.frame.raw) == [2]*NUM
+    assert list(first.raw) == [1]*NUM
+    assert frames.frame.seq == 1
+    assert frames.versions == [2, 2]
+
+
+def test_raw_is_clipped_to_uint16():
+    frames = FrameBuffer()
+    frames.next([-5, 70000] + [3]*(NUM - 2), 0, 50)
+    assert list(frames.frames[1].raw[:3]) == [0, Frame.MAX_COUNT, 3]
+
+
+def test_read_retries_when_overwritten():
+    frames = FrameBuffer()
+    fill(frames, 1)
+    calls = []
+
+    def read_raw(frame):
+        calls.append(frame.seq)
+        if len(calls) == 1:
+            # Producer runs twice while the frame is being read, the second
+            # time it writes the frame being read.
+            fill(frames, 2)
+            fill(frames, 3)
+        return list(frame.raw)
+
+    assert frames.read(read_raw) == [3]*NUM
+    assert calls == [0, 2]
+
+
+def test_read_keeps_frame_when_back_frame_written():
+    frames = FrameBuffer()
+    fill(frames, 1)
+    calls = []
+
+    def read_raw(frame):
+        calls.append(frame.seq)
+        if len(calls) == 1:
+            fill(frames, 2)
+        return list(frame.raw)
+
+    assert frames.read(read_raw) == [1]*NUM
+    assert calls == [0]
+
+
+def test_concurrent_reads_not_torn():
+    frames = FrameBuffer()
+    fill(frames, 0)
+    done = threading.Event()
+
+    def producer():
+        value = 0
+        while not done.is_set():
+            value = (value + 1) % 1000
+            frame = frames.next([value]*NUM, 0, 50)
+            frame.absorbances[:] = value
+            frames.publish()
+
+    def read_frame(frame):
+        return set(frame.raw), set(frame.absorbances)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1.0e-6)
+    thread = threading.Thread(target=producer)
+    thread.start()
+    try:
+        for i in range(5000):
+            raw, absorbances = frames.read(read_frame)
+            assert len(raw) == 1
+            assert absorbances == {float(raw.pop())}
+    finally:
+        done.set()
+        thread.join()
+        sys.setswitchinterval(interval)
+
+
+def test_steady_state_allocates_no_arrays():
+    size = 2000
+    frames = FrameBuffer(size)
+    raw_values = [[(i*j) % 65536 for j in range(size)] for i in range(4)]
+    absorbances = [np.full(size, 0.1*i) for i in range(4)]
+
+    def read_seq(frame):
+        return frame.seq
+
+    for i in range(2):
+        frame = frames.next(raw_values[i], 0, 50)
+        frame.absorbances[:] = absorbances[i]
+        frames.publish()
+    tracemalloc.start()
+    try:
+        start, peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for i in range(100):
+            frame = frames.next(raw_values[i % 4], i % 4, 50)
+            frame.mean[:] = absorbances[i % 4]
+            frame.transmittances[:] = absorbances[i % 4]
+            frame.absorbances[:] = absorbances[i % 4]
+            frame.flags[:] = 0
+            frames.publish()
+            frames.read(read_seq)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # A copy of the raw counts would be 4 kB, an array temporary 16 kB
+    assert peak - start < size
+    assert current - start < 1000
+    assert frames.frame.seq == 101
+    assert list(frames.frame.raw[:3]) == [(99 % 4)*j for j in range(3)]
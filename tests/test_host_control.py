@@ -0,0 +1,265 @@
+import os
+import time
+import fcntl
+import struct
+import termios
+import threading
+import numpy as np
+import pytest
+import constants
+from host_control import HostControl
+from host_control import HostControlError
+from host_control import HostTask
+from frame import FrameBuffer
+from sensor_tasks import AverageTask
+from sensor_tasks import BlankTask
+from colorimeter_client import ColorimeterClient
+from colorimeter_client import ColorimeterClientError
+
+
+class Serial:
+
+    """ Console stand-in, bytes to read in and written lines in out """
+
+    connected = True
+
+    def __init__(self, data):
+        self.data = data
+        self.out = []
+
+    @property
+    def in_waiting(self):
+        return len(self.data)
+
+    def read(self, num):
+        data = self.data[:num]
+        self.data = self.data[num:]
+        return data
+
+    def write(self, data):
+        self.out.append(data.decode())
+
+
+def make_host_control(data):
+    host_control = HostControl()
+    host_control.serial = Serial(data)
+    return host_control
+
+
+def test_reply_ok_with_json():
+    host_control = make_host_control(b'echo 12\n')
+    host_control.add_handler('echo', lambda arg: {'arg': arg})
+    host_control.poll()
+    assert host_control.serial.out == ['ok {"arg": "12"}\r\n']
+
+
+def test_handler_errors_are_replied():
+    def fail(arg):
+        raise HostControlError('bad argument')
+    def crash(arg):
+        raise OSError(30)
+    host_control = make_host_control(b'fail\ncrash\nmissing\n')
+    host_control.add_handler('fail', fail)
+    host_control.add_handler('crash', crash)
+    host_control.poll()
+    assert host_control.serial.out == [
+            'err bad argument\r\n', 
+            'err OSError 30\r\n', 
+            'err unknown command missing\r\n',
+            ]
+    assert host_control.num_errors == 3
+
+
+def test_invalid_utf8_is_rejected():
+    host_control = make_host_control(b'\xff\xfe\nping\n')
+    host_control.add_handler('ping', lambda arg: None)
+    host_control.poll()
+    assert host_control.serial.out == ['err invalid characters in command\r\n', 'ok\r\n']
+
+
+def test_unserializable_result():
+    host_control = make_host_control(b'obj\n')
+    host_control.add_handler('obj', lambda arg: object())
+    host_control.poll()
+    assert host_control.serial.out[0].startswith('err TypeError')
+
+
+class CountTask(HostTask):
+
+    def __init__(self, num, fail_at=None):
+        self.num = num
+        self.fail_at = fail_at
+        self.count = 0
+
+    def step(self):
+        self.count += 1
+        if self.count == self.fail_at:
+            raise OSError(5)
+        if self.count < self.num:
+            return False
+        self.result = {'steps': self.count}
+        return True
+
+
+def test_task_replies_when_done_and_queues_commands():
+    host_control = make_host_control(b'count 3\nping\n')
+    host_control.add_handler('count', lambda arg: CountTask(int(arg)))
+    host_control.add_handler('ping', lambda arg: 'pong')
+    host_control.poll()
+    assert host_control.is_busy
+    assert host_control.serial.out == []
+    host_control.poll()
+    assert host_control.serial.out == []
+    host_control.poll()
+    host_control.poll()
+    assert not host_control.is_busy
+    assert host_control.serial.out == ['ok {"steps": 3}\r\n', 'ok "pong"\r\n']
+
+
+def test_task_error_is_replied():
+    host_control = make_host_control(b'count 5\n')
+    host_control.add_handler('count', lambda arg: CountTask(int(arg), fail_at=2))
+    for i in range(3):
+        host_control.poll()
+    assert host_control.serial.out == ['err OSError 5\r\n']
+    assert not host_control.is_busy
+
+
+def make_frames():
+    frames = FrameBuffer()
+    values = iter(range(1000000))
+
+    def read_frame():
+        value = next(values)
+        return frames.next([value + i for i in range(constants.NUM_CHANNEL)], 0, 50)
+
+    def finish(frame):
+        frames.publish()
+        return list(frame.mean)
+
+    return read_frame, finish
+
+
+def test_average_task():
+    read_frame, finish = make_frames()
+    task = AverageTask(4, read_frame, finish)
+    assert [task.step() for i in range(4)] == [False, False, False, True]
+    assert task.result == [1.5 + i for i in range(constants.NUM_CHANNEL)]
+
+
+def test_blank_task_spacing():
+    clock = [0.0]
+    acquired = []
+
+    def acquire():
+        acquired.append(clock[0])
+        return np.full(2, float(len(acquired)))
+
+    begun = []
+    task = BlankTask(3, 2, acquire, lambda samples: samples.mean(axis=0).tolist(), 
+            begin=lambda: begun.append(clock[0]), dt=0.25, clock=lambda: clock[0])
+    done = False
+    while not done:
+        done = task.step()
+        clock[0] += 0.125
+    assert begun == [0.0]
+    assert acquired == [0.125, 0.375, 0.625]
+    assert task.result == [2.0, 2.0]
+
+
+class PtyConsole:
+
+    """ usb_cdc.console stand-in on the device end of a pty pair """
+
+    connected = True
+
+    def __init__(self, fd):
+        self.fd = fd
+
+    @property
+    def in_waiting(self):
+        data = fcntl.ioctl(self.fd, termios.FIONREAD, struct.pack('i', 0))
+        return struct.unpack('i', data)[0]
+
+    def read(self, num):
+        return os.read(self.fd, num)
+
+    def write(self, data):
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self.fd, view):]
+
+
+@pytest.fixture
+def device():
+    """ HostControl polled by a main loop thread on a pty, yields the host path """
+    device_fd, host_fd = os.openpty()
+    host_control = HostControl()
+    host_control.serial = PtyConsole(device_fd)
+    read_frame, finish = make_frames()
+    state = {'gain': None, 'loops': 0, 'task_loops': []}
+
+    def set_gain(arg):
+        if arg not in constants.STR_TO_GAIN:
+            raise HostControlError(f'unknown gain {arg}')
+        state['gain'] = arg
+
+    def average(arg):
+        loop_start = state['loops']
+        def finish_average(frame):
+            state['task_loops'].append(state['loops'] - loop_start)
+            return {'num': int(arg), 'raw': finish(frame)}
+        return AverageTask(int(arg), read_frame, finish_average)
+
+    host_control.add_handler('gain', set_gain)
+    host_control.add_handler('avg', average)
+    host_control.add_handler('stats', lambda arg: {'loops': state['loops']})
+
+    def noisy(arg):
+        # e.g. print output of the firmware on the console
+        host_control.write_line('Error during blanking: timeout')
+        return 1
+
+    host_control.add_handler('noisy', noisy)
+    done = threading.Event()
+
+    def main_loop():
+        while not done.is_set():
+            host_control.poll()
+            state['loops'] += 1
+            time.sleep(0.001)
+
+    thread = threading.Thread(target=main_loop)
+    thread.start()
+    try:
+        yield os.ttyname(host_fd), state
+    finally:
+        done.set()
+        thread.join()
+        os.close(device_fd)
+        os.close(host_fd)
+
+
+def test_client_round_trip(device):
+    path, state = device
+    with ColorimeterClient(path, timeout=5.0) as client:
+        assert client.set_gain('16x') is None
+        assert state['gain'] == '16x'
+        with pytest.raises(ColorimeterClientError, match='unknown gain 3x'):
+            client.set_gain('3x')
+        with pytest.raises(ColorimeterClientError, match='unknown command blank'):
+            client.blank()
+        result = client.average(20)
+        assert result['num'] == 20
+        assert result['raw'] == [9.5 + i for i in range(constants.NUM_CHANNEL)]
+        # The main loop kept running while the frames were averaged
+        assert state['task_loops'][-1] >= 19
+        assert client.stats()['loops'] > 20
+
+
+def test_client_skips_device_output(device):
+    path, state = device
+    with ColorimeterClient(path, timeout=5.0) as client:
+        assert client.command('noisy') == 1
+        assert client.set_gain('2x') is None
+        assert client.average(1)['num'] == 1
@@ -0,0 +1,126 @@
+import os
+import pytest
+from journal_store import JournalStore
+from journal_store import JournalStoreError
+from journal_store import OverlayView
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return JournalStore('journal.txt')
+
+
+def reloaded(store):
+    new_store = JournalStore(store.file_name)
+    new_store.load()
+    return new_store
+
+
+def test_append_get_delete(store):
+    assert store.append('a', {'x': 1})
+    assert store.append('b', [1, 2])
+    assert store.append('a', {'x': 2})
+    store.delete('b')
+    store = reloaded(store)
+    assert list(store) == ['a']
+    assert store['a'] == {'x': 2}
+    assert 'b' not in store
+    assert not store.is_torn
+
+
+def test_truncated_record_dropped(store):
+    store.append('a', {'x': 1})
+    store.append('b', {'x': 2})
+    size = os.stat(store.file_name)[6]
+    with open(store.file_name, 'ab') as f:
+        f.write(b'c\t20\t{"x": ')
+    store = reloaded(store)
+    assert store.is_torn
+    assert list(store) == ['a', 'b']
+    assert store.size == size
+
+    # The partial record is removed before the next append
+    assert store.append('d', {'x': 4})
+    assert not store.is_torn
+    store = reloaded(store)
+    assert not store.is_torn
+    assert [(name, store[name]) for name in store] == [
+            ('a', {'x': 1}), ('b', {'x': 2}), ('d', {'x': 4})
+            ]
+
+
+@pytest.mark.parametrize('cut', [1, 2, 5])
+def test_truncated_last_record_keeps_previous(store, cut):
+    store.append('a', {'x': 1})
+    store.append('b', {'x': 2})
+    with open(store.file_name, 'rb') as f:
+        data = f.read()
+    with open(store.file_name, 'wb') as f:
+        f.write(data[:-cut])
+    store = reloaded(store)
+    assert store.is_torn
+    assert list(store) == ['a']
+    assert store['a'] == {'x': 1}
+
+
+def test_compaction(store):
+    for i in range(50):
+        store.append('a', {'value': i, 'pad': 'x'*100})
+    store.append('b', {'value': -1})
+    assert store.needs_compaction
+    assert store.compact()
+    assert not store.needs_compaction
+    assert store.size == os.stat(store.file_name)[6]
+    store = reloaded(store)
+    assert store['a']['value'] == 49
+    assert store['b'] == {'value': -1}
+    assert not store.exists(store.tmp_name)
+
+
+def test_recover_finished_compaction(store):
+    store.append('a', {'x': 1})
+    os.rename(store.file_name, store.tmp_name)
+    store = reloaded(store)
+    assert store['a'] == {'x': 1}
+    assert not store.exists(store.tmp_name)
+
+
+def test_recover_unfinished_compaction(store):
+    store.append('a', {'x': 1})
+    with open(store.tmp_name, 'wb') as f:
+        f.write(b'a\t8\t{"x": 2}\n')
+    store = reloaded(store)
+    assert store['a'] == {'x': 1}
+    assert not store.exists(store.tmp_name)
+
+
+def test_not_writable_kept_in_memory(tmp_path):
+    store = JournalStore(str(tmp_path/'missing'/'journal.txt'))
+    store.load()
+    assert not store.append('a', {'x': 1})
+    assert list(store) == ['a']
+    assert store['a'] == {'x': 1}
+
+
+def test_meta_records(store):
+    with pytest.raises(JournalStoreError):
+        store.append('#source', [1, 2])
+    with pytest.raises(JournalStoreError):
+        store.append('a\tb', 1)
+    assert store.rewrite([('a', 1), ('#source', [1, 2])])
+    store = reloaded(store)
+    assert list(store) == ['a']
+    assert len(store) == 1
+    assert store.get('#source') == [1, 2]
+
+
+def test_overlay_view(store):
+    store.append('b', 20)
+    store.append('c', 30)
+    view = OverlayView({'a': 1, 'b': 2}, store)
+    assert view.keys() == ['a', 'b', 'c']
+    assert dict(view.items()) == {'a': 1, 'b': 20, 'c': 30}
+    assert view.get('d') is None
+    with pytest.raises(KeyError):
+        view['d']
@@ -0,0 +1,98 @@
+import time
+import pytest
+import numpy as np
+import constants
+from kinetics import IncrementalRegression
+from kinetics import Kinetics
+from kinetics import KineticsLog
+from kinetics import RingBuffer
+
+NUM = constants.NUM_CHANNEL
+
+
+def make_series(num, t0=0.0, seed=0):
+    rng = np.random.default_rng(seed)
+    t = t0 + np.arange(num)*1.0 + rng.uniform(0.0, 0.1, num)
+    slopes = np.linspace(-1.0e-3, 2.0e-3, NUM)
+    y = 0.5 + np.outer(t - t0, slopes) + 1.0e-3*rng.standard_normal((num, NUM))
+    return t, y
+
+
+@pytest.mark.parametrize('t0', [0.0, 1.0e5])
+def test_regression_matches_polyfit(t0):
+    t, y = make_series(200, t0=t0)
+    regression = IncrementalRegression()
+    for ti, yi in zip(t, y):
+        regression.update(ti, yi)
+    slope, intercept = np.polyfit(t, y, 1)
+    assert np.allclose(regression.slope, slope, rtol=1.0e-6, atol=1.0e-12)
+    assert np.allclose(regression.intercept, intercept, rtol=1.0e-6, atol=1.0e-9)
+    r_squared = [np.corrcoef(t, y[:, i])[0, 1]**2 for i in range(NUM)]
+    assert np.allclose(regression.r_squared, r_squared, rtol=1.0e-6)
+
+
+def test_regression_degenerate():
+    regression = IncrementalRegression()
+    regression.update(1.0, np.ones(NUM))
+    assert not regression.slope.any()
+    regression.update(1.0, np.zeros(NUM))
+    assert not regression.slope.any()
+    assert not regression.r_squared.any()
+    regression.reset()
+    assert regression.count == 0
+
+
+def test_regression_cost_independent_of_count():
+    t, y = make_series(4000)
+    regression = IncrementalRegression()
+
+    def time_updates(start):
+        t_start = time.perf_counter()
+        for i in range(start, start + 1000):
+            regression.update(t[i], y[i])
+        return time.perf_counter() - t_start
+
+    first = time_updates(0)
+    time_updates(1000)
+    time_updates(2000)
+    last = time_updates(3000)
+    assert last < 3.0*first
+
+
+def test_ring_buffer_wraps():
+    buffer = RingBuffer(num=4, size=NUM)
+    for i in range(6):
+        buffer.append(float(i), np.full(NUM, float(i)))
+    assert buffer.is_full
+    assert buffer.times[buffer.last()] == 5.0
+    assert buffer.times[buffer.last(4)] == 2.0
+    assert buffer.values[buffer.last(2), 0] == 4.0
+
+
+def test_cadence_skips_missed_samples(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    kinetics = Kinetics(dt=1.0)
+    kinetics.start(10.0)
+    times = []
+    for t_now in [10.0, 10.5, 11.0, 13.7, 14.0, 14.2, 15.0]:
+        if kinetics.sample_due(t_now):
+            kinetics.add_sample(t_now, np.zeros(NUM))
+            times.append(t_now)
+    assert times == [10.0, 11.0, 13.7, 14.0, 15.0]
+    assert kinetics.elapsed == 5.0
+
+
+def test_log_blocks(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    t, y = make_series(KineticsLog.BLOCK_SIZE + 5)
+    kinetics = Kinetics()
+    kinetics.start(0.0)
+    for ti, yi in zip(t, y):
+        kinetics.add_sample(ti, yi)
+    assert kinetics.log.num_written == KineticsLog.BLOCK_SIZE
+    kinetics.stop()
+    assert kinetics.log.num_written == len(t)
+    records = np.fromfile(KineticsLog.FILE_NAME, dtype='<f4').reshape(len(t), NUM + 1)
+    assert np.allclose(records[:, 0], t)
+    assert np.allclose(records[:, 1:], y)
+    assert np.allclose(kinetics.rates, np.polyfit(t, y, 1)[0])
@@ -0,0 +1,124 @@
+import pytest
+import numpy as np
+import constants
+from light_source import LightSource
+from light_source import LightSourceError
+
+NUM = constants.NUM_CHANNEL
+READ_DT = 0.05
+FRAME_GAP_DT = 0.1
+
+
+class SimulatedSensor:
+
+    """
+    Light sensor with the LED signal plus an ambient light that drifts
+    linearly in time. Each read takes READ_DT of the simulated clock, the
+    reading is the light at the middle of the integration.
+    """
+
+    def __init__(self, signal, ambient, drift):
+        self.signal = signal
+        self.ambient = ambient
+        self.drift = drift
+        self.t = 0.0
+        self.led = False
+        self.led_current = None
+        self.reads = []
+
+    def clock(self):
+        return self.t
+
+    @property
+    def position_values(self):
+        t_mid = self.t + 0.5*READ_DT
+        self.t += READ_DT
+        self.reads.append(self.led)
+        values = self.ambient + self.drift*t_mid
+        if self.led:
+            values = values + self.signal
+        return [values]
+
+
+@pytest.fixture
+def sensor():
+    signal = np.linspace(1000.0, 10000.0, NUM)
+    return SimulatedSensor(signal, ambient=np.full(NUM, 500.0), drift=np.full(NUM, 200.0))
+
+
+def make_light_source(sensor, mode):
+    light_source = LightSource(sensor, mode=mode, clock=sensor.clock)
+    light_source.select()
+    return light_source
+
+
+def acquire_frames(light_source, sensor, num):
+    frames = []
+    for i in range(num):
+        frames.append(light_source.acquire()[0])
+        sensor.t += FRAME_GAP_DT
+    return np.array(frames)
+
+
+def test_differential_order_alternates(sensor):
+    light_source = make_light_source(sensor, LightSource.DIFFERENTIAL)
+    assert sensor.led_current == constants.LED_CURRENT
+    acquire_frames(light_source, sensor, 4)
+    assert sensor.reads == [True, False, False, True, True, False, False, True]
+    # LED only on while the on frame is read
+    assert not sensor.led
+    assert not light_source.led
+
+
+def test_differential_drift_cancels_over_pairs(sensor):
+    light_source = make_light_source(sensor, LightSource.DIFFERENTIAL)
+    frames = acquire_frames(light_source, sensor, 10)
+    # Single frames are off by the drift over one read, +/- alternating
+    offset = sensor.drift*READ_DT
+    assert np.allclose(frames[0::2], sensor.signal - offset)
+    assert np.allclose(frames[1::2], sensor.signal + offset)
+    pairs = 0.5*(frames[0::2] + frames[1::2])
+    assert np.allclose(pairs, sensor.signal, rtol=1.0e-12)
+    # Ambient of the last (off first) frame
+    assert np.allclose(light_source.ambient_values, sensor.ambient + sensor.drift*(sensor.t - FRAME_GAP_DT - 1.5*READ_DT))
+
+
+def test_pulsed_includes_ambient(sensor):
+    light_source = make_light_source(sensor, LightSource.PULSED)
+    frames = acquire_frames(light_source, sensor, 3)
+    assert sensor.reads == [True]*3
+    assert np.allclose(frames[0], sensor.signal + sensor.ambient + sensor.drift*0.5*READ_DT)
+
+
+@pytest.mark.parametrize('mode, reads_per_frame', [
+    (LightSource.DIFFERENTIAL, 2),
+    (LightSource.PULSED, 1),
+    ])
+def test_frame_rate_and_duty(sensor, mode, reads_per_frame):
+    num = 20
+    light_source = make_light_source(sensor, mode)
+    acquire_frames(light_source, sensor, num)
+    t_total = num*reads_per_frame*READ_DT + (num - 1)*FRAME_GAP_DT
+    stats = light_source.stats
+    assert stats['frames'] == num
+    assert light_source.frame_rate == pytest.approx(num/t_total)
+    assert stats['frame_rate'] == light_source.frame_rate
+    assert stats['led_on_time'] == pytest.approx(num*READ_DT)
+    assert stats['led_duty'] == pytest.approx(num*READ_DT/t_total)
+    assert stats['led'] == constants.LED_DEFAULT
+
+
+def test_external_not_driven(sensor):
+    light_source = LightSource(sensor, clock=sensor.clock)
+    acquire_frames(light_source, sensor, 2)
+    assert sensor.reads == [False, False]
+    assert light_source.frame_rate is None
+    assert light_source.stats['led_duty'] is None
+
+
+def test_select_errors(sensor):
+    light_source = make_light_source(sensor, LightSource.PULSED)
+    with pytest.raises(LightSourceError):
+        light_source.select('uv')
+    with pytest.raises(LightSourceError):
+        light_source.current = constants.LED_MAX_CURRENT + 1
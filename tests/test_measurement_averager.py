@@ -0,0 +1,165 @@
+import math
+import pytest
+import numpy as np
+import constants
+from filter_bank import LowpassFilter
+from measurement_averager import BoxcarAverage
+from measurement_averager import MeasurementAverager
+from measurement_averager import RunningStats
+
+NUM = constants.NUM_CHANNEL
+
+
+def make_frames(num, noise=10.0, seed=0):
+    rng = np.random.default_rng(seed)
+    level = np.linspace(1000.0, 20000.0, NUM)
+    return level + noise*rng.standard_normal((num, NUM))
+
+
+def test_boxcar_block_means():
+    frames = make_frames(35)
+    boxcar = BoxcarAverage(num=10)
+    outputs = np.array([boxcar.update(frame).copy() for frame in frames])
+    # Partial block average until the first block is complete
+    for i in range(9):
+        assert np.allclose(outputs[i], frames[:i + 1].mean(axis=0))
+    # Then the last complete block
+    for i in range(9, 35):
+        block = (i + 1)//10
+        assert np.allclose(outputs[i], frames[10*(block - 1):10*block].mean(axis=0))
+
+
+def test_running_stats_match_numpy():
+    frames = make_frames(500, noise=50.0)
+    stats = RunningStats()
+    assert not stats.variance.any()
+    for frame in frames:
+        stats.update(frame)
+    assert stats.count == 500
+    assert np.allclose(stats.mean, frames.mean(axis=0), rtol=1.0e-12)
+    assert np.allclose(stats.std, frames.std(axis=0, ddof=1), rtol=1.0e-9)
+    assert np.allclose(stats.sem, frames.std(axis=0, ddof=1)/math.sqrt(500), rtol=1.0e-9)
+
+
+def exponential_reference(frames, timestamps, freq_cutoff):
+    """ y[n] = alpha[n]*x[n] + (1 - alpha[n])*y[n-1] with alpha for the frame interval """
+    wc = 2.0*math.pi*freq_cutoff
+    output = [frames[0]]
+    for n in range(1, len(frames)):
+        dt = 1.0e-3*(timestamps[n] - timestamps[n - 1])
+        alpha = wc*dt/(wc*dt + 1.0)
+        output.append(alpha*frames[n] + (1.0 - alpha)*output[-1])
+    return np.array(output)
+
+
+def test_exponential_uses_frame_interval():
+    rng = np.random.default_rng(1)
+    frames = make_frames(100, noise=200.0)
+    # Full rate, then the slower idle loop
+    intervals = np.concatenate([
+        rng.integers(95, 130, 50),
+        np.full(49, int(1000*constants.POWER_IDLE_LOOP_DT)),
+        ])
+    timestamps = 5000 + np.concatenate([[0], np.cumsum(intervals)])
+    averager = MeasurementAverager(MeasurementAverager.EXPONENTIAL, freq_cutoff=0.5)
+    outputs = np.array([
+        averager.update(frame, int(t)).copy() for frame, t in zip(frames, timestamps)
+        ])
+    expected = exponential_reference(frames, timestamps, 0.5)
+    assert np.allclose(outputs, expected, rtol=1.0e-12)
+    fixed_dt = exponential_reference(frames, 5000 + 1000*constants.LOOP_DT*np.arange(100), 0.5)
+    assert not np.allclose(outputs[60:], fixed_dt[60:], rtol=1.0e-3)
+    assert averager.filters[MeasurementAverager.EXPONENTIAL].freq_cutoff == pytest.approx(0.5)
+
+
+def test_exponential_without_timestamps_uses_loop_dt():
+    frames = make_frames(20, noise=200.0)
+    averager = MeasurementAverager(MeasurementAverager.EXPONENTIAL, freq_cutoff=0.5)
+    outputs = np.array([averager.update(frame).copy() for frame in frames])
+    timestamps = 1000*constants.LOOP_DT*np.arange(20)
+    assert np.allclose(outputs, exponential_reference(frames, timestamps, 0.5))
+
+
+def test_reset_restarts_frame_interval():
+    averager = MeasurementAverager(MeasurementAverager.EXPONENTIAL)
+    lowpass = averager.filters[MeasurementAverager.EXPONENTIAL]
+    averager.update(np.ones(NUM), 1000)
+    averager.update(np.ones(NUM), 1400)
+    assert lowpass.dt == pytest.approx(0.4)
+    averager.reset()
+    assert averager.timestamp is None
+    # The first frame after a reset initializes the filter, the gap isn't an interval
+    assert np.allclose(averager.update(np.full(NUM, 5.0), 60000), 5.0)
+    assert lowpass.dt == pytest.approx(0.4)
+    averager.update(np.full(NUM, 5.0), 60250)
+    assert lowpass.dt == pytest.approx(0.25)
+
+
+def test_lowpass_set_dt():
+    lowpass = LowpassFilter(freq_cutoff=2.0, dt=0.1)
+    alpha = lowpass._alpha
+    lowpass.set_dt(0.5)
+    assert lowpass.freq_cutoff == pytest.approx(2.0)
+    assert lowpass._alpha > alpha
+    lowpass.reset(0.0)
+    lowpass.update(1.0, dt=0.1)
+    assert lowpass.value[0] == pytest.approx(alpha)
+
+
+@pytest.mark.parametrize('mode', [MeasurementAverager.MOVING, MeasurementAverager.MEDIAN])
+def test_window_filters(mode):
+    frames = make_frames(30, noise=100.0)
+    averager = MeasurementAverager(mode, num=4)
+    outputs = np.array([averager.update(frame, 100*i).copy() for i, frame in enumerate(frames)])
+    if mode == MeasurementAverager.MOVING:
+        expected = [frames[i - 3:i + 1].mean(axis=0) for i in range(3, 30)]
+    else:
+        expected = [np.median(frames[i - 2:i + 1], axis=0) for i in range(3, 30)]
+    assert np.allclose(outputs[3:], expected)
+
+
+def test_block_std_outside_capture():
+    frames = make_frames(25, noise=30.0)
+    averager = MeasurementAverager(MeasurementAverager.BOXCAR, num=10)
+    for frame in frames[:10]:
+        averager.update(frame)
+    assert np.allclose(averager.std, frames[:10].std(axis=0, ddof=1))
+    averager.update(frames[10])
+    # A new block has started, the std of the last complete block is shown
+    assert np.allclose(averager.std, frames[:10].std(axis=0, ddof=1))
+    for frame in frames[11:20]:
+        averager.update(frame)
+    assert np.allclose(averager.std, frames[10:20].std(axis=0, ddof=1))
+
+
+def first_stable_count(frames):
+    """ Capture stops at the first count where the relative sem is below tolerance """
+    for count in range(constants.CAPTURE_MIN_SAMPLES, constants.CAPTURE_MAX_SAMPLES):
+        block = frames[:count]
+        sem = block.std(axis=0, ddof=1)/math.sqrt(count)
+        if np.max(sem/np.abs(block.mean(axis=0))) < constants.CAPTURE_REL_TOL:
+            return count
+    return constants.CAPTURE_MAX_SAMPLES
+
+
+@pytest.mark.parametrize('noise', [5.0, 20.0, 200.0])
+def test_auto_stop_capture(noise):
+    frames = make_frames(constants.CAPTURE_MAX_SAMPLES + 10, noise=noise)
+    averager = MeasurementAverager(MeasurementAverager.EXPONENTIAL)
+    averager.update(frames[0], 0)
+    averager.start_capture()
+    count = 0
+    for i, frame in enumerate(frames):
+        output = averager.update(frame, 100*(i + 1))
+        count += 1
+        if averager.is_captured:
+            break
+    assert not averager.is_capturing
+    assert count == first_stable_count(frames)
+    assert np.allclose(output, frames[:count].mean(axis=0))
+    # The captured mean is held
+    held = averager.update(frames[-1]*2.0, 100*(count + 1))
+    assert np.allclose(held, frames[:count].mean(axis=0))
+    averager.stop_capture()
+    assert not averager.is_captured
+    assert averager.stats.count == 0
@@ -0,0 +1,61 @@
+import time
+from menu_model import MenuModel
+
+NAMES = ['nitrate', 'Ammonia', 'phosphate', 'nitrite', 'iron', 'Alkalinity', 'pH']
+
+
+def describe(i, name):
+    return f'{i:>3} {name[:10]} µg'
+
+
+def make_names(num):
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    return [f'{letters[(7*i) % 26]}{letters[i % 26]}sample{i:04}' for i in range(num)]
+
+
+def test_item_text():
+    model = MenuModel(NAMES, describe)
+    assert len(model) == len(NAMES)
+    assert [model.item_text(i) for i in range(len(NAMES))] == [describe(i, n) for i, n in enumerate(NAMES)]
+    assert model.view_text(5, 4) == [describe(5, NAMES[5]), describe(6, NAMES[6])]
+
+
+def test_find_prefix():
+    model = MenuModel(NAMES, describe)
+    assert model.find_prefix('NIT') == 0
+    assert model.find_prefix('nitri') == 3
+    assert model.find_prefix('a') == 5
+    assert model.find_prefix('ph') == 6
+    assert model.find_prefix('x') is None
+    assert model.find_prefix('') == 5
+
+
+def test_next_letter():
+    model = MenuModel(NAMES, describe)
+    pos = 5
+    visited = []
+    for i in range(6):
+        visited.append(NAMES[pos])
+        pos = model.next_letter(pos)
+    assert visited == ['Alkalinity', 'iron', 'nitrate', 'pH', 'Alkalinity', 'iron']
+    assert MenuModel([], describe).next_letter(0) == 0
+
+
+def test_prefix_search_matches_linear_scan():
+    names = make_names(1000)
+    model = MenuModel(names, describe)
+    for prefix in ['a', 'hb', 'zz', 'qe', 'cc', 'ns']:
+        matches = sorted((n.lower(), i) for i, n in enumerate(names) if n.lower().startswith(prefix))
+        expected = matches[0][1] if matches else None
+        assert model.find_prefix(prefix) == expected
+
+
+def test_scroll_latency_1000_entries():
+    model = MenuModel(make_names(1000), describe)
+    num_visible = 7
+    t_start = time.perf_counter()
+    for start in range(len(model) - num_visible):
+        model.view_text(start, num_visible)
+    per_page = (time.perf_counter() - t_start)/(len(model) - num_visible)
+    # A few microseconds per page on the host, independent of the menu length
+    assert per_page < 1.0e-3
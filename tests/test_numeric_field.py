@@ -0,0 +1,143 @@
+"""
+NumericField under a stub displayio, compared with the label.Label stand-in
+of display_stubs.
+"""
+import time
+import pytest
+import numpy as np
+import board
+from display_stubs import ROOT
+from display_stubs import Counts
+from display_stubs import Display
+from display_stubs import Font
+from display_stubs import Label
+import constants
+import numeric_field
+from numeric_field import NumericField
+from numeric_field import NumericFieldError
+from multi_measure_screen import MultiMeasureScreen
+
+NUM_FRAMES = 200
+
+
+@pytest.fixture(autouse=True)
+def display(monkeypatch):
+    monkeypatch.chdir(ROOT)
+    monkeypatch.setattr(board, 'DISPLAY', Display(), raising=False)
+    monkeypatch.setattr(numeric_field, '_atlas', None)
+    Counts.reset()
+    return board.DISPLAY
+
+
+def value_strings(num_frames, seed=0):
+    """ Absorbance values and stds of 10 channels as shown by the screen """
+    rng = np.random.default_rng(seed)
+    names = list(constants.STR_TO_CHANNEL)
+    values = 0.5 + 0.01*rng.standard_normal((num_frames, len(names)))
+    stds = np.abs(0.002*rng.standard_normal((num_frames, len(names))))
+    strings = []
+    for frame_values, frame_stds in zip(values, stds):
+        strings.append([
+            f'{name} {value:1.2f}±{std:1.2f}'.replace('0', 'O')
+            for name, value, std in zip(names, frame_values, frame_stds)
+            ])
+    return strings
+
+
+def test_atlas_tiles():
+    atlas = numeric_field.load_atlas()
+    assert atlas.tile_width == 7
+    assert atlas.tile_height == 9
+    assert atlas.bitmap.width == len(constants.NUMERIC_ATLAS_CHARS)*atlas.tile_width
+    assert atlas.index(' ') == 0
+    assert atlas.index('±') == constants.NUMERIC_ATLAS_CHARS.index('±')
+
+
+def test_unknown_char_raises():
+    field = NumericField(8)
+    field.text = '1.23'
+    with pytest.raises(NumericFieldError):
+        field.text = 'error'
+    with pytest.raises(NumericFieldError):
+        field.text = 'CLEAR'
+
+
+def test_update_writes_changed_tiles():
+    field = NumericField(10)
+    field.text = '415nm 1.23'
+    assert field.tile_grid.tiles[:5] == bytes(numeric_field.load_atlas().index(c) for c in '415nm')
+    Counts.reset()
+    field.text = '415nm 1.25'
+    assert Counts.tile_writes == 1
+    field.text = '415nm 1.25'
+    assert Counts.tile_writes == 1
+    field.text = '415nm'
+    assert Counts.tile_writes == 5
+    assert field.tile_grid.tiles[5:] == bytes(5)
+
+
+def test_text_clipped():
+    field = NumericField(6)
+    field.text = '415nm 65535.OO'
+    assert field.text == '415nm '
+    assert len(field.tile_grid.tiles) == 6
+
+
+def test_value_fields_fit_display(display):
+    screen = MultiMeasureScreen()
+    assert len(screen.value_labels) == constants.NUM_CHANNEL
+    for value_label in screen.value_labels:
+        assert value_label.width <= display.height
+    names = list(constants.STR_TO_CHANNEL)
+    # Raw counts at the 16 bit max, the std doesn't fit and is dropped
+    screen.set_measurement('Raw Sensor', None, [65535.0]*10, names, 2, stds=[65535.0]*10)
+    assert screen.value_labels[0].text == '415nm 65535.OO'
+    assert screen.value_labels[9].text == 'clear 65535.OO'
+    # Absorbances with std
+    screen.set_measurement('Absorbance', None, [0.5]*10, names, 2, stds=[0.01]*10)
+    assert screen.value_labels[4].text == '555nm O.5O±O.O1'
+
+
+def test_psilocybin_baseline_error():
+    screen = MultiMeasureScreen()
+    values = {'error': 'Baseline missing, zero, or infinite'}
+    screen.set_measurement('PSILOCYBIN', None, values, None, 2)
+    assert [value_label.text for value_label in screen.value_labels] == ['----']*10
+    screen.set_measurement('PSILOCYBIN', None, {'Clear': 12.0, '590nm': 0.0}, None, 2)
+    assert screen.value_labels[0].text == 'Clear +12%'
+    assert screen.value_labels[1].text == '590nm +0.0%'
+
+
+def update_fields(fields, strings):
+    t_start = time.perf_counter()
+    for frame_strings in strings:
+        for field, text in zip(fields, frame_strings):
+            field.text = text
+    return time.perf_counter() - t_start
+
+
+def test_numeric_field_vs_label_benchmark():
+    strings = value_strings(NUM_FRAMES)
+    font = Font()
+    font.load_glyphs(constants.FONT_PRELOAD_CHARS)
+    labels = [Label(font, text=text) for text in strings[0]]
+    fields = [NumericField(18) for text in strings[0]]
+    update_fields(fields, strings[:1])
+
+    Counts.reset()
+    label_time = update_fields(labels, strings[1:])
+    label_tile_grids = Counts.tile_grids
+
+    Counts.reset()
+    field_time = update_fields(fields, strings[1:])
+    assert Counts.tile_grids == 0
+    num_chars = sum(len(text) for frame_strings in strings[1:] for text in frame_strings)
+    # Only the last digits of the value and std change from frame to frame
+    assert label_tile_grids == num_chars
+    assert Counts.tile_writes < 0.5*num_chars
+    print(
+        f'\n{NUM_FRAMES - 1} frames of 10 values: label.Label {label_time*1e3:.1f} ms '
+        f'({label_tile_grids} TileGrids), NumericField {field_time*1e3:.1f} ms '
+        f'({Counts.tile_writes} tile writes)'
+        )
+    assert field_time < label_time
@@ -0,0 +1,123 @@
+import pytest
+import numpy as np
+import constants
+from power_manager import PowerManager
+from power_manager import PowerState
+
+
+class SimulatedClock:
+
+    """ Clock and sleep function, sleep advances the time """
+
+    def __init__(self):
+        self.t = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.t
+
+    def sleep(self, dt):
+        self.sleeps.append(dt)
+        self.t += dt
+
+
+class Display:
+    brightness = 1.0
+
+
+@pytest.fixture
+def clock():
+    return SimulatedClock()
+
+
+@pytest.fixture
+def power_manager(clock):
+    return PowerManager(clock=clock, sleep_func=clock.sleep, display=Display())
+
+
+def run_until(power_manager, clock, t_end, dt=1.0):
+    while clock.t < t_end:
+        clock.t += dt
+        power_manager.update()
+
+
+def test_state_walk_and_wake(power_manager, clock):
+    display = power_manager.display
+    run_until(power_manager, clock, constants.POWER_IDLE_DT - 1.0)
+    assert power_manager.state == PowerState.ACTIVE
+    assert power_manager.loop_dt == constants.LOOP_DT
+    assert not power_manager.sensor_sleep
+
+    run_until(power_manager, clock, constants.POWER_IDLE_DT)
+    assert power_manager.state == PowerState.IDLE
+    assert power_manager.loop_dt == constants.POWER_IDLE_LOOP_DT
+    assert power_manager.sensor_sleep
+    assert display.brightness == 1.0
+
+    run_until(power_manager, clock, constants.POWER_DIM_DT)
+    assert power_manager.state == PowerState.DIM
+    assert power_manager.loop_dt == constants.POWER_SLEEP_LOOP_DT
+    assert display.brightness == constants.POWER_DIM_BRIGHTNESS
+    assert not power_manager.display_off
+
+    run_until(power_manager, clock, constants.POWER_BLANK_DT)
+    assert power_manager.state == PowerState.BLANK
+    assert power_manager.display_off
+    assert display.brightness == 0.0
+
+    run_until(power_manager, clock, 400.0)
+    stats = power_manager.stats
+    assert stats['state'] == 'blank'
+    assert stats['wake'] == 0
+    duty = stats['duty']
+    assert duty['active'] == pytest.approx(constants.POWER_IDLE_DT/400.0)
+    assert duty['idle'] == pytest.approx((constants.POWER_DIM_DT - constants.POWER_IDLE_DT)/400.0)
+    assert duty['dim'] == pytest.approx((constants.POWER_BLANK_DT - constants.POWER_DIM_DT)/400.0)
+    assert duty['blank'] == pytest.approx((400.0 - constants.POWER_BLANK_DT)/400.0)
+    assert sum(duty.values()) == pytest.approx(1.0)
+
+    # A button press wakes the blank display
+    assert power_manager.activity()
+    assert power_manager.state == PowerState.ACTIVE
+    assert display.brightness == 1.0
+    assert not power_manager.activity()
+    run_until(power_manager, clock, 420.0)
+    stats = power_manager.stats
+    assert stats['state'] == 'active'
+    assert stats['wake'] == 1
+    assert stats['duty']['active'] == pytest.approx((constants.POWER_IDLE_DT + 20.0)/420.0)
+
+
+def test_sample_change_is_activity(power_manager, clock):
+    values = np.full(constants.NUM_CHANNEL, 1000.0)
+    power_manager.update_values(values)
+    run_until(power_manager, clock, constants.POWER_DIM_DT)
+    assert power_manager.state == PowerState.DIM
+    # Noise within the tolerance keeps it dimmed, a new sample wakes it
+    power_manager.update_values(values*(1.0 + 0.5*constants.POWER_STABLE_TOL))
+    assert power_manager.state == PowerState.DIM
+    power_manager.update_values(values*(1.0 + 2.0*constants.POWER_STABLE_TOL))
+    assert power_manager.state == PowerState.ACTIVE
+    assert power_manager.stats['wake'] == 1
+
+
+def test_busy_or_disabled_stays_active(power_manager, clock):
+    clock.t = constants.POWER_BLANK_DT
+    power_manager.update(is_busy=True)
+    assert power_manager.state == PowerState.ACTIVE
+    power_manager.enabled = False
+    run_until(power_manager, clock, 2*constants.POWER_BLANK_DT)
+    assert power_manager.state == PowerState.ACTIVE
+    assert power_manager.stats['duty']['active'] == 1.0
+
+
+def test_sleep_uses_injected_sleep(power_manager, clock):
+    run_until(power_manager, clock, constants.POWER_IDLE_DT)
+    t_start = clock.t
+    power_manager.sleep()
+    assert clock.t == pytest.approx(t_start + constants.POWER_IDLE_LOOP_DT)
+    assert max(clock.sleeps) <= constants.POWER_WAKE_POLL_DT
+    # Pending wake (e.g. a button) returns after one poll
+    clock.sleeps.clear()
+    power_manager.sleep(wake=lambda: True)
+    assert clock.sleeps == [constants.POWER_WAKE_POLL_DT]
@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import pytest
+from schema import Schema
+from calibrations import CALIBRATION_SCHEMA
+from configuration import CONFIGURATION_SCHEMA
+
+SCHEMA = Schema(
+        {
+            'name': {'type': 'str', 'required': True, 'max_len': 4},
+            'count': {'type': 'int', 'min': 1, 'max': 10},
+            'ratio': {'type': 'number', 'null': True},
+            'mode': {'type': 'str', 'enum': ('a', 'b'), 'ignore_case': True},
+            'flag': {'type': 'bool'},
+            'values': {'type': 'list', 'len': 2, 'items': {'type': 'number', 'min': 0}},
+            'table': {
+                'type': 'dict',
+                'keys': {'type': 'str', 'enum': ('x', 'y')},
+                'values': {'type': 'int'},
+                },
+            'range': {
+                'type': 'dict',
+                'schema': Schema({'min': {'type': 'number', 'required': True}}),
+                },
+        },
+        rules = [('count', lambda entry: 'count odd' if entry.get('count', 0) % 2 else None)],
+        )
+
+
+def messages(entry, prefix=''):
+    return [message for name, message in SCHEMA.validate(entry, prefix)]
+
+
+def test_valid_entry():
+    entry = {
+            'name': 'ab', 'count': 2, 'ratio': None, 'mode': 'B', 'flag': False,
+            'values': [0, 1.5], 'table': {'x': 1}, 'range': {'min': 0},
+            }
+    assert SCHEMA.validate(entry) == []
+
+
+@pytest.mark.parametrize('entry, expected', [
+    ([], 'must be dict'),
+    ({}, 'missing name'),
+    ({'name': 3}, 'name must be str'),
+    ({'name': 'abcde'}, 'name too long (max 4)'),
+    ({'name': 'a', 'count': 0}, 'count must be >= 1'),
+    ({'name': 'a', 'count': 12}, 'count must be <= 10'),
+    ({'name': 'a', 'count': True}, 'count must be int'),
+    ({'name': 'a', 'count': 2.0}, 'count must be int'),
+    ({'name': 'a', 'ratio': '1'}, 'ratio must be number'),
+    ({'name': 'a', 'mode': 'c'}, 'mode unknown value c'),
+    ({'name': 'a', 'flag': 1}, 'flag must be bool'),
+    ({'name': 'a', 'values': [1]}, 'values must have length 2'),
+    ({'name': 'a', 'values': [1, -1]}, 'values[1] must be >= 0'),
+    ({'name': 'a', 'table': {'z': 1}}, 'table key unknown value z'),
+    ({'name': 'a', 'table': {'y': '1'}}, 'table y must be int'),
+    ({'name': 'a', 'range': {}}, 'range missing min'),
+    ({'name': 'a', 'count': 3}, 'count odd'),
+    ])
+def test_errors(entry, expected):
+    assert messages(entry) == [expected]
+
+
+def test_all_field_errors_reported_with_prefix():
+    errors = SCHEMA.validate({'name': 1, 'count': 0, 'flag': 'no'}, 'entry ')
+    assert errors == [
+            ('name', 'entry name must be str'),
+            ('count', 'entry count must be >= 1'),
+            ('flag', 'entry flag must be bool'),
+            ]
+
+
+def test_rules_skipped_on_field_errors():
+    assert messages({'name': 'abcde', 'count': 3}) == ['name too long (max 4)']
+
+
+def test_configuration_errors():
+    errors = CONFIGURATION_SCHEMA.validate(
+            {'gain': '3x', 'num_average': 0, 'sensors': [{'mux': 0x10}]},
+            'configuration ',
+            )
+    assert [name for name, message in errors] == ['gain', 'num_average', 'sensors']
+    assert errors[2][1] == 'configuration sensors[0] mux must be >= 112'
+
+
+def test_configuration_dark_correction_rule():
+    entry = {'dark_correction': 'led', 'led_mode': 'external'}
+    errors = CONFIGURATION_SCHEMA.validate(entry)
+    assert [name for name, message in errors] == ['dark_correction']
+    entry['led_mode'] = 'pulsed'
+    assert CONFIGURATION_SCHEMA.validate(entry) == []
+
+
+@pytest.mark.parametrize('calibration, expected', [
+    ({'fit_type': 'linear'}, 'missing fit_coef'),
+    ({'units': 'ppm'}, 'missing fit_type or channels'),
+    ({'fit_type': 'linear', 'fit_coef': [1, 2, 3]}, 'too many fit_coef for linear fit'),
+    ({'fit_type': 'polynomial', 'fit_coef': [1, 2, 3]}, 'range data missing'),
+    (
+        {'fit_type': 'linear', 'fit_coef': [1, 2], 'range': {'min': 2, 'max': 1}},
+        'range min >= max',
+        ),
+    ({'channels': {'F9': {'fit_type': 'linear', 'fit_coef': [1]}}}, 'channels key unknown value F9'),
+    ({'channels': {'630nm': {'fit_coef': [1]}}}, 'channels 630nm missing fit_type'),
+    ])
+def test_calibration_errors(calibration, expected):
+    assert [message for name, message in CALIBRATION_SCHEMA.validate(calibration)] == [expected]
+
+
+def time_validate(schema, entry, num=1000):
+    entries = [dict(entry) for i in range(num)]
+    t_start = time.perf_counter()
+    errors = [schema.validate(entry, f'entry {i} ') for i, entry in enumerate(entries)]
+    return time.perf_counter() - t_start, errors
+
+
+@pytest.mark.parametrize('name', ['PSILOCYBIN', 'single fit'])
+def test_validation_benchmark(name):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(os.path.join(root, 'calibrations.json')) as f:
+        calibrations = json.load(f)
+    if name == 'single fit':
+        entry = {
+                'units': 'ppm', 'led': 'white', 'fit_type': 'linear',
+                'fit_coef': [1.5, 0.1], 'range': {'min': 0.0, 'max': 2.0},
+                }
+    else:
+        entry = calibrations[name]
+    elapsed, errors = time_validate(CALIBRATION_SCHEMA, entry)
+    assert all(entry_errors == [] for entry_errors in errors)
+    print(f'\nvalidate 1000 entries ({name}): {1.0e3*elapsed:.0f} ms')
+    # Timing sanity check, about 140 ms (10 channels) and 15 ms on the host
+    assert elapsed < 2.0
@@ -0,0 +1,253 @@
+import sys
+import time
+import types
+import pytest
+import board
+import busio
+import adafruit_as7341
+import constants
+from light_sensor import LightSensorIOError
+from sensor_array import SensorArray
+
+ITIME_MS = 20.0
+
+
+class Bus:
+
+    def __init__(self, scl, sda):
+        self.pins = (scl, sda)
+
+
+class MuxChannel:
+
+    def __init__(self, mux, channel):
+        self.mux = mux
+        self.channel = channel
+
+
+class TCA9548A:
+
+    def __init__(self, i2c, address=0x70):
+        self.i2c = i2c
+        self.address = address
+        self.channels = [MuxChannel(self, i) for i in range(8)]
+
+    def __getitem__(self, channel):
+        return self.channels[channel]
+
+
+class AS7341:
+
+    """
+    Simulated AS7341 with the driver attributes LightSensor uses. Each device
+    sees its own spectrum, a measurement is ready one integration time after
+    the bank was started.
+    """
+
+    devices = []
+
+    def __init__(self, i2c):
+        self.i2c = i2c
+        self.spectrum = [1000*(len(self.devices) + 1) + i for i in range(constants.NUM_CHANNEL)]
+        self.atime = 29
+        self.astep = 599
+        self.gain = None
+        self.led = False
+        self.led_current = 4
+        self._power_enabled = True
+        self._color_meas_enabled = False
+        self._smux_command = 0
+        self._smux_enabled = False
+        self._low_channels_configured = False
+        self._high_channels_configured = False
+        self._flicker_detection_1k_configured = False
+        self.flicker_detection_enabled = False
+        self.flicker_detected = 1000
+        self.bank = None
+        self.t_start = None
+        self.num_integrations = 0
+        self.devices.append(self)
+
+    @property
+    def integration_time(self):
+        return 1.0e-6*(self.atime + 1)*(self.astep + 1)*2.78
+
+    def _f1f4_clear_nir(self):
+        self.bank = 0
+
+    def _f5f8_clear_nir(self):
+        self.bank = 1
+
+    @property
+    def _color_meas_enabled(self):
+        return self.t_start is not None
+
+    @_color_meas_enabled.setter
+    def _color_meas_enabled(self, value):
+        if value:
+            self.t_start = time.monotonic()
+            self.num_integrations += 1
+        else:
+            self.t_start = None
+
+    @property
+    def _data_ready_bit(self):
+        return self.t_start is not None and time.monotonic() - self.t_start >= self.integration_time
+
+    @property
+    def _all_channels(self):
+        s = self.spectrum
+        if self.bank == 0:
+            return (0, s[0], s[1], s[2], s[3], s[9], s[8])
+        return (0, s[4], s[5], s[6], s[7], s[9], s[8])
+
+
+@pytest.fixture
+def devices(monkeypatch):
+    monkeypatch.setattr(AS7341, 'devices', [])
+    monkeypatch.setattr(adafruit_as7341, 'AS7341', AS7341, raising=False)
+    monkeypatch.setattr(busio, 'I2C', Bus, raising=False)
+    for pin in ('SCL', 'SDA', 'D2', 'D3'):
+        monkeypatch.setattr(board, pin, pin, raising=False)
+    mux_module = types.ModuleType('adafruit_tca9548a')
+    mux_module.TCA9548A = TCA9548A
+    monkeypatch.setitem(sys.modules, 'adafruit_tca9548a', mux_module)
+    return AS7341.devices
+
+
+def make_array(num):
+    array = SensorArray([{'mux': 0x70, 'channel': i} for i in range(num)])
+    array.integration_time = ITIME_MS
+    return array
+
+
+def test_buses_and_mux(devices):
+    array = SensorArray([
+        {'name': 'sample'},
+        {'mux': 0x70, 'channel': 2},
+        {'mux': 0x70, 'channel': 5, 'name': 'reference'},
+        {'scl': 'D2', 'sda': 'D3'},
+        ])
+    assert len(array) == 4
+    assert array.names == ['sample', 'pos1', 'reference', 'pos3']
+    bus = devices[0].i2c
+    assert bus.pins == ('SCL', 'SDA')
+    assert devices[1].i2c.mux is devices[2].i2c.mux
+    assert devices[1].i2c.mux.i2c is bus
+    assert [devices[1].i2c.channel, devices[2].i2c.channel] == [2, 5]
+    assert devices[3].i2c.pins == ('D2', 'D3')
+
+
+def test_read_all_positions(devices):
+    array = make_array(3)
+    values = array.read()
+    assert [list(v) for v in values] == [device.spectrum for device in devices]
+    assert array.raw_values == devices[0].spectrum
+    assert all(device.num_integrations == 4 for device in devices)
+
+
+@pytest.mark.parametrize('num', [1, 4])
+def test_read_time_independent_of_count(devices, num):
+    array = make_array(num)
+    t_start = time.monotonic()
+    array.read()
+    elapsed = 1000.0*(time.monotonic() - t_start)
+    # Two banks of one integration each, sensors integrate concurrently
+    assert 2*ITIME_MS <= elapsed < 2*ITIME_MS + 0.5*ITIME_MS*num + 10.0
+
+
+def test_timeout(devices, monkeypatch):
+    array = make_array(2)
+    monkeypatch.setattr(constants, 'SENSOR_READ_TIMEOUT', 0.05)
+    monkeypatch.setattr(AS7341, '_data_ready_bit', property(lambda self: self is devices[0]))
+    with pytest.raises(LightSensorIOError):
+        array.read()
+
+
+def test_settings_applied_to_all(devices):
+    array = make_array(3)
+    array.gain = adafruit_as7341.Gain.GAIN_64X
+    array.power = False
+    assert all(device.gain == adafruit_as7341.Gain.GAIN_64X for device in devices)
+    assert not any(device._power_enabled for device in devices)
+    assert all(device.astep == devices[0].astep for device in devices)
+
+
+def test_led_on_primary_only(devices):
+    array = make_array(2)
+    array.led_current = 10
+    array.led = True
+    assert array.led_current == 10
+    assert [device.led_current for device in devices] == [10, 4]
+    assert [device.led for device in devices] == [True, False]
+
+
+def test_flicker_applied_to_all(devices, monkeypatch):
+    monkeypatch.setattr(constants, 'FLICKER_DETECT_DT', 0.0)
+    array = make_array(2)
+    array.flicker_snap = True
+    array.integration_time = 25.0
+    assert array.detect_flicker()
+    assert [sensor.flicker_hz for sensor in array.sensors] == [100, 100]
+    assert devices[1].astep == devices[0].astep
+    assert all(sensor.flicker_covered for sensor in array.sensors)
+    assert not array.detect_flicker()
+
+
+@pytest.mark.parametrize('snap', [True, False])
+@pytest.mark.parametrize('driver_hz, flicker_hz, snapped_ms', [
+    (1000, 100, 30.0),
+    (1200, 120, 1000.0/30.0),
+    (None, None, 33.0),
+    ])
+def test_detect_flicker_snaps(devices, monkeypatch, snap, driver_hz, flicker_hz, snapped_ms):
+    monkeypatch.setattr(constants, 'FLICKER_DETECT_DT', 0.0)
+    array = make_array(1)
+    array.flicker_snap = snap
+    array.integration_time = 33.0
+    devices[0].flicker_detected = driver_hz
+    assert array.detect_flicker() == (flicker_hz is not None)
+    assert array.flicker_hz == flicker_hz
+    assert not devices[0].flicker_detection_enabled
+    step_ms = 1.0e-3*array.AS7341_STEP_US*(array.AS7341_ATIME + 1)
+    expected_ms = snapped_ms if snap else 33.0
+    assert abs(array.integration_time - expected_ms) <= 0.5*step_ms
+    assert array.flicker_covered == (snap or flicker_hz is None)
+
+
+def test_flicker_detection_non_blocking(devices):
+    array = make_array(2)
+    array.flicker_snap = True
+    array.integration_time = 25.0
+    assert array.flicker_check_due(0.0)
+    array.start_flicker(t_now=0.0)
+    assert array.flicker_running
+    assert devices[0].flicker_detection_enabled
+    assert array.poll_flicker(0.5*constants.FLICKER_DETECT_DT) is None
+    assert array.flicker_hz is None
+    assert array.poll_flicker(constants.FLICKER_DETECT_DT)
+    assert not array.flicker_running
+    assert not devices[0].flicker_detection_enabled
+    assert [sensor.flicker_hz for sensor in array.sensors] == [100, 100]
+    assert devices[1].astep == devices[0].astep
+    t_done = constants.FLICKER_DETECT_DT
+    assert not array.flicker_check_due(t_done + constants.FLICKER_CHECK_DT - 1.0)
+    assert array.flicker_check_due(t_done + constants.FLICKER_CHECK_DT)
+
+
+def test_read_abandons_flicker_detection(devices):
+    array = make_array(1)
+    array.start_flicker(t_now=0.0)
+    array.read()
+    assert not array.flicker_running
+    assert not devices[0].flicker_detection_enabled
+    assert array.flicker_hz is None
+    assert array.flicker_check_due(1.0)
+    array.start_flicker(t_now=0.0)
+    array.raw_values
+    assert not array.flicker_running
+
+
+def test_no_sensors():
+    with pytest.raises(LightSensorIOError):
+        SensorArray([])
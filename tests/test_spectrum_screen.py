@@ -0,0 +1,82 @@
+"""
+Frame cost of the spectrum screen under the display stand-ins: pixels written
+and time per frame for noisy spectra, compared with a full redraw, and the
+incrementally drawn bitmap compared with one drawn from scratch.
+"""
+import time
+import pytest
+import numpy as np
+import board
+from display_stubs import Counts
+from display_stubs import Display
+import constants
+from spectrum_screen import SpectrumScreen
+
+NUM = constants.NUM_CHANNEL
+NUM_FRAMES = 500
+
+
+@pytest.fixture(autouse=True)
+def display(monkeypatch):
+    monkeypatch.setattr(board, 'DISPLAY', Display(), raising=False)
+    Counts.reset()
+    return board.DISPLAY
+
+
+def make_spectra(num, seed=0, noise=0.003):
+    rng = np.random.default_rng(seed)
+    level = np.linspace(0.1, 0.8, NUM)
+    return level + noise*rng.standard_normal((num, NUM))
+
+
+def expected_pixels(screen):
+    """ Bitmap drawn from scratch for the screen's bars and reference markers """
+    width, height = screen.bitmap.width, screen.PLOT_HEIGHT
+    pixels = np.full((height, width), screen.background_index, dtype=np.uint8)
+    for i in range(screen.num_bars):
+        x0 = screen.bar_x(i)
+        bar_height = screen.bar_heights[i]
+        if bar_height:
+            pixels[height - bar_height:, x0:x0 + screen.BAR_WIDTH] = screen.bar_colors[i]
+        ref_height = screen.ref_rows[i]
+        if ref_height is not None and ref_height < height:
+            pixels[height - ref_height - 1, x0:x0 + screen.BAR_WIDTH] = screen.reference_index
+    return pixels.tobytes()
+
+
+def test_incremental_draw_matches_redraw():
+    screen = SpectrumScreen()
+    ratios = [0.4, None, 0.7, 0.9, 1.1, 1.0, 1.2, None, 0.5, 2.0]
+    screen.set_reference(ratios)
+    spectra = make_spectra(300, noise=0.05)
+    # Scale changes (full redraws), bars clipped at full scale, bad values
+    spectra[100] *= 3.0
+    spectra[150, 2] = np.inf
+    spectra[151, 5] = np.nan
+    spectra[200, 9] = -0.2
+    for i, values in enumerate(spectra):
+        values = [float(v) for v in values]
+        screen.set_measurement('Absorbance', None, values, None, 2)
+        assert bytes(screen.bitmap.pixels) == expected_pixels(screen), f'frame {i}'
+    assert screen.full_scale == 1.0
+
+
+def test_frame_cost():
+    screen = SpectrumScreen()
+    spectra = [[float(v) for v in values] for values in make_spectra(NUM_FRAMES)]
+    screen.set_measurement('Absorbance', None, spectra[0], None, 2)
+    full_redraw = len(screen.bitmap.pixels) + screen.BAR_WIDTH*sum(screen.bar_heights)
+
+    Counts.reset()
+    t_start = time.perf_counter()
+    for values in spectra[1:]:
+        screen.set_measurement('Absorbance', None, values, None, 2)
+    elapsed = time.perf_counter() - t_start
+    pixels_per_frame = Counts.pixel_writes/(NUM_FRAMES - 1)
+    print(
+        f'\nspectrum screen: {1.0e6*elapsed/(NUM_FRAMES - 1):.0f} us/frame, '
+        f'{pixels_per_frame:.0f} pixels/frame (full redraw {full_redraw})'
+        )
+    # Noise only moves the tops of the bars by a row or two
+    assert pixels_per_frame < 0.05*full_redraw
+    assert screen.full_scale == 1.0
@@ -0,0 +1,82 @@
+import sys
+import importlib
+import pytest
+import board
+from display_stubs import Counts
+from display_stubs import Display
+from adafruit_bitmap_font import bitmap_font
+import constants
+from boot_timer import BootTimer
+
+# Imported on first use by colorimeter, see the note at its imports
+DEFERRED_MODULES = (
+        'spectrum_screen', 'message_screen', 'menu_screen', 'kinetics_screen',
+        'batch_screen', 'calibrations', 'calibration_builder', 'kinetics',
+        'batch', 'sensor_array', 'adafruit_itertools',
+        )
+
+
+@pytest.fixture
+def fresh_import(monkeypatch):
+    """ Import colorimeter as at boot, without the modules other tests loaded """
+    for name in ('colorimeter', 'multi_measure_screen', 'fonts') + DEFERRED_MODULES:
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    loaded = []
+    load_font = bitmap_font.load_font
+
+    def counting_load_font(filename):
+        loaded.append(filename)
+        return load_font(filename)
+
+    monkeypatch.setattr(bitmap_font, 'load_font', counting_load_font)
+    monkeypatch.setattr(board, 'DISPLAY', Display(), raising=False)
+    Counts.reset()
+    importlib.import_module('colorimeter')
+    return loaded
+
+
+def test_import_defers_modules_and_fonts(fresh_import):
+    loaded = fresh_import
+    assert [name for name in DEFERRED_MODULES if name in sys.modules] == []
+    assert loaded == []
+    assert sys.modules['fonts']._font_cache == {}
+
+
+def test_font_loaded_on_first_use(fresh_import):
+    loaded = fresh_import
+    fonts = sys.modules['fonts']
+    from multi_measure_screen import MultiMeasureScreen
+    MultiMeasureScreen()
+    # All labels of the measure screen share the one 8pt font
+    assert loaded == ['/assets/Hack-Bold-8.pcf']
+    font = fonts.load_font(8)
+    assert fonts.load_font(8) is font
+    assert set(map(ord, constants.FONT_PRELOAD_CHARS)) <= set(font.glyphs)
+    assert len(loaded) == 1
+    assert [name for name in DEFERRED_MODULES if name in sys.modules] == []
+
+
+def test_deferred_module_loaded_on_first_use(fresh_import):
+    from spectrum_screen import SpectrumScreen
+    SpectrumScreen()
+    assert 'spectrum_screen' in sys.modules
+    assert 'calibrations' not in sys.modules
+
+
+def test_boot_timer_phases(monkeypatch, capsys):
+    t_ns = [0]
+    monkeypatch.setattr('time.monotonic_ns', lambda: t_ns[0])
+    timer = BootTimer()
+    t_ns[0] = 120*1000000
+    timer.mark('splash')
+    t_ns[0] = 450*1000000
+    timer.mark('import')
+    t_ns[0] = 700*1000000
+    timer.finish()
+    assert timer.phases == [('splash', 120), ('import', 330), ('first measurement', 250)]
+    assert timer.total_ms == 700
+    t_ns[0] = 900*1000000
+    timer.finish()
+    assert timer.total_ms == 700
+    out = capsys.readouterr().out
+    assert out.count('boot total: 700ms') == 1
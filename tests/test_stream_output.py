@@ -0,0 +1,179 @@
+import os
+import tty
+import time
+import asyncio
+import threading
+import pytest
+import numpy as np
+import usb_cdc
+import constants
+import colorimeter_stream
+from frame import FrameBuffer
+from stream_output import StreamOutput
+from stream_output import StreamOutputError
+from colorimeter_stream import FrameDecoder
+from colorimeter_stream import payloads_to_batch
+from colorimeter_stream import read_batches
+
+
+class Serial:
+
+    """ usb_cdc.data stand-in, collects the written bytes """
+
+    connected = True
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def write(self, data):
+        self.data.extend(data)
+
+
+class PtySerial:
+
+    """ usb_cdc.data stand-in writing to the device end of a pty pair """
+
+    connected = True
+
+    def __init__(self, fd):
+        self.fd = fd
+
+    def write(self, data):
+        view = memoryview(bytes(data))
+        while view:
+            view = view[os.write(self.fd, view):]
+
+
+@pytest.fixture
+def stream_output(monkeypatch):
+    monkeypatch.setattr(usb_cdc, 'data', Serial())
+    stream_output = StreamOutput()
+    stream_output.start()
+    return stream_output
+
+
+def write_frames(stream_output, num):
+    frames = FrameBuffer()
+    for i in range(num):
+        frame = frames.next([100*i + j for j in range(constants.NUM_CHANNEL)], i % 4, 50)
+        frame.absorbances[:] = np.linspace(0.0, 1.0, constants.NUM_CHANNEL) + i
+        frame.flags[:] = 0
+        frame.flags[i % constants.NUM_CHANNEL] = 0x40
+        frames.publish()
+        assert stream_output.write_latest(frames)
+
+
+def test_host_layout_matches():
+    assert colorimeter_stream.NUM_CHANNEL == constants.NUM_CHANNEL
+    assert colorimeter_stream.SYNC == StreamOutput.SYNC
+    assert colorimeter_stream.PAYLOAD_FORMAT == StreamOutput.PAYLOAD_FORMAT
+    assert colorimeter_stream.FRAME_SIZE == StreamOutput.FRAME_SIZE
+    assert colorimeter_stream.FRAME_DTYPE.itemsize == StreamOutput.PAYLOAD_SIZE
+
+
+def test_decoder_round_trip(stream_output):
+    write_frames(stream_output, 5)
+    decoder = FrameDecoder()
+    batch = payloads_to_batch(decoder.feed(bytes(usb_cdc.data.data)))
+    assert decoder.num_frames == 5
+    assert decoder.num_crc_errors == 0
+    assert decoder.num_dropped == 0
+    assert list(batch['seq']) == list(range(5))
+    assert list(batch['gain']) == [0, 1, 2, 3, 0]
+    assert list(batch['raw'][3]) == [300 + j for j in range(constants.NUM_CHANNEL)]
+    expected = np.linspace(0.0, 1.0, constants.NUM_CHANNEL) + 4
+    assert np.allclose(batch['absorbance'][4], expected)
+    assert list(np.argmax(batch['flags'], axis=1)) == list(range(5))
+    assert (batch['timestamp'] < 1000).all()
+
+
+def test_decoder_chunks_and_corruption(stream_output):
+    write_frames(stream_output, 6)
+    data = bytearray(usb_cdc.data.data)
+    data[2*StreamOutput.FRAME_SIZE + 10] ^= 0xff
+    data = b'\x00\xa5garbage' + bytes(data)
+    decoder = FrameDecoder()
+    payloads = []
+    for pos in range(0, len(data), 7):
+        payloads.extend(decoder.feed(data[pos:pos+7]))
+    batch = payloads_to_batch(payloads)
+    assert list(batch['seq']) == [0, 1, 3, 4, 5]
+    assert decoder.num_crc_errors == 1
+    assert decoder.num_dropped == 1
+
+
+def test_timestamp_wraps_to_uint32(stream_output):
+    frames = FrameBuffer()
+    frame = frames.next([0]*constants.NUM_CHANNEL, 0, 50)
+    frame.timestamp = stream_output.t_start_ms + 2**32 + 5
+    frames.publish()
+    stream_output.write_latest(frames)
+    batch = payloads_to_batch(FrameDecoder().feed(bytes(usb_cdc.data.data)))
+    assert list(batch['timestamp']) == [5]
+
+
+def test_timestamp_keeps_ms_resolution():
+    frames = FrameBuffer()
+    frame = frames.next([0]*constants.NUM_CHANNEL, 0, 50)
+    assert isinstance(frame.timestamp, int)
+    assert abs(frame.timestamp - time.monotonic_ns()//1000000) < 100
+
+
+def test_refuses_without_data_channel(monkeypatch):
+    monkeypatch.setattr(usb_cdc, 'data', None)
+    monkeypatch.setattr(usb_cdc, 'console', Serial())
+    stream_output = StreamOutput()
+    with pytest.raises(StreamOutputError):
+        stream_output.start()
+    assert not stream_output.enabled
+    assert usb_cdc.console.data == b''
+
+
+def test_pty_throughput(monkeypatch):
+    num_frames = 5000
+    device_fd, host_fd = os.openpty()
+    # Raw before any data is written, the line discipline would echo and
+    # translate bytes
+    tty.setraw(host_fd)
+    monkeypatch.setattr(usb_cdc, 'data', PtySerial(device_fd))
+    stream_output = StreamOutput()
+    stream_output.start()
+
+    def produce():
+        frames = FrameBuffer()
+        for i in range(num_frames):
+            frame = frames.next([i % 65536]*constants.NUM_CHANNEL, 0, 50)
+            frame.absorbances[:] = 1.0e-3*i
+            frames.publish()
+            stream_output.write_latest(frames)
+
+    async def consume():
+        decoder = FrameDecoder()
+        batches = []
+        num = 0
+        async for batch in read_batches(os.ttyname(host_fd), batch_size=100, decoder=decoder):
+            batches.append(batch)
+            num += len(batch)
+            if num >= num_frames:
+                break
+        return decoder, np.concatenate(batches)
+
+    producer = threading.Thread(target=produce)
+    t_start = time.perf_counter()
+    try:
+        producer.start()
+        decoder, batch = asyncio.run(asyncio.wait_for(consume(), timeout=30.0))
+        elapsed = time.perf_counter() - t_start
+        producer.join()
+    finally:
+        os.close(device_fd)
+        os.close(host_fd)
+    assert len(batch) == num_frames
+    assert list(batch['seq']) == list(range(num_frames))
+    assert np.allclose(batch['absorbance'][:, 0], 1.0e-3*np.arange(num_frames))
+    assert decoder.num_crc_errors == 0
+    assert decoder.num_dropped == 0
+    assert stream_output.num_dropped == 0
+    # Far above the sensor frame rate (a few hundred frames/s at most)
+    frame_rate = num_frames/elapsed
+    assert frame_rate > 1000.0, f'{frame_rate:.0f} frames/s'
@@ -0,0 +1,164 @@
+"""
+Generate the prebaked numeric glyph atlas used by src/numeric_field.py.
+
+Reads the glyphs for ATLAS_CHARS from a pcf font and writes a single row of
+fixed size tiles, one per character, to an 8 bit indexed bmp (index 0
+background, index 1 foreground). The character order must match
+NUMERIC_ATLAS_CHARS in src/constants.py.
+
+usage: python3 tools/make_glyph_atlas.py [font.pcf] [atlas.bmp]
+"""
+import sys
+import struct
+
+ATLAS_CHARS = ' 0123456789+-.%±/OANCclearnm'
+DEFAULT_FONT = 'assets/Hack-Bold-8.pcf'
+DEFAULT_ATLAS = 'assets/numeric_atlas.bmp'
+
+PCF_METRICS = 1 << 2
+PCF_BITMAPS = 1 << 3
+PCF_BDF_ENCODINGS = 1 << 5
+
+PCF_GLYPH_PAD_MASK = 3 << 0
+PCF_BYTE_MASK = 1 << 2
+PCF_BIT_MASK = 1 << 3
+PCF_COMPRESSED_METRICS = 0x100
+
+
+class PcfFont:
+
+    """ Minimal pcf reader: metrics, bitmaps and encodings """
+
+    def __init__(self, filename):
+        with open(filename, 'rb') as f:
+            self.data = f.read()
+        if self.data[:4] != b'\x01fcp':
+            raise ValueError(f'{filename} is not a pcf font')
+        num_table = struct.unpack_from('<i', self.data, 4)[0]
+        self.tables = {}
+        for i in range(num_table):
+            table_type, fmt, size, offset = struct.unpack_from('<4i', self.data, 8 + 16*i)
+            self.tables[table_type] = (fmt, offset)
+        self.metrics = self.read_metrics()
+        self.bitmaps = self.read_bitmaps()
+        self.encodings = self.read_encodings()
+
+    def table(self, table_type):
+        fmt, offset = self.tables[table_type]
+        fmt = struct.unpack_from('<i', self.data, offset)[0]
+        endian = '>' if fmt & PCF_BYTE_MASK else '<'
+        return fmt, endian, offset + 4
+
+    def read_metrics(self):
+        fmt, endian, pos = self.table(PCF_METRICS)
+        metrics = []
+        if fmt & PCF_COMPRESSED_METRICS:
+            count = struct.unpack_from(f'{endian}h', self.data, pos)[0]
+            pos += 2
+            for i in range(count):
+                values = [b - 0x80 for b in self.data[pos:pos+5]]
+                metrics.append(tuple(values))
+                pos += 5
+        else:
+            count = struct.unpack_from(f'{endian}i', self.data, pos)[0]
+            pos += 4
+            for i in range(count):
+                values = struct.unpack_from(f'{endian}5h', self.data, pos)
+                metrics.append(tuple(values))
+                pos += 12
+        # (left bearing, right bearing, width, ascent, descent)
+        return metrics
+
+    def read_bitmaps(self):
+        fmt, endian, pos = self.table(PCF_BITMAPS)
+        count = struct.unpack_from(f'{endian}i', self.data, pos)[0]
+        pos += 4
+        offsets = struct.unpack_from(f'{endian}{count}i', self.data, pos)
+        pos += 4*count
+        sizes = struct.unpack_from(f'{endian}4i', self.data, pos)
+        pos += 16
+        pad = 1 << (fmt & PCF_GLYPH_PAD_MASK)
+        msb_first = bool(fmt & PCF_BIT_MASK)
+        bitmaps = []
+        for offset, metric in zip(offsets, self.metrics):
+            lsb, rsb, width, ascent, descent = metric
+            glyph_width = rsb - lsb
+            glyph_height = ascent + descent
+            row_bytes = ((glyph_width + 8*pad - 1)//(8*pad))*pad
+            rows = []
+            for y in range(glyph_height):
+                row_start = pos + offset + y*row_bytes
+                row = []
+                for x in range(glyph_width):
+                    byte = self.data[row_start + x//8]
+                    bit = 7 - x%8 if msb_first else x%8
+                    row.append((byte >> bit) & 1)
+                rows.append(row)
+            bitmaps.append(rows)
+        return bitmaps
+
+    def read_encodings(self):
+        fmt, endian, pos = self.table(PCF_BDF_ENCODINGS)
+        min2, max2, min1, max1, default = struct.unpack_from(f'{endian}5h', self.data, pos)
+        pos += 10
+        count = (max2 - min2 + 1)*(max1 - min1 + 1)
+        indices = struct.unpack_from(f'{endian}{count}H', self.data, pos)
+        encodings = {}
+        for i, index in enumerate(indices):
+            if index == 0xffff:
+                continue
+            byte1 = i//(max2 - min2 + 1) + min1
+            byte2 = i%(max2 - min2 + 1) + min2
+            encodings[(byte1 << 8) | byte2] = index
+        return encodings
+
+    def glyph(self, char):
+        index = self.encodings[ord(char)]
+        return self.metrics[index], self.bitmaps[index]
+
+
+def make_atlas(font, chars):
+    glyphs = [font.glyph(c) for c in chars]
+    tile_width = max(metric[2] for metric, _ in glyphs)
+    ascent = max(metric[3] for metric, _ in glyphs)
+    descent = max(metric[4] for metric, _ in glyphs)
+    tile_height = ascent + descent
+    pixels = [[0]*(tile_width*len(chars)) for y in range(tile_height)]
+    for i, (metric, rows) in enumerate(glyphs):
+        lsb, rsb, width, glyph_ascent, glyph_descent = metric
+        x0 = i*tile_width + lsb
+        y0 = ascent - glyph_ascent
+        for y, row in enumerate(rows):
+            for x, value in enumerate(row):
+                if 0 <= x0 + x < (i + 1)*tile_width and 0 <= y0 + y < tile_height:
+                    pixels[y0 + y][x0 + x] = value
+    return tile_width, tile_height, pixels
+
+
+def write_bmp(filename, pixels, palette=(0x000000, 0xffffff)):
+    height = len(pixels)
+    width = len(pixels[0])
+    row_size = (width + 3)//4*4
+    header_size = 14 + 40 + 4*len(palette)
+    image_size = row_size*height
+    with open(filename, 'wb') as f:
+        f.write(struct.pack('<2sIHHI', b'BM', header_size + image_size, 0, 0, header_size))
+        f.write(struct.pack('<IiiHHIIiiII', 40, width, height, 1, 8, 0, image_size,
+            2835, 2835, len(palette), len(palette)))
+        for color in palette:
+            f.write(struct.pack('<BBBB', color & 0xff, (color >> 8) & 0xff, color >> 16, 0))
+        for row in reversed(pixels):
+            f.write(bytes(row) + bytes(row_size - width))
+
+
+def main():
+    font_file = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_FONT
+    atlas_file = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_ATLAS
+    font = PcfFont(font_file)
+    tile_width, tile_height, pixels = make_atlas(font, ATLAS_CHARS)
+    write_bmp(atlas_file, pixels)
+    print(f'{atlas_file}: {len(ATLAS_CHARS)} tiles of {tile_width}x{tile_height}')
+
+
+if __name__ == '__main__':
+    main()